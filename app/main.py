@@ -110,6 +110,23 @@ async def startup_event():
     print("✅ Configuration loading complete!")
 
 
+@app.on_event("startup")
+async def resume_batches():
+    """Resume batch runs interrupted by a restart"""
+    from app.services.batch_inference import BATCH_RESUME_ON_STARTUP, resume_batch_runs
+    if BATCH_RESUME_ON_STARTUP:
+        resumed = resume_batch_runs()
+        if resumed:
+            print(f"🔁 Resuming {len(resumed)} batch run(s)")
+
+
+@app.on_event("shutdown")
+async def close_http_connections():
+    """Close the pooled provider connections"""
+    from app.services.http_pool import close_http_clients
+    await close_http_clients()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -0,0 +1,466 @@
+"""
+Mock LLM and Tool Server
+Offline stand-in for Groq (OpenAI-compatible), Anthropic and DuckDuckGo with
+configurable latency distributions, error/429 injection and token-rate simulation.
+
+Run with ``python run_mock_server.py`` and point the orchestrator at it:
+
+    GROQ_BASE_URL=http://localhost:8100/openai/v1  GROQ_API_KEY=mock
+    ANTHROPIC_BASE_URL=http://localhost:8100       ANTHROPIC_API_KEY=mock
+    WEBSEARCH_BASE_URL=http://localhost:8100
+
+API tools can use ``http://localhost:8100/ddg`` in place of ``https://api.duckduckgo.com/``.
+Prompt caching is simulated: OpenAI-compatible requests get automatic prefix
+caching (``prompt_tokens_details.cached_tokens``), Anthropic requests cache the
+prefix up to each ``cache_control`` block (``cache_read_input_tokens`` /
+``cache_creation_input_tokens``). Prefixes shorter than ``prompt_cache_min_tokens``
+are not cached and entries expire after ``prompt_cache_ttl_seconds``.
+
+Latency specs: ``fixed:MS``, ``uniform:LO_MS:HI_MS`` or ``lognormal:MEDIAN_MS:SIGMA``,
+optionally followed by ``,tail:PROBABILITY:MULTIPLIER`` for slow-tail spikes.
+"""
+import os
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.services.tokenizer import count_tokens, count_message_tokens
+
+
+class LatencyProfile:
+    """Samples a delay in seconds from a latency spec string"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        base, *modifiers = [part.strip() for part in spec.split(",") if part.strip()]
+        kind, *params = base.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.tail_probability = 0.0
+        self.tail_multiplier = 1.0
+        for modifier in modifiers:
+            name, *values = modifier.split(":")
+            if name == "tail":
+                self.tail_probability, self.tail_multiplier = float(values[0]), float(values[1])
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = random.uniform(self.params[0], self.params[1])
+        else:
+            median, sigma = self.params
+            ms = median * math.exp(random.gauss(0.0, sigma))
+        if self.tail_probability and random.random() < self.tail_probability:
+            ms *= self.tail_multiplier
+        return ms / 1000.0
+
+
+class MockServerConfig(BaseModel):
+    """Runtime-adjustable behaviour of the mock server (see POST /mock/config)"""
+    llm_latency: str = os.getenv("MOCK_LLM_LATENCY", "lognormal:300:0.5,tail:0.02:6")
+    search_latency: str = os.getenv("MOCK_SEARCH_LATENCY", "lognormal:250:0.4")
+    tokens_per_second: float = float(os.getenv("MOCK_TOKENS_PER_SECOND", "250"))
+    completion_tokens: int = int(os.getenv("MOCK_COMPLETION_TOKENS", "120"))
+    error_rate: float = float(os.getenv("MOCK_ERROR_RATE", "0"))
+    rate_limit_rate: float = float(os.getenv("MOCK_RATE_LIMIT_RATE", "0"))
+    retry_after_seconds: float = float(os.getenv("MOCK_RETRY_AFTER_SECONDS", "1"))
+    requests_per_minute: int = int(os.getenv("MOCK_RPM_LIMIT", "0"))
+    tokens_per_minute: int = int(os.getenv("MOCK_TPM_LIMIT", "0"))
+    prompt_cache_min_tokens: int = int(os.getenv("MOCK_PROMPT_CACHE_MIN_TOKENS", "1024"))
+    prompt_cache_ttl_seconds: float = float(os.getenv("MOCK_PROMPT_CACHE_TTL_SECONDS", "300"))
+
+
+class MockConfigUpdate(BaseModel):
+    llm_latency: Optional[str] = None
+    search_latency: Optional[str] = None
+    tokens_per_second: Optional[float] = None
+    completion_tokens: Optional[int] = None
+    error_rate: Optional[float] = None
+    rate_limit_rate: Optional[float] = None
+    retry_after_seconds: Optional[float] = None
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    prompt_cache_min_tokens: Optional[int] = None
+    prompt_cache_ttl_seconds: Optional[float] = None
+
+
+class _Limits:
+    """Sliding one-minute request/token window emulating provider rate limits"""
+
+    def __init__(self):
+        self.requests: Deque[float] = deque()
+        self.tokens: Deque[tuple] = deque()
+
+    def _trim(self, now: float):
+        while self.requests and self.requests[0] <= now - 60:
+            self.requests.popleft()
+        while self.tokens and self.tokens[0][0] <= now - 60:
+            self.tokens.popleft()
+
+    def check(self, config: MockServerConfig, tokens: int) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._trim(now)
+        used_tokens = sum(t for _, t in self.tokens)
+        limited = (
+            (config.requests_per_minute and len(self.requests) >= config.requests_per_minute) or
+            (config.tokens_per_minute and used_tokens + tokens > config.tokens_per_minute)
+        )
+        if not limited:
+            self.requests.append(now)
+            self.tokens.append((now, tokens))
+            used_tokens += tokens
+        reset = 60 - (now - self.requests[0]) if self.requests else 0.0
+        return {
+            "limited": bool(limited),
+            "remaining_requests": max(0, config.requests_per_minute - len(self.requests)) if config.requests_per_minute else None,
+            "remaining_tokens": max(0, config.tokens_per_minute - used_tokens) if config.tokens_per_minute else None,
+            "reset": round(max(reset, 0.0), 3)
+        }
+
+
+class _PromptCache:
+    """Prefix hashes with expiry, emulating a provider's prompt cache"""
+
+    MAX_ENTRIES = 10_000
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, float]" = OrderedDict()
+
+    @staticmethod
+    def key(prefix: Any) -> str:
+        return hashlib.sha256(json.dumps(prefix, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def hit(self, key: str, ttl: float) -> bool:
+        """Whether ``key`` is cached; a hit refreshes its lifetime like the real caches do"""
+        expires = self.entries.get(key)
+        if expires is None or expires < time.monotonic():
+            self.entries.pop(key, None)
+            return False
+        self.entries[key] = time.monotonic() + ttl
+        self.entries.move_to_end(key)
+        return True
+
+    def store(self, key: str, ttl: float):
+        self.entries[key] = time.monotonic() + ttl
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.MAX_ENTRIES:
+            self.entries.popitem(last=False)
+
+
+app = FastAPI(title="Agentic Orchestrator Mock Providers", version="0.1.0")
+config = MockServerConfig()
+_limits = _Limits()
+_prompt_cache = _PromptCache()
+stats: Dict[str, int] = {"llm_requests": 0, "search_requests": 0, "errors_injected": 0, "rate_limited": 0, "tokens_generated": 0,
+                         "prompt_cache_hits": 0, "prompt_cache_read_tokens": 0, "prompt_cache_write_tokens": 0}
+
+_FILLER = (
+    "the analysis considers relevant sources and summarizes key points while keeping the answer "
+    "concise structured and grounded in the provided context with clear next steps"
+).split()
+
+
+def _completion_text(messages: List[Dict[str, Any]], max_tokens: int) -> str:
+    """Deterministic-looking text of roughly ``min(max_tokens, completion_tokens)`` tokens"""
+    last_user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+    words = [f"[mock-server] {' '.join(last_user.split()[:12])}"]
+    target = max(1, min(max_tokens or config.completion_tokens, config.completion_tokens))
+    rng = random.Random(last_user)
+    while count_tokens(" ".join(words)) < target:
+        words.append(rng.choice(_FILLER))
+    return " ".join(words)
+
+
+def _text_content(content: Any) -> str:
+    """Anthropic content may be a string or a list of blocks"""
+    if isinstance(content, list):
+        return " ".join(str(block.get("text", "")) for block in content if isinstance(block, dict))
+    return str(content)
+
+
+def _openai_cached_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Automatic prefix caching: tokens of the longest cached message prefix.
+
+    Every prefix of at least ``prompt_cache_min_tokens`` is stored, so the
+    next request sharing it (e.g. the same system prompt) reads it from cache.
+    """
+    cached, prefix_tokens = 0, 0
+    for i, message in enumerate(messages):
+        prefix_tokens += count_message_tokens([message])
+        if prefix_tokens < config.prompt_cache_min_tokens:
+            continue
+        key = _PromptCache.key(messages[:i + 1])
+        if _prompt_cache.hit(key, config.prompt_cache_ttl_seconds):
+            cached = prefix_tokens
+        else:
+            _prompt_cache.store(key, config.prompt_cache_ttl_seconds)
+    if cached:
+        stats["prompt_cache_hits"] += 1
+        stats["prompt_cache_read_tokens"] += cached
+    return cached
+
+
+def _anthropic_cache_usage(body: Dict[str, Any]) -> Tuple[int, int]:
+    """``(cache_read, cache_creation)`` tokens for the ``cache_control`` breakpoints of a request.
+
+    The prompt is walked in Anthropic's order (tools, system, messages); the
+    longest cached breakpoint prefix is read, and the newest breakpoint's
+    prefix is written if it was not cached yet.
+    """
+    blocks: List[Any] = list(body.get("tools") or [])
+    system = body.get("system") or []
+    blocks += [{"type": "text", "text": system}] if isinstance(system, str) else list(system)
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            blocks.append({"role": message.get("role"), "text": content})
+        else:
+            blocks += [dict(block, role=message.get("role")) for block in content if isinstance(block, dict)]
+
+    breakpoints, prefix_tokens = [], 0
+    for i, block in enumerate(blocks):
+        prefix_tokens += count_tokens(str(block.get("text") or block.get("description") or ""))
+        if block.get("cache_control") and prefix_tokens >= config.prompt_cache_min_tokens:
+            breakpoints.append((_PromptCache.key(blocks[:i + 1]), prefix_tokens))
+    if not breakpoints:
+        return 0, 0
+
+    read = next((tokens for key, tokens in reversed(breakpoints)
+                 if _prompt_cache.hit(key, config.prompt_cache_ttl_seconds)), 0)
+    key, tokens = breakpoints[-1]
+    written = 0
+    if tokens > read:
+        _prompt_cache.store(key, config.prompt_cache_ttl_seconds)
+        written = tokens - read
+    if read:
+        stats["prompt_cache_hits"] += 1
+        stats["prompt_cache_read_tokens"] += read
+    stats["prompt_cache_write_tokens"] += written
+    return read, written
+
+
+def _rate_limit_headers(limits: Dict[str, Any], anthropic: bool) -> Dict[str, str]:
+    headers = {}
+    if anthropic:
+        if limits["remaining_requests"] is not None:
+            headers["anthropic-ratelimit-requests-remaining"] = str(limits["remaining_requests"])
+        if limits["remaining_tokens"] is not None:
+            headers["anthropic-ratelimit-tokens-remaining"] = str(limits["remaining_tokens"])
+    else:
+        if limits["remaining_requests"] is not None:
+            headers["x-ratelimit-remaining-requests"] = str(limits["remaining_requests"])
+            headers["x-ratelimit-reset-requests"] = f"{limits['reset']}s"
+        if limits["remaining_tokens"] is not None:
+            headers["x-ratelimit-remaining-tokens"] = str(limits["remaining_tokens"])
+            headers["x-ratelimit-reset-tokens"] = f"{limits['reset']}s"
+    return headers
+
+
+def _admit(prompt_tokens: int, anthropic: bool) -> Tuple[Optional[JSONResponse], Dict[str, str]]:
+    """Apply the emulated budgets and injected failures.
+
+    Returns ``(failure_response, rate_limit_headers)``; the failure is a 429
+    (budget exhausted or injected) or an injected 500, otherwise None.
+    """
+    limits = _limits.check(config, prompt_tokens + config.completion_tokens)
+    headers = _rate_limit_headers(limits, anthropic)
+    if limits["limited"] or random.random() < config.rate_limit_rate:
+        stats["rate_limited"] += 1
+        retry_after = limits["reset"] if limits["limited"] else config.retry_after_seconds
+        failure_headers = dict(headers, **{"retry-after": str(retry_after)})
+        return JSONResponse({"error": {"type": "rate_limit_error", "message": "Rate limit reached (mock)"}},
+                            status_code=429, headers=failure_headers), headers
+    if random.random() < config.error_rate:
+        stats["errors_injected"] += 1
+        return JSONResponse({"error": {"type": "api_error", "message": "Injected failure (mock)"}}, status_code=500), headers
+    return None, headers
+
+
+async def _generate(text: str):
+    """Yield words at the configured token rate after a sampled time-to-first-token"""
+    await asyncio.sleep(LatencyProfile(config.llm_latency).sample())
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        piece = word if i == 0 else " " + word
+        if config.tokens_per_second > 0:
+            await asyncio.sleep(count_tokens(piece) / config.tokens_per_second)
+        yield piece
+
+
+def _sse(event: Dict[str, Any], name: Optional[str] = None) -> str:
+    prefix = f"event: {name}\n" if name else ""
+    return f"{prefix}data: {json.dumps(event)}\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI/Groq-compatible chat completions"""
+    body = await request.json()
+    stats["llm_requests"] += 1
+    messages = body.get("messages", [])
+    prompt_tokens = count_message_tokens(messages)
+    failure, headers = _admit(prompt_tokens, anthropic=False)
+    if failure:
+        return failure
+
+    text = _completion_text(messages, body.get("max_tokens", 0))
+    completion_tokens = count_tokens(text)
+    stats["tokens_generated"] += completion_tokens
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+             "total_tokens": prompt_tokens + completion_tokens,
+             "prompt_tokens_details": {"cached_tokens": _openai_cached_tokens(messages)}}
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "mock")
+
+    if body.get("stream"):
+        async def events():
+            async for piece in _generate(text):
+                yield _sse({"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+            final = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            if (body.get("stream_options") or {}).get("include_usage"):
+                final["usage"] = usage
+            yield _sse(final)
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    async for _ in _generate(text):
+        pass
+    return JSONResponse({
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": usage
+    }, headers=headers)
+
+
+@app.post("/v1/messages")
+async def anthropic_messages(request: Request):
+    """Anthropic-compatible messages API"""
+    body = await request.json()
+    stats["llm_requests"] += 1
+    messages = [{"role": m.get("role"), "content": _text_content(m.get("content", ""))} for m in body.get("messages", [])]
+    system = _text_content(body.get("system", ""))
+    input_tokens = count_message_tokens(messages) + count_tokens(system)
+    failure, headers = _admit(input_tokens, anthropic=True)
+    if failure:
+        return failure
+
+    # Anthropic reports cache reads and writes apart from the uncached input_tokens
+    cache_read, cache_write = _anthropic_cache_usage(body)
+    cache_usage = {"cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_write}
+    input_tokens -= min(input_tokens, cache_read + cache_write)
+    text = _completion_text(messages, body.get("max_tokens", 0))
+    output_tokens = count_tokens(text)
+    stats["tokens_generated"] += output_tokens
+    message_id = f"msg_{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "mock")
+
+    if body.get("stream"):
+        async def events():
+            yield _sse({"type": "message_start", "message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+                "usage": {"input_tokens": input_tokens, "output_tokens": 1, **cache_usage}}}, "message_start")
+            yield _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                       "content_block_start")
+            async for piece in _generate(text):
+                yield _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}},
+                           "content_block_delta")
+            yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+            yield _sse({"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                        "usage": {"output_tokens": output_tokens}}, "message_delta")
+            yield _sse({"type": "message_stop"}, "message_stop")
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    async for _ in _generate(text):
+        pass
+    return JSONResponse({
+        "id": message_id,
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens, **cache_usage}
+    }, headers=headers)
+
+
+def _search_results(query: str, max_results: int) -> List[Dict[str, str]]:
+    rng = random.Random(query)
+    slug = "-".join(query.lower().split()[:5]) or "query"
+    return [
+        {
+            "title": f"{query.title()} - Result {i + 1}",
+            "href": f"https://example.com/{slug}/{i + 1}",
+            "body": f"{query} " + " ".join(rng.choice(_FILLER) for _ in range(30))
+        }
+        for i in range(max_results)
+    ]
+
+
+@app.get("/search")
+async def search(q: str = "", max_results: int = 5):
+    """DDGS.text()-shaped web search results"""
+    stats["search_requests"] += 1
+    await asyncio.sleep(LatencyProfile(config.search_latency).sample())
+    if random.random() < config.error_rate:
+        stats["errors_injected"] += 1
+        return JSONResponse({"error": "Injected failure (mock)"}, status_code=500)
+    return {"query": q, "results": _search_results(q, max_results)}
+
+
+@app.get("/ddg")
+async def duckduckgo_instant_answer(q: str = ""):
+    """DuckDuckGo Instant Answer API shape (api.duckduckgo.com/?q=...&format=json)"""
+    stats["search_requests"] += 1
+    await asyncio.sleep(LatencyProfile(config.search_latency).sample())
+    results = _search_results(q, 3)
+    return {
+        "Heading": q.title(),
+        "AbstractText": results[0]["body"],
+        "AbstractURL": results[0]["href"],
+        "Answer": "",
+        "RelatedTopics": [{"Text": r["body"][:200], "FirstURL": r["href"]} for r in results[1:]]
+    }
+
+
+@app.get("/mock/config")
+async def get_config():
+    return config.model_dump()
+
+
+@app.post("/mock/config")
+async def update_config(update: MockConfigUpdate):
+    """Change latency, error injection or limits while a load test runs"""
+    changes = update.model_dump(exclude_none=True)
+    for spec in ("llm_latency", "search_latency"):
+        if spec in changes:
+            try:
+                LatencyProfile(changes[spec])
+            except (ValueError, IndexError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid {spec}: {e}")
+    for name, value in changes.items():
+        setattr(config, name, value)
+    return config.model_dump()
+
+
+@app.get("/mock/stats")
+async def get_stats():
+    return stats
@@ -39,6 +39,7 @@ class WorkflowNode(BaseModel):
     agent_ref: Optional[str] = None  # Reference to agent
     task: Optional[str] = None  # Task description
     tools: List[str] = Field(default_factory=list)  # Tool IDs attached to this agent node
+    step_kind: Optional[str] = None  # e.g. 'routing', 'formatting', 'reasoning' - selects a model tier
     dependencies: List[str] = Field(default_factory=list)  # Node IDs this node depends on
     receives_from: List[str] = Field(default_factory=list)  # Agent IDs to receive messages from (legacy)
     sends_to: List[str] = Field(default_factory=list)  # Agent IDs to send messages to (legacy)
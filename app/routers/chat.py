@@ -1,16 +1,105 @@
 """Chat mode router for continuous conversations with workflows."""
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from app.models import ChatSession, ChatSessionCreate, ChatMessageRequest, ChatMessage, WorkflowSwitchRequest
 from app.services import chat_manager
 from app.services.orchestrator import orchestrator
+from app.services.context_store import get_context_store
 from app.services.solution_service import solution_service
 from app.storage import load
 from datetime import datetime
+import asyncio
+import json
 
 router = APIRouter()
 
 
+def _record_workflow_result(session_id: str, session: ChatSession, result: dict) -> ChatSession:
+    """Store a workflow run's state, response and metrics on the chat session."""
+    # Update session state
+    session.state = result.get("state", {})
+    
+    # Update solution memory if in solution context
+    if session.solution_id:
+        solution_service.update_shared_memory(
+            session.solution_id,
+            session.workflow_id,
+            {"conversation_context": session.conversation_memory}
+        )
+    
+    # Extract assistant response
+    assistant_content = str(result.get("result", {}))
+    
+    # Add assistant response with metrics
+    session = chat_manager.add_message(
+        session_id,
+        role="assistant",
+        content=assistant_content,
+        metadata={
+            "run_id": result.get("run_id"),
+            "status": result.get("status"),
+            "metrics": result.get("metrics", {})  # Include metrics in message metadata
+        }
+    )
+    
+    # Add metrics to session metadata for easy access
+    if result.get("metrics"):
+        session.metadata["last_message_metrics"] = result.get("metrics")
+        # Save updated session
+        session = chat_manager.update_session(session)
+    
+    return session
+
+
+def _sse(event: dict) -> str:
+    """Encode an event as a server-sent events frame."""
+    return f"data: {json.dumps(event, default=str)}\n\n"
+
+
+async def _stream_message(session_id: str, session: ChatSession, workflow: dict):
+    """Run the workflow and yield node events and token deltas as SSE frames.
+    
+    The final frame carries the updated session, mirroring the non-streaming response.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def on_event(event: dict):
+        await queue.put(event)
+    
+    async def run():
+        try:
+            return await orchestrator.run_workflow(workflow, initial_state=session.state, on_event=on_event, session_id=session_id)
+        finally:
+            await queue.put(None)
+    
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield _sse(event)
+        
+        try:
+            result = task.result()
+        except Exception as e:
+            updated = chat_manager.add_message(
+                session_id,
+                role="assistant",
+                content=f"I encountered an error processing your request: {str(e)[:200]}",
+                metadata={"error": str(e), "status": "error"}
+            )
+            yield _sse({"type": "error", "message": str(e), "session": updated.model_dump()})
+            return
+        
+        updated = _record_workflow_result(session_id, session, result)
+        yield _sse({"type": "session", "session": updated.model_dump()})
+    finally:
+        if not task.done():
+            task.cancel()
+
+
 @router.post("/sessions", response_model=ChatSession)
 async def create_chat_session(request: ChatSessionCreate):
     """Create a new chat session for a workflow or solution.
@@ -62,7 +151,7 @@ async def create_chat_session(request: ChatSessionCreate):
     if request.initial_message and request.workflow_id:
         workflow = load("workflows", request.workflow_id)
         # Run workflow with the initial message
-        result = await orchestrator.run_workflow(workflow, initial_state=session.state)
+        result = await orchestrator.run_workflow(workflow, initial_state=session.state, session_id=session.session_id)
         
         # Update session state
         session.state = result.get("state", {})
@@ -145,46 +234,17 @@ async def send_message(session_id: str, request: ChatMessageRequest):
         "type": "user_message"
     })
     
+    # Stream node events and token deltas when requested
+    if request.stream:
+        return StreamingResponse(
+            _stream_message(session_id, session, workflow),
+            media_type="text/event-stream"
+        )
+    
     # Run workflow with preserved state
     try:
-        result = await orchestrator.run_workflow(workflow, initial_state=session.state)
-        
-        # Update session state
-        session.state = result.get("state", {})
-        
-        # Update solution memory if in solution context
-        if session.solution_id:
-            solution_service.update_shared_memory(
-                session.solution_id,
-                session.workflow_id,
-                {"conversation_context": session.conversation_memory}
-            )
-        
-        # Extract assistant response
-        assistant_content = str(result.get("result", {}))
-        
-        # Add assistant response with metrics
-        session = chat_manager.add_message(
-            session_id,
-            role="assistant",
-            content=assistant_content,
-            metadata={
-                "run_id": result.get("run_id"),
-                "status": result.get("status"),
-                "metrics": result.get("metrics", {})  # Include metrics in message metadata
-            }
-        )
-        
-        # Add metrics to session metadata for easy access
-        if result.get("metrics"):
-            if "last_message_metrics" not in session.metadata:
-                session.metadata["last_message_metrics"] = {}
-            session.metadata["last_message_metrics"] = result.get("metrics")
-            # Save updated session
-            chat_manager.sessions[session_id] = session
-            chat_manager._save_session(session)
-        
-        return session
+        result = await orchestrator.run_workflow(workflow, initial_state=session.state, session_id=session_id)
+        return _record_workflow_result(session_id, session, result)
     
     except Exception as e:
         error_msg = str(e)
@@ -240,6 +300,7 @@ async def delete_chat_session(session_id: str):
     success = chat_manager.delete_session(session_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    get_context_store().release(session_id)
     return {"message": f"Session {session_id} deleted"}
 
 
@@ -252,6 +313,7 @@ async def clear_session_history(session_id: str):
     
     session.messages = []
     session.state = {}
+    get_context_store().release(session_id)
     return chat_manager.update_session(session)
 
 
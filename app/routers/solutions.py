@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from app.models import SolutionDef, SolutionCreate, SolutionUpdate, WorkflowCommunication, WorkflowDef
 from app.storage import save, load, list_all, delete
 from app.services.kag_service import get_kag_service
@@ -188,7 +188,7 @@ async def get_solution_communications(solution_id: str):
 
 
 @router.post("/{solution_id}/execute")
-async def execute_solution(solution_id: str, query: str = "Execute solution"):
+async def execute_solution(solution_id: str, query: str = "Execute solution", fast_handoff: Optional[bool] = None):
     """
     Execute all workflows in a solution sequentially with intelligent communication.
     
@@ -196,6 +196,10 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
     - normal: KAG + Conversational Buffer (current implementation)
     - research: Agentic RAG with memory initialization at agent nodes
     
+    In normal mode KAG ingests each workflow output in the background; the next
+    workflow only waits for the memory it is handed (or, with fast_handoff, not
+    at all), and the summary waits for every ingestion to finish.
+    
     Returns comprehensive metrics for the entire solution execution.
     """
     solution = load("solutions", solution_id)
@@ -219,6 +223,7 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
     print(f"🚀 Executing {solution_type} solution using {service_name}")
     
     execution_results = []
+    kag_tasks = []  # (index in execution_results, background ingestion)
     
     # Aggregate metrics across all workflows
     from app.services.metrics_service import create_metrics_tracker
@@ -247,11 +252,12 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
                     )
                 else:
                     # KAG + Buffer: Traditional handoff
-                    handoff_context = communication_service.prepare_handoff(
+                    handoff_context = await communication_service.prepare_handoff(
                         source_workflow_id=previous_workflow_id,
                         target_workflow_id=workflow_id,
                         target_workflow_description=workflow.get("description", ""),
-                        solution_id=solution_id
+                        solution_id=solution_id,
+                        fast=fast_handoff
                     )
             
             # For research mode: Initialize agent memory before execution
@@ -264,7 +270,8 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
                         solution_id=solution_id,
                         workflow_id=workflow_id,
                         agent_node_id=first_agent_node.get("id", ""),
-                        workflow_description=workflow.get("description", "")
+                        workflow_description=workflow.get("description", ""),
+                        communication_config=solution.get("communication_config", {})
                     )
             
             # Execute workflow with actual orchestrator
@@ -278,6 +285,14 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
                     solution_metrics.token_count += wf_metrics.get("token_usage_count", 0)
                     solution_metrics.token_input += wf_metrics.get("token_input_count", 0)
                     solution_metrics.token_output += wf_metrics.get("token_output_count", 0)
+                    solution_metrics.token_cached += wf_metrics.get("token_cached_count", 0)
+                    solution_metrics.token_cache_write += wf_metrics.get("token_cache_write_count", 0)
+                    solution_metrics.token_estimated += wf_metrics.get("token_estimated_count", 0)
+                    solution_metrics.llm_cache_hits += wf_metrics.get("llm_cache_hits", 0)
+                    solution_metrics.llm_cache_misses += wf_metrics.get("llm_cache_misses", 0)
+                    solution_metrics.llm_cache_saved_tokens += wf_metrics.get("llm_cache_saved_tokens", 0)
+                    solution_metrics.llm_semantic_cache_hits += wf_metrics.get("llm_semantic_cache_hits", 0)
+                    solution_metrics.llm_coalesced_hits += wf_metrics.get("llm_coalesced_hits", 0)
                     solution_metrics.tool_invocations.extend([{"workflow": workflow_id}] * wf_metrics.get("tool_invocation_count", 0))
                     solution_metrics.errors.extend(wf_metrics.get("errors", []))
                     solution_metrics.warnings.extend(wf_metrics.get("warnings", []))
@@ -298,14 +313,15 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
                     metadata={"query": query, "position": i + 1}
                 )
             else:
-                # KAG: Invoke KAG to extract facts
-                storage_result = communication_service.invoke_kag(
+                # KAG: Extract facts in the background while the next workflow runs
+                kag_tasks.append((len(execution_results), communication_service.ingest_in_background(
                     workflow_output=workflow_output,
                     workflow_name=workflow.get("name", workflow_id),
                     solution_id=solution_id,
                     workflow_id=workflow_id,
                     context=f"Workflow {i+1} of {len(solution['workflows'])}"
-                )
+                )))
+                storage_result = {"status": "pending"}
             
             execution_results.append({
                 "workflow_id": workflow_id,
@@ -320,14 +336,21 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
                 "metrics": result.get("metrics", {}) if 'result' in locals() else {}
             })
         
+        # The summary needs every workflow's memory
+        for index, task in kag_tasks:
+            execution_results[index]["storage_result"] = await task
+        
         # End solution metrics tracking
         solution_metrics.end()
         aggregated_metrics = solution_metrics.calculate_metrics(
             task_completed=(len(solution_metrics.errors) == 0)
         )
         
-        # Get solution summary
-        summary = communication_service.get_solution_summary(solution_id)
+        # Get solution summary (KAG summarizes with Gemini asynchronously)
+        if solution_type == "research":
+            summary = communication_service.get_solution_summary(solution_id)
+        else:
+            summary = await communication_service.get_solution_summary(solution_id, wait=True)
         
         return {
             "solution_id": solution_id,
@@ -355,14 +378,18 @@ async def execute_solution(solution_id: str, query: str = "Execute solution"):
 
 
 @router.get("/{solution_id}/summary")
-async def get_solution_summary(solution_id: str):
-    """Get AI-powered summary of all workflow executions in a solution."""
+async def get_solution_summary(solution_id: str, wait: bool = False):
+    """Get AI-powered summary of all workflow executions in a solution.
+    
+    Returns the cached rolling summary; ``summary_stale`` is set while newer
+    workflow memories are still being merged in (``wait`` waits for them).
+    """
     solution = load("solutions", solution_id)
     if not solution:
         raise HTTPException(status_code=404, detail="Solution not found")
     
     kag_service = get_kag_service()
-    summary = kag_service.get_solution_summary(solution_id)
+    summary = await kag_service.get_solution_summary(solution_id, wait=wait)
     
     return summary
 
@@ -423,6 +450,8 @@ async def solution_websocket(websocket: WebSocket, solution_id: str):
                 
                 # Collect all workflow results for final summary
                 all_workflow_outputs = []
+                kag_tasks = []  # (index in all_workflow_outputs, background ingestion)
+                fast_handoff = data.get("fast_handoff")
                 
                 # Execute workflows and stream updates
                 for i, workflow_id in enumerate(solution["workflows"]):
@@ -456,11 +485,12 @@ async def solution_websocket(websocket: WebSocket, solution_id: str):
                             )
                         else:
                             # KAG handoff
-                            handoff_context = communication_service.prepare_handoff(
+                            handoff_context = await communication_service.prepare_handoff(
                                 source_workflow_id=previous_workflow_id,
                                 target_workflow_id=workflow_id,
                                 target_workflow_description=workflow.get("description", ""),
-                                solution_id=solution_id
+                                solution_id=solution_id,
+                                fast=fast_handoff
                             )
                         
                         await websocket.send_json({
@@ -480,7 +510,8 @@ async def solution_websocket(websocket: WebSocket, solution_id: str):
                                 solution_id=solution_id,
                                 workflow_id=workflow_id,
                                 agent_node_id=first_agent_node.get("id", ""),
-                                workflow_description=workflow.get("description", "")
+                                workflow_description=workflow.get("description", ""),
+                                communication_config=solution.get("communication_config", {})
                             )
                             
                             await websocket.send_json({
@@ -510,8 +541,11 @@ async def solution_websocket(websocket: WebSocket, solution_id: str):
                         if workflow.get("nodes") and len(workflow["nodes"]) > 0:
                             workflow["nodes"][0]["task"] = task_input
                         
-                        # Execute workflow
-                        result = await run_workflow(workflow, run_id)
+                        # Execute workflow, forwarding node events and token deltas
+                        async def forward_event(event: Dict[str, Any], wf_id: str = workflow_id):
+                            await websocket.send_json({**event, "event": event["type"], "type": "node_event", "workflow_id": wf_id})
+                        
+                        result = await run_workflow(workflow, run_id, on_event=forward_event)
                         
                         # Extract output
                         workflow_output = json.dumps(result.get("results", result.get("result", "")))
@@ -530,13 +564,14 @@ async def solution_websocket(websocket: WebSocket, solution_id: str):
                             metadata={"query": user_query, "position": i + 1}
                         )
                     else:
-                        storage_result = communication_service.invoke_kag(
+                        kag_tasks.append((len(all_workflow_outputs), communication_service.ingest_in_background(
                             workflow_output=workflow_output,
                             workflow_name=workflow.get("name", workflow_id),
                             solution_id=solution_id,
                             workflow_id=workflow_id,
                             context=f"Workflow {i+1} of {len(solution['workflows'])}"
-                        )
+                        )))
+                        storage_result = {"status": "pending"}
                     
                     # Prepare message to send
                     workflow_message = {
@@ -560,8 +595,22 @@ async def solution_websocket(websocket: WebSocket, solution_id: str):
                         "storage_result": storage_result
                     })
                 
+                # Report background KAG results as they land
+                for index, task in kag_tasks:
+                    entry = all_workflow_outputs[index]
+                    entry["storage_result"] = await task
+                    await websocket.send_json({
+                        "type": "workflow_memory_stored",
+                        "workflow_id": entry["workflow_id"],
+                        "workflow_name": entry["workflow_name"],
+                        "storage_result": entry["storage_result"]
+                    })
+                
                 # Send final summary
-                summary = communication_service.get_solution_summary(solution_id)
+                if solution_type == "research":
+                    summary = communication_service.get_solution_summary(solution_id)
+                else:
+                    summary = await communication_service.get_solution_summary(solution_id, wait=True)
                 
                 # Calculate aggregated metrics
                 from app.services.metrics_service import create_metrics_tracker
@@ -4,6 +4,7 @@ from app.storage import save, load, list_all, delete
 from app.services.orchestrator import run_workflow
 from app.services.output_formatter import output_formatter
 from app.services.kag_service import get_kag_service, invoke_kag
+from app.services.batch_inference import create_batch_run, get_batch_status, start_batch_run
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 import uuid
@@ -53,6 +54,10 @@ class RunRequest(BaseModel):
     previous_workflow_id: Optional[str] = None  # For handoff
 
 
+class BatchRunRequest(BaseModel):
+    queries: List[str]  # One workflow run per query
+
+
 class CommunicateRequest(BaseModel):
     source_workflow_id: str
     target_workflow_id: str
@@ -98,6 +103,26 @@ async def get_run(run_id: str):
     return data
 
 
+@router.get("/batches/{batch_id}")
+async def get_batch_run(batch_id: str):
+    """Get the progress of a batch run"""
+    status = get_batch_status(batch_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Batch run not found")
+    return status
+
+
+@router.post("/batches/{batch_id}/resume")
+async def resume_batch_run(batch_id: str):
+    """Resume an interrupted batch run; finished inputs and answered LLM requests are not redone"""
+    status = get_batch_status(batch_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Batch run not found")
+    if status["status"] == "running":
+        start_batch_run(batch_id)
+    return get_batch_status(batch_id)
+
+
 @router.get("/{workflow_id}", response_model=WorkflowDef)
 async def get_workflow(workflow_id: str):
     data = load("workflows", workflow_id)
@@ -143,7 +168,7 @@ async def run_workflow_endpoint(
     context_data = None
     if request.solution_id and request.previous_workflow_id:
         kag_service = get_kag_service()
-        handoff = kag_service.prepare_handoff(
+        handoff = await kag_service.prepare_handoff(
             source_workflow_id=request.previous_workflow_id,
             target_workflow_id=workflow_id,
             target_workflow_description=data.get("description", ""),
@@ -189,7 +214,7 @@ async def run_workflow_endpoint(
         workflow_name = data.get("name", workflow_id)
         raw_output = json.dumps(result.get("results", result.get("result", "")))
         
-        kag_result = invoke_kag(
+        kag_result = await invoke_kag(
             workflow_output=raw_output,
             workflow_name=workflow_name,
             solution_id=request.solution_id,
@@ -241,6 +266,27 @@ async def run_workflow_endpoint(
     return result
 
 
+@router.post("/{workflow_id}/batch")
+async def run_workflow_batch(workflow_id: str, request: BatchRunRequest):
+    """
+    Run a workflow once per query in offline batch mode.
+    
+    For bulk workloads where throughput and cost matter more than latency:
+    LLM calls of all runs are collected into provider batch jobs (JSONL),
+    submitted and polled in the background. Returns immediately; follow the
+    progress at ``GET /workflows/batches/{batch_id}``. Each finished run is
+    saved like a regular run under ``{batch_id}-{index}``.
+    """
+    if not load("workflows", workflow_id):
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    
+    state = create_batch_run(workflow_id, request.queries)
+    start_batch_run(state["id"])
+    return get_batch_status(state["id"])
+
+
 @router.post("/communicate", response_model=Dict[str, Any])
 async def communicate_workflows(request: CommunicateRequest):
     """
@@ -258,7 +304,7 @@ async def communicate_workflows(request: CommunicateRequest):
     target_description = request.target_task or target_data.get("description", "")
     
     # Prepare handoff
-    handoff_data = kag_service.prepare_handoff(
+    handoff_data = await kag_service.prepare_handoff(
         source_workflow_id=request.source_workflow_id,
         target_workflow_id=request.target_workflow_id,
         target_workflow_description=target_description,
@@ -282,14 +328,31 @@ async def communicate_workflows(request: CommunicateRequest):
     }
 
 
+@router.get("/communicate/cache")
+async def get_handoff_cache_stats():
+    """Hit rate of the cached KAG handoff reasoning"""
+    return get_kag_service().handoff_cache.get_stats()
+
+
 @router.get("/solution/{solution_id}/summary")
 async def get_solution_summary(solution_id: str):
     """Get comprehensive summary of all workflows in a solution"""
     kag_service = get_kag_service()
-    summary = kag_service.get_solution_summary(solution_id)
+    summary = await kag_service.get_solution_summary(solution_id)
     return summary
 
 
+@router.get("/solution/{solution_id}/graph")
+async def get_solution_graph(solution_id: str, query: str = Query(..., description="Text to find related facts for")):
+    """Knowledge-graph subgraph of a solution relevant to a query"""
+    kag_service = get_kag_service()
+    return {
+        "solution_id": solution_id,
+        "graph_available": kag_service.kg_manager.is_available(),
+        **kag_service.kg_manager.get_subgraph(solution_id, query)
+    }
+
+
 @router.delete("/solution/{solution_id}/memory")
 async def clear_solution_memory(solution_id: str):
     """Clear conversation memory for a solution"""
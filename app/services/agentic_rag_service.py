@@ -5,18 +5,21 @@ This service provides lightweight RAG (Retrieval-Augmented Generation) for workf
 Unlike the KAG+Buffer approach, this uses:
 - Simple chunking strategy for text processing
 - TF-IDF based embeddings (no LLM required)
-- Cosine similarity for retrieval
+- Cosine similarity or BM25 for retrieval (communication_config["ranking"])
 - Memory initialization at agent node start
 - Context-aware handoffs
 """
 
 import json
 import re
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
 from collections import Counter
 import math
 
+from app.services import rag_index
+from app.services.rag_index import BM25Index, InvertedIndex, VectorIndex, create_index
+
 
 class AgenticRAGService:
     """
@@ -29,6 +32,10 @@ class AgenticRAGService:
         # In-memory storage for workflow outputs
         self.workflow_memory: Dict[str, List[Dict[str, Any]]] = {}
         self.solution_contexts: Dict[str, Dict[str, Any]] = {}
+        # Inverted index of each solution's output chunks, updated on store
+        self.indexes: Dict[str, Union[InvertedIndex, VectorIndex]] = {}
+        # BM25 indexes, built for solutions that rank with BM25
+        self.bm25_indexes: Dict[str, BM25Index] = {}
         
         # Simple stopwords for text processing
         self.stopwords = set([
@@ -118,6 +125,22 @@ class AgenticRAGService:
         
         return dot_product / (mag1 * mag2)
     
+    def _get_index(self, solution_key: str, ranking: str = "tfidf") -> Union[InvertedIndex, VectorIndex, BM25Index]:
+        """The solution's chunk index for ``ranking``, built from stored records if missing."""
+        indexes = self.bm25_indexes if ranking == "bm25" else self.indexes
+        index = indexes.get(solution_key)
+        if index is None:
+            index = indexes[solution_key] = BM25Index(self._tokenize) if ranking == "bm25" else create_index(self._tokenize)
+            for record in self.workflow_memory.get(solution_key, []):
+                self._index_record(index, record)
+        return index
+    
+    def _index_record(self, index: Union[InvertedIndex, VectorIndex, BM25Index], record: Dict[str, Any]):
+        index.add(self._chunk_text(record.get('raw_output', '')), {
+            'workflow_id': record['workflow_id'],
+            'workflow_name': record['workflow_name']
+        })
+    
     def _extract_key_info(self, text: str) -> Dict[str, Any]:
         """
         Lightweight extraction of key information from text.
@@ -154,17 +177,21 @@ class AgenticRAGService:
         solution_id: str, 
         workflow_id: str, 
         agent_node_id: str,
-        workflow_description: str = ""
+        workflow_description: str = "",
+        communication_config: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Initialize RAG memory for an agent node at the start of execution.
-        Retrieves relevant context from previous workflows using TF-IDF similarity.
+        Retrieves relevant context from previous workflows using TF-IDF similarity,
+        or BM25 when the solution's communication_config sets "ranking": "bm25".
         
         Args:
             solution_id: ID of the solution
             workflow_id: ID of the current workflow
             agent_node_id: ID of the agent node being initialized
             workflow_description: Description of the workflow for context
+            communication_config: Solution settings; "ranking" ("tfidf" or "bm25"),
+                "bm25_k1", "bm25_b", "bm25_delta" and "bm25_min_score"
             
         Returns:
             Dict with retrieved memory and context
@@ -189,24 +216,14 @@ class AgenticRAGService:
         # Create query from workflow description
         query_text = f"{workflow_id} {workflow_description}"
         
-        # Retrieve relevant chunks using TF-IDF
+        config = communication_config or {}
+        ranking = config.get("ranking", rag_index.RAG_RANKING)
+        
+        # Retrieve relevant chunks from the solution's TF-IDF or BM25 index
         try:
-            # Collect all text chunks from previous workflows
-            all_chunks = []
-            chunk_sources = []
+            index = self._get_index(solution_key, ranking)
             
-            for record in workflow_history:
-                output_text = record.get('raw_output', '')
-                chunks = self._chunk_text(output_text)
-                
-                for chunk in chunks:
-                    all_chunks.append(chunk)
-                    chunk_sources.append({
-                        'workflow_id': record['workflow_id'],
-                        'workflow_name': record['workflow_name']
-                    })
-            
-            if not all_chunks:
+            if not len(index):
                 print(f"   No chunks found in previous workflows")
                 return {
                     "memory_type": "agentic_rag",
@@ -215,31 +232,30 @@ class AgenticRAGService:
                     "relevant_facts": []
                 }
             
-            # Compute TF-IDF for all chunks + query
-            documents = all_chunks + [query_text]
-            tfidf_vectors, _ = self._compute_tfidf(documents)
-            
-            # Query vector is the last one
-            query_vector = tfidf_vectors[-1]
-            chunk_vectors = tfidf_vectors[:-1]
-            
-            # Calculate similarity scores
-            similarities = []
-            for i, chunk_vector in enumerate(chunk_vectors):
-                sim = self._cosine_similarity(query_vector, chunk_vector)
-                similarities.append((i, sim, all_chunks[i], chunk_sources[i]))
-            
-            # Sort by similarity and get top 3
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            top_chunks = similarities[:3]
+            if ranking == "bm25":
+                # Top 3 chunks by BM25 score (unbounded, so no cosine threshold)
+                min_score = float(config.get("bm25_min_score", 0.0))
+                top_chunks = index.search(
+                    query_text, top_k=3, min_score=min_score,
+                    k1=float(config.get("bm25_k1", index.k1)),
+                    b=float(config.get("bm25_b", index.b)),
+                    delta=float(config.get("bm25_delta", index.delta))
+                )
+                retrieval_method = "bm25"
+            else:
+                # Top 3 chunks by cosine similarity
+                min_score = 0.1  # Threshold for relevance
+                top_chunks = index.search(query_text, top_k=3)
+                retrieval_method = "tfidf_cosine"
             
             # Build retrieved context
             relevant_facts = []
-            for idx, sim, chunk, source in top_chunks:
-                if sim > 0.1:  # Threshold for relevance
+            for chunk_id, sim in top_chunks:
+                if sim > min_score:
+                    chunk = index.chunks[chunk_id]
                     relevant_facts.append({
-                        'text': chunk[:200],  # First 200 chars
-                        'source': source['workflow_name'],
+                        'text': chunk['text'][:200],  # First 200 chars
+                        'source': chunk['workflow_name'],
                         'similarity': round(sim, 3)
                     })
             
@@ -256,8 +272,8 @@ class AgenticRAGService:
                 "retrieved_context": {
                     "relevant_facts": relevant_facts,
                     "context_summary": context_summary,
-                    "total_chunks_searched": len(all_chunks),
-                    "retrieval_method": "tfidf_cosine"
+                    "total_chunks_searched": len(index),
+                    "retrieval_method": retrieval_method
                 },
                 "workflow_history_count": len(workflow_history),
                 "relevant_facts": relevant_facts
@@ -314,7 +330,12 @@ class AgenticRAGService:
                 "metadata": metadata or {}
             }
             
+            index = self._get_index(solution_key)
+            bm25_index = self.bm25_indexes.get(solution_key)
             self.workflow_memory[solution_key].append(workflow_record)
+            self._index_record(index, workflow_record)
+            if bm25_index is not None:
+                self._index_record(bm25_index, workflow_record)
             
             print(f"   ✅ Stored workflow output with {len(insights.get('key_sentences', []))} key sentences")
             print(f"   📊 Extracted {len(insights.get('key_metrics', []))} metrics")
@@ -338,6 +359,9 @@ class AgenticRAGService:
                 "error": str(e)
             }
             self.workflow_memory[solution_key].append(workflow_record)
+            # Rebuilt from the records on next use
+            self.indexes.pop(solution_key, None)
+            self.bm25_indexes.pop(solution_key, None)
             
             return {
                 "stored": True,
@@ -531,6 +555,8 @@ class AgenticRAGService:
     def clear_solution_memory(self, solution_id: str):
         """Clear all memory for a solution."""
         solution_key = f"solution_{solution_id}"
+        self.indexes.pop(solution_key, None)
+        self.bm25_indexes.pop(solution_key, None)
         if solution_key in self.workflow_memory:
             del self.workflow_memory[solution_key]
             print(f"🗑️ [Agentic RAG] Cleared memory for solution {solution_id}")
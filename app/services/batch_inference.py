@@ -0,0 +1,606 @@
+"""
+Batch Inference
+Collects the LLM calls of batch runs into provider batch jobs (JSONL), submits
+and polls them, and feeds the results back to the waiting workflow nodes.
+Progress is persisted so a restarted batch run resumes where it stopped.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.storage import DATA_BASE
+
+BATCH_DIR = Path(os.getenv("BATCH_DIR", str(DATA_BASE / "batches")))
+# "local" runs jobs in-process; "provider" uses the Groq/Anthropic batch APIs where a key is configured
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "local").lower()
+# A job is submitted when this many requests are queued, or after BATCH_FLUSH_SECONDS
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "1000"))
+BATCH_FLUSH_SECONDS = float(os.getenv("BATCH_FLUSH_SECONDS", "2"))
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+# Workflow inputs of one batch run executing at the same time
+BATCH_RUN_CONCURRENCY = int(os.getenv("BATCH_RUN_CONCURRENCY", "500"))
+# Requests the local backend sends to the provider at the same time
+BATCH_LOCAL_CONCURRENCY = int(os.getenv("BATCH_LOCAL_CONCURRENCY", "8"))
+BATCH_RESUME_ON_STARTUP = os.getenv("BATCH_RESUME_ON_STARTUP", "true").lower() == "true"
+
+OPENAI_BATCH_ENDPOINT = "/v1/chat/completions"
+
+_current_batch: ContextVar[Optional["BatchCollector"]] = ContextVar("current_batch", default=None)
+
+
+class BatchError(Exception):
+    """A batch job or one of its requests failed"""
+
+
+def current_batch() -> Optional["BatchCollector"]:
+    """Collector of the batch run the current task belongs to, if any"""
+    return _current_batch.get()
+
+
+@contextmanager
+def batch_mode(collector: "BatchCollector"):
+    """Route LLMClient calls made in this context (and tasks it spawns) through ``collector``"""
+    token = _current_batch.set(collector)
+    try:
+        yield collector
+    finally:
+        _current_batch.reset(token)
+
+
+def provider_family(provider: str) -> str:
+    return "anthropic" if provider == "anthropic" or provider.startswith("claude") else provider
+
+
+def request_id(provider: str, body: Dict[str, Any]) -> str:
+    """Deterministic custom_id: a replayed run asks for the same ids, so finished work is reused"""
+    raw = json.dumps([provider, body], sort_keys=True, default=str)
+    return "req-" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def to_batch_line(provider: str, custom_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """One request in the provider's batch input format"""
+    if provider_family(provider) == "anthropic":
+        return {"custom_id": custom_id, "params": body}
+    return {"custom_id": custom_id, "method": "POST", "url": OPENAI_BATCH_ENDPOINT, "body": body}
+
+
+def parse_result_line(line: Dict[str, Any]) -> Tuple[str, Optional[Dict], Optional[str]]:
+    """``(custom_id, response body, error)`` from an OpenAI/Groq or Anthropic batch output line"""
+    custom_id = line.get("custom_id", "")
+    if "result" in line:
+        result = line.get("result") or {}
+        if result.get("type") == "succeeded":
+            return custom_id, result.get("message") or {}, None
+        return custom_id, None, json.dumps(result.get("error") or result.get("type") or "errored")
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code", 200) >= 400:
+        return custom_id, None, json.dumps(line.get("error") or response.get("body"))
+    return custom_id, response.get("body") or {}, None
+
+
+def _write_json(path: Path, data: Any):
+    """Write atomically so a crash never leaves half a progress file"""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, default=str), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    lines = []
+    for raw in path.read_text(encoding="utf-8").splitlines():
+        try:
+            lines.append(json.loads(raw))
+        except ValueError:
+            continue  # torn last line after a crash
+    return lines
+
+
+def _job_counts(jobs_dir: Path) -> Dict[str, int]:
+    """Number of jobs per status"""
+    counts: Dict[str, int] = {}
+    for state_path in jobs_dir.glob("*.json"):
+        status = BatchJob.load(state_path).status
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+class BatchJob:
+    """One submitted batch: its input/output JSONL files and lifecycle state"""
+
+    def __init__(self, directory: Path, provider: str, job_id: Optional[str] = None):
+        self.directory = directory
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.provider = provider
+        self.backend = ""
+        self.status = "collected"  # collected -> submitted -> completed | failed
+        self.provider_batch_id: Optional[str] = None
+        self.output_ref: Optional[str] = None
+        self.custom_ids: List[str] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def state_path(self) -> Path:
+        return self.directory / f"{self.id}.json"
+
+    @property
+    def input_path(self) -> Path:
+        return self.directory / f"{self.id}.input.jsonl"
+
+    @property
+    def output_path(self) -> Path:
+        return self.directory / f"{self.id}.output.jsonl"
+
+    def save(self):
+        self.updated_at = time.time()
+        _write_json(self.state_path, {
+            "id": self.id,
+            "provider": self.provider,
+            "backend": self.backend,
+            "status": self.status,
+            "provider_batch_id": self.provider_batch_id,
+            "output_ref": self.output_ref,
+            "custom_ids": self.custom_ids,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        })
+
+    @classmethod
+    def load(cls, state_path: Path) -> "BatchJob":
+        data = json.loads(state_path.read_text(encoding="utf-8"))
+        job = cls(state_path.parent, data["provider"], data["id"])
+        for key in ("backend", "status", "provider_batch_id", "output_ref", "custom_ids", "error", "created_at", "updated_at"):
+            setattr(job, key, data.get(key, getattr(job, key)))
+        return job
+
+    def write_input(self, requests: Dict[str, Dict[str, Any]]):
+        self.custom_ids = list(requests)
+        with self.input_path.open("w", encoding="utf-8") as f:
+            for custom_id, body in requests.items():
+                f.write(json.dumps(to_batch_line(self.provider, custom_id, body)) + "\n")
+
+    def read_input(self) -> List[Dict[str, Any]]:
+        return _read_jsonl(self.input_path)
+
+
+class LocalBatchBackend:
+    """Stand-in for a provider batch API.
+
+    Processes a job's input JSONL in the background by sending each request
+    to the provider's regular endpoint (or the mock provider without an API
+    key) and writes the output JSONL in the provider's batch output format.
+    A job interrupted by a restart is reprocessed from its input file.
+    """
+
+    name = "local"
+    poll_interval = 0.05
+
+    def __init__(self, concurrency: int = BATCH_LOCAL_CONCURRENCY):
+        self.concurrency = concurrency
+        self._tasks: Dict[str, "asyncio.Task"] = {}
+
+    async def submit(self, job: BatchJob) -> str:
+        self._start(job)
+        return f"local-{job.id}"
+
+    def _start(self, job: BatchJob):
+        self._tasks[job.id] = asyncio.get_running_loop().create_task(self._process(job))
+
+    async def _process(self, job: BatchJob):
+        from app.services.llm_client import execute_request
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        anthropic = provider_family(job.provider) == "anthropic"
+
+        async def run(line: Dict[str, Any]) -> Dict[str, Any]:
+            custom_id = line.get("custom_id", "")
+            async with semaphore:
+                try:
+                    body = await execute_request(job.provider, line.get("params") or line.get("body") or {})
+                except Exception as e:
+                    if anthropic:
+                        return {"custom_id": custom_id, "result": {"type": "errored", "error": {"message": str(e)[:200]}}}
+                    return {"custom_id": custom_id, "response": None, "error": {"message": str(e)[:200]}}
+            if anthropic:
+                return {"custom_id": custom_id, "result": {"type": "succeeded", "message": body}}
+            return {"id": f"batch_req_{custom_id}", "custom_id": custom_id, "response": {"status_code": 200, "body": body}, "error": None}
+
+        lines = await asyncio.gather(*(run(line) for line in job.read_input()))
+        tmp = job.output_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+        tmp.replace(job.output_path)
+
+    async def poll(self, job: BatchJob) -> bool:
+        """True once the output file is complete"""
+        if job.output_path.exists():
+            return True
+        task = self._tasks.get(job.id)
+        if task is None or task.get_loop().is_closed():
+            self._start(job)  # submitted before a restart
+        elif task.done():
+            if task.exception() is not None:
+                raise BatchError(f"local batch {job.id} failed: {task.exception()}")
+        return False
+
+    async def fetch(self, job: BatchJob) -> List[Dict[str, Any]]:
+        self._tasks.pop(job.id, None)
+        return _read_jsonl(job.output_path)
+
+
+class ProviderBatchBackend:
+    """Groq (OpenAI-compatible Files + Batches API) and Anthropic Message Batches"""
+
+    name = "provider"
+    poll_interval = BATCH_POLL_SECONDS
+
+    @staticmethod
+    def _endpoint(provider: str) -> Tuple[str, Dict[str, str]]:
+        from app.services.llm_client import GROQ_BASE_URL, ANTHROPIC_BASE_URL, _provider_key
+
+        key = _provider_key(provider)
+        if provider_family(provider) == "anthropic":
+            return f"{ANTHROPIC_BASE_URL}/v1/messages/batches", {"x-api-key": key, "anthropic-version": "2023-06-01"}
+        return GROQ_BASE_URL, {"Authorization": f"Bearer {key}"}
+
+    async def submit(self, job: BatchJob) -> str:
+        from app.services.http_pool import get_http_client as _http_client
+
+        base, headers = self._endpoint(job.provider)
+        client = _http_client()
+        if provider_family(job.provider) == "anthropic":
+            r = await client.post(base, headers=headers, json={"requests": job.read_input()})
+            r.raise_for_status()
+            return r.json()["id"]
+        r = await client.post(f"{base}/files", headers=headers, data={"purpose": "batch"},
+                              files={"file": (job.input_path.name, job.input_path.read_bytes(), "application/jsonl")})
+        r.raise_for_status()
+        r = await client.post(f"{base}/batches", headers=headers, json={
+            "input_file_id": r.json()["id"],
+            "endpoint": OPENAI_BATCH_ENDPOINT,
+            "completion_window": "24h"
+        })
+        r.raise_for_status()
+        return r.json()["id"]
+
+    async def poll(self, job: BatchJob) -> bool:
+        from app.services.http_pool import get_http_client as _http_client
+
+        base, headers = self._endpoint(job.provider)
+        if provider_family(job.provider) == "anthropic":
+            r = await _http_client().get(f"{base}/{job.provider_batch_id}", headers=headers)
+            r.raise_for_status()
+            j = r.json()
+            if j.get("processing_status") != "ended":
+                return False
+            job.output_ref = j.get("results_url")
+            return True
+        r = await _http_client().get(f"{base}/batches/{job.provider_batch_id}", headers=headers)
+        r.raise_for_status()
+        j = r.json()
+        status = j.get("status")
+        if status in ("failed", "expired", "cancelled") and not j.get("output_file_id"):
+            raise BatchError(f"batch {job.provider_batch_id} {status}: {j.get('errors')}")
+        if status not in ("completed", "failed", "expired", "cancelled"):
+            return False
+        job.output_ref = json.dumps([j.get("output_file_id"), j.get("error_file_id")])
+        return True
+
+    async def fetch(self, job: BatchJob) -> List[Dict[str, Any]]:
+        from app.services.http_pool import get_http_client as _http_client
+
+        base, headers = self._endpoint(job.provider)
+        if provider_family(job.provider) == "anthropic":
+            urls = [job.output_ref] if job.output_ref else []
+        else:
+            urls = [f"{base}/files/{file_id}/content" for file_id in json.loads(job.output_ref or "[]") if file_id]
+        lines = []
+        for url in urls:
+            r = await _http_client().get(url, headers=headers)
+            r.raise_for_status()
+            lines.extend(json.loads(raw) for raw in r.text.splitlines() if raw.strip())
+        return lines
+
+
+_local_backend = LocalBatchBackend()
+_provider_backend = ProviderBatchBackend()
+
+
+def backend_for(provider: str, backend: str = BATCH_BACKEND):
+    """Provider batch API when requested and a key is configured, otherwise the local stand-in"""
+    from app.services.llm_client import _provider_key
+
+    if backend == "provider" and provider_family(provider) in ("groq", "anthropic") and _provider_key(provider):
+        return _provider_backend
+    return _local_backend
+
+
+class BatchCollector:
+    """Queues LLM requests of a batch run and resolves them from batch jobs.
+
+    ``submit`` parks the caller on a future until its request's job completes.
+    Requests are keyed by a hash of the request body, so identical requests
+    share one line and a replayed run (after a restart) is answered from the
+    persisted ``results.jsonl`` without resubmitting anything. Jobs that were
+    submitted but not finished before a restart are polled again by ``resume``.
+    """
+
+    def __init__(self, directory: Path,
+                 max_requests: int = BATCH_MAX_REQUESTS,
+                 flush_seconds: float = BATCH_FLUSH_SECONDS,
+                 backend: str = BATCH_BACKEND):
+        self.directory = directory
+        self.jobs_dir = directory / "jobs"
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.results_path = directory / "results.jsonl"
+        self.max_requests = max_requests
+        self.flush_seconds = flush_seconds
+        self.backend = backend
+        self.results: Dict[str, Dict[str, Any]] = {}
+        for line in _read_jsonl(self.results_path):
+            self.results[line["custom_id"]] = line
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._futures: Dict[str, "asyncio.Future"] = {}
+        self._flush_timer: Optional["asyncio.Task"] = None
+        self._job_tasks: Dict[str, "asyncio.Task"] = {}
+        self.submitted_requests = 0
+        self.reused_results = 0
+
+    async def submit(self, provider: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a provider-format request body and wait for its response body"""
+        custom_id = request_id(provider, body)
+        if custom_id in self.results:
+            self.reused_results += 1
+            return self._unwrap(self.results[custom_id])
+        future = self._futures.get(custom_id)
+        if future is None:
+            future = self._futures[custom_id] = asyncio.get_running_loop().create_future()
+            queue = self._pending.setdefault(provider, {})
+            queue[custom_id] = body
+            if len(queue) >= self.max_requests:
+                self._flush(provider)
+            elif self._flush_timer is None or self._flush_timer.done():
+                self._flush_timer = asyncio.get_running_loop().create_task(self._flush_later())
+        return self._unwrap(await asyncio.shield(future))
+
+    @staticmethod
+    def _unwrap(record: Dict[str, Any]) -> Dict[str, Any]:
+        if record.get("error"):
+            raise BatchError(record["error"])
+        return record.get("body") or {}
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_seconds)
+        self.flush()
+
+    def flush(self):
+        """Submit everything queued so far"""
+        for provider in list(self._pending):
+            self._flush(provider)
+
+    def _flush(self, provider: str):
+        requests = self._pending.pop(provider, None)
+        if not requests:
+            return
+        job = BatchJob(self.jobs_dir, provider)
+        job.write_input(requests)
+        job.save()
+        self.submitted_requests += len(requests)
+        self._start(job)
+
+    def _start(self, job: BatchJob):
+        self._job_tasks[job.id] = asyncio.get_running_loop().create_task(self._run_job(job))
+
+    async def _run_job(self, job: BatchJob):
+        backend = _local_backend if job.backend == "local" else backend_for(job.provider, self.backend)
+        try:
+            if job.status == "collected":
+                job.backend = backend.name
+                job.provider_batch_id = await backend.submit(job)
+                job.status = "submitted"
+                job.save()
+            while not await backend.poll(job):
+                await asyncio.sleep(backend.poll_interval)
+            lines = await backend.fetch(job)
+
+            # Only successes are persisted: a replayed run retries failed requests
+            seen = set()
+            with self.results_path.open("a", encoding="utf-8") as f:
+                for line in lines:
+                    custom_id, body, error = parse_result_line(line)
+                    record = {"custom_id": custom_id, "body": body, "error": error}
+                    if error is None:
+                        f.write(json.dumps(record) + "\n")
+                    self._resolve(record, persist=error is None)
+                    seen.add(custom_id)
+            for custom_id in set(job.custom_ids) - seen:
+                self._resolve({"custom_id": custom_id, "error": "missing from batch output"}, persist=False)
+            job.status = "completed"
+            job.save()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)[:500]
+            job.save()
+            for custom_id in job.custom_ids:
+                self._resolve({"custom_id": custom_id, "error": job.error}, persist=False)
+        finally:
+            self._job_tasks.pop(job.id, None)
+
+    def _resolve(self, record: Dict[str, Any], persist: bool = True):
+        custom_id = record["custom_id"]
+        if persist:
+            self.results[custom_id] = record
+        future = self._futures.pop(custom_id, None)
+        if future is not None and not future.done():
+            future.set_result(record)
+
+    def resume(self):
+        """Poll jobs left unfinished by a previous process; their requests are not resubmitted"""
+        for state_path in sorted(self.jobs_dir.glob("*.json")):
+            job = BatchJob.load(state_path)
+            if job.status not in ("collected", "submitted") or job.id in self._job_tasks:
+                continue
+            for custom_id in job.custom_ids:
+                if custom_id not in self.results and custom_id not in self._futures:
+                    self._futures[custom_id] = asyncio.get_running_loop().create_future()
+            self._start(job)
+
+    async def close(self):
+        if self._flush_timer and not self._flush_timer.done():
+            self._flush_timer.cancel()
+        for task in list(self._job_tasks.values()):
+            task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": _job_counts(self.jobs_dir),
+            "queued_requests": sum(len(queue) for queue in self._pending.values()),
+            "waiting_requests": len(self._futures),
+            "submitted_requests": self.submitted_requests,
+            "completed_requests": len(self.results),
+            "reused_results": self.reused_results
+        }
+
+
+# Batch runs executing in this process
+_active_runs: Dict[str, "asyncio.Task"] = {}
+
+
+def _run_dir(batch_id: str) -> Path:
+    return BATCH_DIR / batch_id
+
+
+def create_batch_run(workflow_id: str, queries: List[str]) -> Dict[str, Any]:
+    """Persist a new batch run of ``workflow_id`` over ``queries``"""
+    batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+    _run_dir(batch_id).mkdir(parents=True, exist_ok=True)
+    state = {
+        "id": batch_id,
+        "workflow_id": workflow_id,
+        "queries": queries,
+        "status": "running",
+        "completed": {},
+        "failed": {},
+        "created_at": time.time(),
+        "updated_at": time.time()
+    }
+    _write_json(_run_dir(batch_id) / "run.json", state)
+    return state
+
+
+def load_batch_run(batch_id: str) -> Optional[Dict[str, Any]]:
+    path = _run_dir(batch_id) / "run.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def get_batch_status(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Progress of a batch run and its jobs"""
+    state = load_batch_run(batch_id)
+    if state is None:
+        return None
+    return {
+        "id": batch_id,
+        "workflow_id": state["workflow_id"],
+        "status": state["status"],
+        "total": len(state["queries"]),
+        "completed": len(state["completed"]),
+        "failed": len(state["failed"]),
+        "run_ids": state["completed"],
+        "jobs": _job_counts(_run_dir(batch_id) / "jobs"),
+        "active": batch_id in _active_runs
+    }
+
+
+async def run_batch(batch_id: str) -> Dict[str, Any]:
+    """Execute (or resume) a batch run: every input runs the workflow with batched LLM calls.
+
+    Inputs that already finished are skipped; the rest replay their workflow,
+    and LLM requests answered before the restart resolve from ``results.jsonl``.
+    """
+    from app.storage import load, save
+    from app.services.orchestrator import orchestrator
+
+    state = load_batch_run(batch_id)
+    if state is None:
+        raise BatchError(f"batch run {batch_id} not found")
+    workflow = load("workflows", state["workflow_id"])
+    if not workflow:
+        raise BatchError(f"workflow {state['workflow_id']} not found")
+
+    collector = BatchCollector(_run_dir(batch_id), BATCH_MAX_REQUESTS, BATCH_FLUSH_SECONDS, BATCH_BACKEND)
+    collector.resume()
+    semaphore = asyncio.Semaphore(BATCH_RUN_CONCURRENCY)
+
+    def persist():
+        state["updated_at"] = time.time()
+        _write_json(_run_dir(batch_id) / "run.json", state)
+
+    async def run_one(index: int, query: str):
+        key = str(index)
+        if key in state["completed"]:
+            return
+        async with semaphore:
+            definition = json.loads(json.dumps(workflow))
+            if query and definition.get("nodes"):
+                definition["nodes"][0]["task"] = query
+            run_id = f"{batch_id}-{index}"
+            with batch_mode(collector):
+                try:
+                    result = await orchestrator.run_workflow(definition, run_id)
+                except Exception as e:
+                    state["failed"][key] = str(e)[:500]
+                    persist()
+                    return
+            save("runs", run_id, result)
+            state["completed"][key] = run_id
+            state["failed"].pop(key, None)
+            persist()
+
+    try:
+        await asyncio.gather(*(run_one(i, q) for i, q in enumerate(state["queries"])))
+        state["status"] = "completed" if not state["failed"] else "completed_with_errors"
+        persist()
+    finally:
+        await collector.close()
+        _active_runs.pop(batch_id, None)
+    return get_batch_status(batch_id)
+
+
+def start_batch_run(batch_id: str) -> "asyncio.Task":
+    """Run a batch in the background (once per process)"""
+    task = _active_runs.get(batch_id)
+    if task is None or task.done():
+        task = _active_runs[batch_id] = asyncio.get_running_loop().create_task(run_batch(batch_id))
+    return task
+
+
+def resume_batch_runs() -> List[str]:
+    """Restart batch runs that were still running when the process stopped"""
+    resumed = []
+    if not BATCH_DIR.exists():
+        return resumed
+    for run_path in BATCH_DIR.glob("*/run.json"):
+        try:
+            state = json.loads(run_path.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+        if state.get("status") == "running":
+            start_batch_run(state["id"])
+            resumed.append(state["id"])
+    return resumed
@@ -0,0 +1,119 @@
+"""
+Scoped Conversation Context Store
+Conversation contexts keyed by (scope, agent) where the scope is a workflow run
+or a chat session, with memory accounting and idle/LRU eviction
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+from app.services.conversation_context import ConversationContext
+
+CONTEXT_STORE_MAX_SCOPES = int(os.getenv("CONTEXT_STORE_MAX_SCOPES", "1000"))
+CONTEXT_STORE_MAX_BYTES = int(os.getenv("CONTEXT_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+CONTEXT_STORE_TTL_SECONDS = float(os.getenv("CONTEXT_STORE_TTL_SECONDS", "3600"))
+
+
+class _Scope:
+    """Contexts of one run/session and when it was last used"""
+
+    def __init__(self):
+        self.contexts: Dict[str, ConversationContext] = {}
+        self.last_used = time.time()
+
+    def size_bytes(self) -> int:
+        return sum(context.size_bytes for context in self.contexts.values())
+
+
+class ContextStore:
+    """Holds conversation contexts per scope so LLM clients stay stateless.
+
+    Each workflow run or chat session gets its own context per agent; nothing
+    is shared between scopes. Scopes idle longer than ``ttl_seconds`` are
+    dropped, and the least recently used scopes are evicted when the store
+    exceeds ``max_scopes`` or ``max_bytes`` of retained text.
+    """
+
+    def __init__(self,
+                 max_scopes: int = CONTEXT_STORE_MAX_SCOPES,
+                 max_bytes: int = CONTEXT_STORE_MAX_BYTES,
+                 ttl_seconds: float = CONTEXT_STORE_TTL_SECONDS):
+        self.max_scopes = max_scopes
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._scopes: "OrderedDict[str, _Scope]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.released = 0
+
+    def get(self, scope_id: str, agent_id: str) -> ConversationContext:
+        """Context of ``agent_id`` within ``scope_id``, created on first use"""
+        with self._lock:
+            scope = self._scopes.get(scope_id)
+            if scope is None:
+                scope = self._scopes[scope_id] = _Scope()
+            self._scopes.move_to_end(scope_id)
+            scope.last_used = time.time()
+            context = scope.contexts.get(agent_id)
+            if context is None:
+                context = scope.contexts[agent_id] = ConversationContext()
+            self._evict(keep=scope_id)
+            return context
+
+    def release(self, scope_id: str) -> bool:
+        """Drop every context of a finished run or deleted session"""
+        with self._lock:
+            scope = self._scopes.pop(scope_id, None)
+        if scope is None:
+            return False
+        for context in scope.contexts.values():
+            context.clear()
+        self.released += 1
+        return True
+
+    def _evict(self, keep: str):
+        now = time.time()
+        for scope_id in [s for s, scope in self._scopes.items() if now - scope.last_used > self.ttl_seconds and s != keep]:
+            del self._scopes[scope_id]
+            self.evictions += 1
+        total = sum(scope.size_bytes() for scope in self._scopes.values())
+        while len(self._scopes) > 1 and (len(self._scopes) > self.max_scopes or total > self.max_bytes):
+            scope_id, scope = next(iter(self._scopes.items()))
+            if scope_id == keep:
+                break
+            del self._scopes[scope_id]
+            total -= scope.size_bytes()
+            self.evictions += 1
+
+    def size_bytes(self) -> int:
+        """Bytes of conversation text currently retained"""
+        with self._lock:
+            return sum(scope.size_bytes() for scope in self._scopes.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get memory accounting statistics"""
+        with self._lock:
+            scopes = list(self._scopes.values())
+        return {
+            "scopes": len(scopes),
+            "contexts": sum(len(scope.contexts) for scope in scopes),
+            "messages": sum(len(c.messages) for scope in scopes for c in scope.contexts.values()),
+            "size_bytes": sum(scope.size_bytes() for scope in scopes),
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "released": self.released
+        }
+
+
+# Global store instance
+_context_store = None
+
+
+def get_context_store() -> ContextStore:
+    """Get or create the global context store"""
+    global _context_store
+    if _context_store is None:
+        _context_store = ContextStore()
+    return _context_store
@@ -0,0 +1,221 @@
+"""
+Conversation Context Manager
+Keeps an LLM conversation within a token budget by folding older turns into a
+running summary, computed in the background by an extractive summarizer or a
+cheap model
+"""
+import os
+import re
+import asyncio
+import hashlib
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from app.services.tokenizer import count_tokens, count_message_tokens
+
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "3000"))
+# Most recent messages that are never folded into the summary
+LLM_CONTEXT_KEEP_RECENT = int(os.getenv("LLM_CONTEXT_KEEP_RECENT", "4"))
+LLM_SUMMARY_MAX_TOKENS = int(os.getenv("LLM_SUMMARY_MAX_TOKENS", "300"))
+# "extractive", or "provider[:model]" to summarize with a (cheaper) model
+LLM_SUMMARIZER = os.getenv("LLM_SUMMARIZER", "extractive")
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"\w+")
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "but", "is", "are", "was", "were", "be", "to", "of", "in",
+    "on", "for", "with", "it", "this", "that", "i", "you", "we", "they", "he", "she", "as",
+    "at", "by", "from", "so", "if", "do", "did", "can", "will", "my", "your", "me", "what"
+}
+
+# Summaries keyed by (summarizer, previous summary, folded turns)
+_summary_cache: "OrderedDict[str, str]" = OrderedDict()
+_SUMMARY_CACHE_SIZE = 256
+
+
+def extractive_summary(previous: str, messages: List[Dict[str, str]], max_tokens: int = LLM_SUMMARY_MAX_TOKENS) -> str:
+    """Keep the most informative sentences of the previous summary and the folded turns.
+
+    Sentences are scored by the average frequency of their content words across
+    all candidate text and kept in their original order up to ``max_tokens``.
+    """
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(previous) if s.strip()]
+    for msg in messages:
+        for sentence in _SENTENCE_SPLIT.split(str(msg.get("content", ""))):
+            if sentence.strip():
+                sentences.append(f"{msg.get('role', 'user')}: {sentence.strip()}")
+
+    def words(sentence: str) -> List[str]:
+        return [w for w in _WORD.findall(sentence.lower()) if w not in _STOPWORDS]
+
+    frequencies = Counter(w for s in sentences for w in set(words(s)))
+    scored = []
+    for i, sentence in enumerate(sentences):
+        terms = words(sentence)
+        score = sum(frequencies[w] for w in terms) / len(terms) if terms else 0.0
+        scored.append((score, i))
+
+    selected, used = [], 0
+    for score, i in sorted(scored, key=lambda x: (-x[0], x[1])):
+        cost = count_tokens(sentences[i])
+        if used + cost > max_tokens:
+            continue
+        selected.append(i)
+        used += cost
+    return "\n".join(sentences[i] for i in sorted(selected))
+
+
+async def model_summary(previous: str, messages: List[Dict[str, str]], provider: str, model: str,
+                        max_tokens: int = LLM_SUMMARY_MAX_TOKENS) -> str:
+    """Ask a model to fold ``messages`` into the running summary; extractive on failure"""
+    from app.services.llm_client import LLMClient
+
+    turns = "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages)
+    prompt = (
+        f"Update the running summary of a conversation. Keep facts, decisions, names and open "
+        f"questions; drop pleasantries. Answer with the summary only, at most {max_tokens} tokens.\n\n"
+        f"Current summary:\n{previous or '(none)'}\n\nNew turns:\n{turns}"
+    )
+    result = await LLMClient(provider=provider, model=model or None, temperature=0).generate(prompt, add_to_context=False)
+    if getattr(result, "usage_source", "none") == "none" or not str(result).strip():
+        return extractive_summary(previous, messages, max_tokens)
+    return str(result).strip()
+
+
+async def summarize(previous: str, messages: List[Dict[str, str]], summarizer: str = LLM_SUMMARIZER,
+                    max_tokens: int = LLM_SUMMARY_MAX_TOKENS) -> str:
+    """Fold ``messages`` into ``previous``; identical inputs are served from a cache"""
+    key = hashlib.sha256(repr((summarizer, max_tokens, previous, messages)).encode("utf-8")).hexdigest()
+    cached = _summary_cache.get(key)
+    if cached is not None:
+        _summary_cache.move_to_end(key)
+        return cached
+
+    if summarizer == "extractive":
+        summary = extractive_summary(previous, messages, max_tokens)
+    else:
+        provider, _, model = summarizer.partition(":")
+        summary = await model_summary(previous, messages, provider, model, max_tokens)
+
+    _summary_cache[key] = summary
+    while len(_summary_cache) > _SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+    return summary
+
+
+class ConversationContext:
+    """Token-budgeted conversation history with a rolling summary.
+
+    Turns are kept verbatim until the history exceeds ``token_budget``. Older
+    turns (all but the ``keep_recent`` newest) are then folded into a running
+    summary by a background task, so the request that crossed the budget does
+    not wait for it. Until the fold lands, ``window()`` trims the oldest turns
+    to stay within budget.
+    """
+
+    def __init__(self,
+                 token_budget: int = LLM_CONTEXT_TOKEN_BUDGET,
+                 keep_recent: int = LLM_CONTEXT_KEEP_RECENT,
+                 summarizer: str = LLM_SUMMARIZER,
+                 summary_max_tokens: int = LLM_SUMMARY_MAX_TOKENS):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+        self.summary_max_tokens = summary_max_tokens
+        self.messages: List[Dict[str, str]] = []
+        self.summary = ""
+        self.summarized_messages = 0
+        self._pending: Optional["asyncio.Task"] = None
+        self._generation = 0
+        # Bytes of retained text (messages + summary), for memory accounting
+        self.size_bytes = 0
+
+    def add(self, role: str, content: str):
+        self.messages.append({"role": role, "content": content})
+        self.size_bytes += len(content.encode("utf-8"))
+        if self.tokens() > self.token_budget:
+            self._schedule_compaction()
+
+    def clear(self):
+        if self._pending and not self._pending.done():
+            self._pending.cancel()
+        self._pending = None
+        self._generation += 1
+        self.messages = []
+        self.summary = ""
+        self.summarized_messages = 0
+        self.size_bytes = 0
+
+    def tokens(self) -> int:
+        """Tokens of the summary plus all unsummarized turns"""
+        return count_tokens(self.summary) + count_message_tokens(self.messages)
+
+    def summary_message(self) -> Optional[Dict[str, str]]:
+        if not self.summary:
+            return None
+        return {"role": "system", "content": SUMMARY_PREFIX + self.summary}
+
+    def window(self, include_summary: bool = True) -> List[Dict[str, str]]:
+        """Messages to send: the summary (as a system message) and the newest turns within budget"""
+        budget = self.token_budget
+        head = []
+        summary = self.summary_message()
+        if include_summary and summary:
+            head = [summary]
+            budget -= count_message_tokens(head)
+        turns: List[Dict[str, str]] = []
+        for msg in reversed(self.messages):
+            cost = count_message_tokens([msg])
+            if turns and cost > budget:
+                break
+            turns.append(dict(msg))
+            budget -= cost
+        return head + turns[::-1]
+
+    def _schedule_compaction(self):
+        if self._pending is not None and not self._pending.done() and not self._pending.get_loop().is_closed():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (synchronous caller) - fold inline with the extractive summarizer
+            self._fold(len(self._foldable()), extractive_summary(self.summary, self._foldable(), self.summary_max_tokens))
+            return
+        self._pending = loop.create_task(self.compact())
+
+    def _foldable(self) -> List[Dict[str, str]]:
+        return self.messages[:-self.keep_recent] if self.keep_recent else list(self.messages)
+
+    def _fold(self, count: int, summary: str):
+        self.summary = summary
+        self.messages = self.messages[count:]
+        self.summarized_messages += count
+        self.size_bytes = len(summary.encode("utf-8")) + sum(len(m["content"].encode("utf-8")) for m in self.messages)
+
+    async def compact(self):
+        """Fold all but the most recent turns into the running summary"""
+        folded = self._foldable()
+        if not folded:
+            return
+        generation = self._generation
+        summary = await summarize(self.summary, folded, self.summarizer, self.summary_max_tokens)
+        if generation != self._generation:
+            return  # cleared while summarizing
+        self._fold(len(folded), summary)
+
+    async def wait_for_compaction(self):
+        """Wait for a background fold in progress (tests and shutdown)"""
+        if self._pending is not None and not self._pending.done():
+            await self._pending
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "messages": len(self.messages),
+            "summarized_messages": self.summarized_messages,
+            "summary_tokens": count_tokens(self.summary),
+            "tokens": self.tokens(),
+            "token_budget": self.token_budget,
+            "size_bytes": self.size_bytes
+        }
@@ -1,16 +1,24 @@
 """
 Gemini API Client for Knowledge-Aided Generation (KAG)
-Handles fact extraction, reasoning, and summarization
+Handles fact extraction, reasoning, and summarization.
+All calls are async on the shared HTTP connection pool, so KAG work never
+blocks the event loop.
 """
 import os
 import re
+import ast
 import json
-import requests
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+
+from app.services.http_pool import get_http_client
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-2.0-flash:generateContent"
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+
+# Field names an endpoint that does not support structured output complains about
+_SCHEMA_FIELDS = re.compile(r"response_?schema|response_?mime_?type", re.IGNORECASE)
 
 
 class GeminiRequest(BaseModel):
@@ -26,6 +34,54 @@ class GeminiResponse(BaseModel):
     facts: List[str] = Field(description="List of key facts extracted from the output")
     reasoning: str = Field(description="Analysis and insights about the output")
     raw_response: Optional[str] = None
+    # How the response was read: "schema" (valid JSON), "repaired", "text" (line parsing) or "error"
+    parse_mode: Optional[str] = None
+
+
+class FactExtraction(BaseModel):
+    """Strict shape of a single-pass extraction"""
+    summary: str = Field(min_length=1)
+    facts: List[str]
+    reasoning: str
+
+
+# Gemini responseSchema (OpenAPI subset) for FactExtraction
+EXTRACTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": {"type": "STRING", "description": "Concise summary (2-3 sentences)"},
+        "facts": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "3-5 key facts"},
+        "reasoning": {"type": "STRING", "description": "Brief analysis and insights"}
+    },
+    "required": ["summary", "facts", "reasoning"],
+    "propertyOrdering": ["summary", "facts", "reasoning"]
+}
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """Best-effort parse of almost-JSON model output.
+
+    Strips markdown fences and surrounding prose, then retries with trailing
+    commas removed, smart quotes straightened and finally as a Python literal
+    (single-quoted strings). Returns None when nothing parses.
+    """
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    candidate = text[start:end + 1]
+    candidate = candidate.replace("\u201c", '"').replace("\u201d", '"').replace("\u2019", "'")
+    candidate = re.sub(r",\s*([}\]])", r"\1", candidate)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(candidate)
+    except (ValueError, SyntaxError):
+        return None
 
 
 class GeminiClient:
@@ -35,14 +91,20 @@ class GeminiClient:
         self.api_key = api_key or GEMINI_API_KEY
         if not self.api_key:
             raise ValueError("Gemini API key not found. Set GEMINI_API_KEY environment variable.")
+        # Cleared when the endpoint rejects responseSchema; prompts then ask for JSON in text
+        self.schema_supported = True
     
-    def generate(self, prompt: str, temperature: float = 0.7) -> Dict[str, Any]:
+    async def generate(self, prompt: str, temperature: float = 0.7,
+                       response_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Generate content using Gemini 1.5 Flash
         
         Args:
             prompt: The input prompt
             temperature: Sampling temperature (0.0 to 1.0)
+            response_schema: Optional Gemini response schema; the model then answers with JSON.
+                If the endpoint rejects the schema fields (400), the request is retried
+                once without them and later calls on this client skip them.
             
         Returns:
             Dict containing the response
@@ -66,9 +128,20 @@ class GeminiClient:
                 "maxOutputTokens": 2048,
             }
         }
+        if response_schema and self.schema_supported:
+            payload["generationConfig"]["responseMimeType"] = "application/json"
+            payload["generationConfig"]["responseSchema"] = response_schema
         
+        import httpx
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            response = await get_http_client().post(url, headers=headers, json=payload, timeout=GEMINI_TIMEOUT_SECONDS)
+            if (response.status_code == 400 and "responseSchema" in payload["generationConfig"]
+                    and _SCHEMA_FIELDS.search(response.text)):
+                print("⚠️ Gemini endpoint rejected responseSchema; retrying with a plain JSON prompt")
+                self.schema_supported = False
+                del payload["generationConfig"]["responseMimeType"]
+                del payload["generationConfig"]["responseSchema"]
+                response = await get_http_client().post(url, headers=headers, json=payload, timeout=GEMINI_TIMEOUT_SECONDS)
             response.raise_for_status()
             
             data = response.json()
@@ -89,16 +162,20 @@ class GeminiClient:
                 "error": "No valid response generated"
             }
             
-        except requests.exceptions.RequestException as e:
+        except (httpx.HTTPError, ValueError) as e:
             return {
                 "text": "",
                 "error": str(e),
                 "raw": None
             }
     
-    def extract_facts(self, workflow_output: str, context: str = "") -> GeminiResponse:
+    async def extract_facts(self, workflow_output: str, context: str = "") -> GeminiResponse:
         """
-        Extract key facts and insights from workflow output
+        Extract summary, key facts and insights from workflow output in a single call
+        
+        The response is constrained to ``EXTRACTION_SCHEMA`` and validated
+        against ``FactExtraction``; malformed JSON goes through ``repair_json``
+        and, failing that, line-based parsing.
         
         Args:
             workflow_output: The output from a workflow execution
@@ -127,75 +204,79 @@ Format your response as JSON with these exact keys:
 }}
 """
         
-        result = self.generate(prompt, temperature=0.3)
+        result = await self.generate(prompt, temperature=0.3, response_schema=EXTRACTION_SCHEMA)
         
         if "error" in result:
             return GeminiResponse(
                 summary="Error extracting facts",
                 facts=[],
                 reasoning=f"Error: {result['error']}",
-                raw_response=str(result.get("raw"))
+                raw_response=str(result.get("raw")),
+                parse_mode="error"
             )
         
+        text = result["text"].strip()
         try:
-            # Try to parse JSON from response
-            text = result["text"].strip()
-            
-            # Extract JSON from markdown code blocks if present
-            if "```json" in text:
-                json_start = text.find("```json") + 7
-                json_end = text.find("```", json_start)
-                text = text[json_start:json_end].strip()
-            elif "```" in text:
-                json_start = text.find("```") + 3
-                json_end = text.find("```", json_start)
-                text = text[json_start:json_end].strip()
-            
-            parsed = json.loads(text)
-            
-            return GeminiResponse(
-                summary=parsed.get("summary", ""),
-                facts=parsed.get("facts", []),
-                reasoning=parsed.get("reasoning", ""),
-                raw_response=result["text"]
-            )
-            
-        except json.JSONDecodeError:
-            # Fallback: parse text manually
-            lines = result["text"].split("\n")
-            summary = ""
-            facts = []
-            reasoning = ""
-            
-            current_section = None
-            for line in lines:
-                line = line.strip()
-                if "summary" in line.lower() and ":" in line:
-                    current_section = "summary"
-                    summary = line.split(":", 1)[1].strip()
-                elif "fact" in line.lower() and (":" in line or "-" in line):
-                    current_section = "facts"
-                    fact = line.split(":", 1)[-1].strip() if ":" in line else line.lstrip("- ").strip()
-                    if fact and not "fact" in fact.lower():
-                        facts.append(fact)
-                elif "reasoning" in line.lower() and ":" in line:
-                    current_section = "reasoning"
-                    reasoning = line.split(":", 1)[1].strip()
-                elif current_section == "summary" and line:
-                    summary += " " + line
-                elif current_section == "facts" and (line.startswith("-") or line.startswith("•")):
-                    facts.append(line.lstrip("-•").strip())
-                elif current_section == "reasoning" and line:
-                    reasoning += " " + line
-            
+            parsed = FactExtraction.model_validate_json(text)
+            parse_mode = "schema"
+        except ValidationError:
+            parsed = None
+            repaired = repair_json(text)
+            if isinstance(repaired, dict):
+                try:
+                    parsed = FactExtraction.model_validate(repaired)
+                    parse_mode = "repaired"
+                except ValidationError:
+                    parsed = None
+        
+        if parsed is not None:
             return GeminiResponse(
-                summary=summary or "Analysis completed",
-                facts=facts or ["No specific facts extracted"],
-                reasoning=reasoning or "No detailed reasoning available",
-                raw_response=result["text"]
+                summary=parsed.summary,
+                facts=[fact for fact in parsed.facts if fact.strip()],
+                reasoning=parsed.reasoning,
+                raw_response=result["text"],
+                parse_mode=parse_mode
             )
+        return self._parse_text_extraction(result["text"])
+    
+    @staticmethod
+    def _parse_text_extraction(text: str) -> GeminiResponse:
+        """Fallback: read summary, facts and reasoning from free-form text"""
+        lines = text.split("\n")
+        summary = ""
+        facts = []
+        reasoning = ""
+        
+        current_section = None
+        for line in lines:
+            line = line.strip()
+            if "summary" in line.lower() and ":" in line:
+                current_section = "summary"
+                summary = line.split(":", 1)[1].strip()
+            elif "fact" in line.lower() and (":" in line or "-" in line):
+                current_section = "facts"
+                fact = line.split(":", 1)[-1].strip() if ":" in line else line.lstrip("- ").strip()
+                if fact and not "fact" in fact.lower():
+                    facts.append(fact)
+            elif "reasoning" in line.lower() and ":" in line:
+                current_section = "reasoning"
+                reasoning = line.split(":", 1)[1].strip()
+            elif current_section == "summary" and line:
+                summary += " " + line
+            elif current_section == "facts" and (line.startswith("-") or line.startswith("•")):
+                facts.append(line.lstrip("-•").strip())
+            elif current_section == "reasoning" and line:
+                reasoning += " " + line
+        
+        return GeminiResponse(
+            summary=summary or "Analysis completed",
+            facts=facts or ["No specific facts extracted"],
+            reasoning=reasoning or "No detailed reasoning available",
+            raw_response=text,
+            parse_mode="text"
+        )
     
-    def summarize_conversation(self, messages: List[Dict[str, str]], workflow_context: str = "") -> str:
+    async def summarize_conversation(self, messages: List[Dict[str, str]], workflow_context: str = "") -> str:
         """
         Create a conversation summary from workflow interactions
         
@@ -220,10 +301,10 @@ Conversation:
 
 Provide a brief summary (3-6 sentences) that could be used as context for subsequent workflows."""
         
-        result = self.generate(prompt, temperature=0.5)
+        result = await self.generate(prompt, temperature=0.5)
         return result.get("text", "No summary available")
     
-    def reason_about_handoff(self, 
+    async def reason_about_handoff(self, 
                             source_workflow_summary: str,
                             source_facts: List[str],
                             target_workflow_description: str) -> Dict[str, Any]:
@@ -263,7 +344,7 @@ Respond with valid JSON in this exact format:
     "context": "Important context or constraints"
 }}"""
         
-        result = self.generate(prompt, temperature=0.7)
+        result = await self.generate(prompt, temperature=0.7)
         text = result.get("text", "{}")
         
         # Try to extract JSON from the response
@@ -0,0 +1,41 @@
+"""
+Shared HTTP Connection Pool
+One keep-alive httpx.AsyncClient per event loop for outbound provider calls
+(LLM providers, Gemini, batch APIs), so requests reuse connections and TLS sessions
+"""
+import os
+import asyncio
+import weakref
+
+# Connection pool size of the shared client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+
+# httpx clients cannot be shared across event loops
+_http_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """Shared keep-alive HTTP client for the running event loop"""
+    import httpx
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS)
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def close_http_clients():
+    """Close the pooled HTTP client of the running loop (application shutdown)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    client = _http_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
@@ -1,46 +1,112 @@
 """
 Knowledge-Aided Generation (KAG) Service with LangGraph
-Orchestrates fact extraction, reasoning, and memory management for workflow communication
+Orchestrates fact extraction, reasoning, and memory management for workflow communication.
+The graph nodes are async, so Gemini calls do not block other requests.
 """
-from typing import Dict, List, Any, Optional, TypedDict, Annotated
+from typing import Dict, List, Any, Optional, Tuple, Deque, TypedDict, Annotated
 from datetime import datetime
+import os
 import json
+import time
+import heapq
+import asyncio
+import hashlib
 import operator
+import itertools
+from collections import OrderedDict, deque
 
 from langgraph.graph import StateGraph, END
 from .gemini_client import get_gemini_client, GeminiResponse
+from .memory_store import SQLiteMemoryStore, create_memory_store
+from .knowledge_graph import get_kg_manager
+from .agentic_rag_service import get_agentic_rag_service
+from .tokenizer import count_tokens
+
+# Single-pass mode: keep the summary from the structured extraction and skip the
+# separate summary call; "false" always asks Gemini for a second summary pass
+KAG_SINGLE_PASS = os.getenv("KAG_SINGLE_PASS", "true").lower() == "true"
+# Fast handoff: hand the raw output (or already extracted facts) to the next
+# workflow instead of waiting for extraction and a Gemini handoff call
+KAG_FAST_HANDOFF = os.getenv("KAG_FAST_HANDOFF", "false").lower() == "true"
+KAG_FAST_HANDOFF_CHARS = int(os.getenv("KAG_FAST_HANDOFF_CHARS", "2000"))
+KAG_HANDOFF_CACHE_ENABLED = os.getenv("KAG_HANDOFF_CACHE_ENABLED", "true").lower() == "true"
+KAG_HANDOFF_CACHE_SIZE = int(os.getenv("KAG_HANDOFF_CACHE_SIZE", "512"))
+# Memories kept per workflow of a solution (0 keeps all)
+KAG_MEMORY_HISTORY = int(os.getenv("KAG_MEMORY_HISTORY", "50"))
+# Seconds a failed summary merge is not retried by reads of the summary
+KAG_SUMMARY_RETRY_SECONDS = float(os.getenv("KAG_SUMMARY_RETRY_SECONDS", "60"))
+# Characters of a workflow output used to look up related knowledge-graph facts
+KG_QUERY_CHARS = int(os.getenv("KG_QUERY_CHARS", "1000"))
+# Earlier memories/facts added to the extraction prompt: the top-k most similar
+# to the new output, within a token budget
+KAG_CONTEXT_TOP_K = int(os.getenv("KAG_CONTEXT_TOP_K", "5"))
+KAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("KAG_CONTEXT_TOKEN_BUDGET", "600"))
+KAG_CONTEXT_MIN_SCORE = float(os.getenv("KAG_CONTEXT_MIN_SCORE", "0.0"))
 
 
 class ConversationMemory:
-    """Manages conversation memory for workflow chains"""
+    """Manages conversation memory for workflow chains
+    
+    Memories are indexed solution -> workflow -> append-ordered deque, so a
+    workflow's history and a solution's memories are found without scanning
+    other solutions. Each workflow keeps its newest ``max_history`` entries.
+    
+    With a ``store`` every memory is written through to it, and a solution is
+    loaded from it on first access; later accesses pick up rows that other
+    workers added since.
+    """
+    
+    def __init__(self, max_history: int = KAG_MEMORY_HISTORY, store: Optional[SQLiteMemoryStore] = None):
+        self.max_history = max_history
+        self.store = store
+        # solution_id -> workflow_id -> deque of (sequence, memory)
+        self._solutions: Dict[str, Dict[str, Deque[Tuple[int, Dict[str, Any]]]]] = {}
+        self._sequence = itertools.count(1)
+        # solution_id -> last store row id loaded
+        self._synced: Dict[str, int] = {}
+    
+    def _append(self, solution_id: str, workflow_id: str, sequence: int, memory: Dict[str, Any]):
+        workflows = self._solutions.setdefault(solution_id, {})
+        history = workflows.get(workflow_id)
+        if history is None:
+            history = workflows[workflow_id] = deque(maxlen=self.max_history or None)
+        history.append((sequence, memory))
     
-    def __init__(self):
-        self.memories: Dict[str, List[Dict[str, Any]]] = {}
+    def _workflows(self, solution_id: str) -> Dict[str, Deque[Tuple[int, Dict[str, Any]]]]:
+        """A solution's index, synced with the store first"""
+        if self.store is not None:
+            for row_id, workflow_id, memory in self.store.load(solution_id, after=self._synced.get(solution_id, 0)):
+                self._append(solution_id, workflow_id, row_id, memory)
+                self._synced[solution_id] = row_id
+        return self._solutions.get(solution_id, {})
     
     def add_memory(self, solution_id: str, workflow_id: str, memory: Dict[str, Any]):
         """Add a memory entry for a workflow in a solution"""
-        key = f"{solution_id}:{workflow_id}"
-        if key not in self.memories:
-            self.memories[key] = []
-        
-        self.memories[key].append({
+        entry = {
             **memory,
             "timestamp": datetime.now().isoformat()
-        })
+        }
+        if self.store is None:
+            self._append(solution_id, workflow_id, next(self._sequence), entry)
+            return
+        
+        # Write through, then sync so rows of other workers stay in id order
+        self.store.append(solution_id, workflow_id, entry, keep=self.max_history)
+        self._workflows(solution_id)
     
     def get_memories(self, solution_id: str, workflow_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get memories for a solution or specific workflow"""
+        """Get memories for a solution or specific workflow, oldest first"""
+        workflows = self._workflows(solution_id)
         if workflow_id:
-            key = f"{solution_id}:{workflow_id}"
-            return self.memories.get(key, [])
+            return [memory for _, memory in workflows.get(workflow_id, ())]
         
-        # Get all memories for the solution
-        all_memories = []
-        for key, memories in self.memories.items():
-            if key.startswith(f"{solution_id}:"):
-                all_memories.extend(memories)
-        
-        return sorted(all_memories, key=lambda x: x.get("timestamp", ""))
+        # Interleave the workflows' histories in insertion order
+        return [memory for _, memory in heapq.merge(*workflows.values())]
+    
+    def get_latest(self, solution_id: str, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Most recent memory of a workflow"""
+        history = self._workflows(solution_id).get(workflow_id)
+        return history[-1][1] if history else None
     
     def get_solution_context(self, solution_id: str) -> str:
         """Get full context summary for a solution"""
@@ -56,20 +122,115 @@ class ConversationMemory:
     
     def clear_solution(self, solution_id: str):
         """Clear all memories for a solution"""
-        keys_to_delete = [key for key in self.memories.keys() if key.startswith(f"{solution_id}:")]
-        for key in keys_to_delete:
-            del self.memories[key]
+        self._solutions.pop(solution_id, None)
+        if self.store is not None:
+            self.store.delete_solution(solution_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "solutions": len(self._solutions),
+            "workflows": sum(len(workflows) for workflows in self._solutions.values()),
+            "memories": sum(len(h) for workflows in self._solutions.values() for h in workflows.values()),
+            "max_history": self.max_history,
+            "store": self.store.get_stats() if self.store is not None else None
+        }
 
 
-# Global conversation memory store
-_conversation_memory = ConversationMemory()
+# Global conversation memory store (persistent unless KAG_MEMORY_DB_PATH is empty)
+_conversation_memory = None
 
 
 def get_conversation_memory() -> ConversationMemory:
-    """Get the global conversation memory instance"""
+    """Get or create the global conversation memory instance"""
+    global _conversation_memory
+    if _conversation_memory is None:
+        _conversation_memory = ConversationMemory(store=create_memory_store())
     return _conversation_memory
 
 
+def memory_fingerprint(memory: Dict[str, Any]) -> str:
+    """Hash of a memory entry's content (its timestamp excluded)"""
+    content = {k: v for k, v in memory.items() if k != "timestamp"}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class HandoffCache:
+    """LRU cache of Gemini handoff reasoning.
+    
+    Entries are keyed by the source memory's content and the target description,
+    so re-running a solution or calling /communicate again with unchanged inputs
+    skips the Gemini call. Entries are indexed by source workflow and dropped
+    when that workflow stores a memory with different content.
+    """
+    
+    def __init__(self, max_entries: int = KAG_HANDOFF_CACHE_SIZE, enabled: bool = KAG_HANDOFF_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # solution_id -> workflow_id -> {cache key: memory fingerprint}
+        self._by_source: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def make_key(fingerprint: str, target_description: str, related_facts: Optional[List[str]] = None) -> str:
+        payload = json.dumps([fingerprint, target_description, related_facts or []])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry["value"])
+    
+    def set(self, solution_id: str, workflow_id: str, key: str, fingerprint: str, value: Dict[str, Any]):
+        if not self.enabled:
+            return
+        self._entries[key] = {"source": (solution_id, workflow_id), "value": dict(value)}
+        self._entries.move_to_end(key)
+        self._by_source.setdefault(solution_id, {}).setdefault(workflow_id, {})[key] = fingerprint
+        while len(self._entries) > self.max_entries:
+            old_key, old = self._entries.popitem(last=False)
+            old_solution, old_workflow = old["source"]
+            self._by_source.get(old_solution, {}).get(old_workflow, {}).pop(old_key, None)
+    
+    def invalidate(self, solution_id: str, workflow_id: Optional[str] = None, keep_fingerprint: Optional[str] = None):
+        """Drop entries of a source workflow (or a whole solution) not built from ``keep_fingerprint``"""
+        workflows = self._by_source.get(solution_id, {})
+        for source in ([workflow_id] if workflow_id is not None else list(workflows)):
+            keys = workflows.get(source, {})
+            for key in [k for k, fingerprint in keys.items() if fingerprint != keep_fingerprint]:
+                del keys[key]
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+            if not keys:
+                workflows.pop(source, None)
+        if not workflows:
+            self._by_source.pop(solution_id, None)
+    
+    def clear(self):
+        self._entries.clear()
+        self._by_source.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups > 0 else 0,
+            "invalidations": self.invalidations
+        }
+
+
 # LangGraph State Definition
 class KAGState(TypedDict):
     """State for KAG LangGraph workflow"""
@@ -84,15 +245,31 @@ class KAGState(TypedDict):
     reasoning: str
     memory_stored: bool
     error: Optional[str]
+    extraction_mode: Optional[str]
+    context_stats: Optional[Dict[str, int]]
 
 
 class KAGService:
     """Knowledge-Aided Generation Service using LangGraph for workflow intelligence"""
     
-    def __init__(self):
+    def __init__(self, single_pass: bool = KAG_SINGLE_PASS, fast_handoff: bool = KAG_FAST_HANDOFF):
         self.gemini_client = get_gemini_client()
         self.memory = get_conversation_memory()
+        self.kg_manager = get_kg_manager()
+        self.single_pass = single_pass
+        self.fast_handoff = fast_handoff
+        self.handoff_cache = HandoffCache()
         self.graph = self._build_kag_graph()
+        # Background ingestions still running, keyed like the memory store
+        # ("solution:workflow"), plus the newest one per solution
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._solution_tail: Dict[str, "asyncio.Task"] = {}
+        # The newest ingestion of a workflow if it failed, so handoffs do not
+        # silently fall back to an older memory of that workflow
+        self._failed: Dict[str, Dict[str, Any]] = {}
+        # Rolling solution summaries and the merge running for each solution
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._summary_tasks: Dict[str, "asyncio.Task"] = {}
     
     def _build_kag_graph(self) -> StateGraph:
         """Build the LangGraph workflow for KAG processing"""
@@ -108,16 +285,69 @@ class KAGService:
         # Define edges
         workflow.set_entry_point("retrieve_context")
         workflow.add_edge("retrieve_context", "extract_facts")
-        workflow.add_edge("extract_facts", "generate_summary")
+        workflow.add_conditional_edges(
+            "extract_facts",
+            self._route_after_extraction,
+            {"generate_summary": "generate_summary", "store_memory": "store_memory"}
+        )
         workflow.add_edge("generate_summary", "store_memory")
         workflow.add_edge("store_memory", END)
         
         return workflow.compile()
     
-    def _retrieve_context_node(self, state: KAGState) -> Dict[str, Any]:
-        """Node 1: Retrieve previous context from memory"""
+    def _rank_context(self, solution_id: str, query: str) -> Tuple[List[str], Dict[str, int]]:
+        """Earlier memories and related graph facts most similar to ``query``
+        
+        Candidates are scored by TF-IDF cosine similarity and the best ones are
+        kept, at most ``KAG_CONTEXT_TOP_K`` and ``KAG_CONTEXT_TOKEN_BUDGET``
+        tokens. Candidates sharing no terms with the query are pruned.
+        """
+        candidates = [f"[{m.get('workflow_name', 'Unknown')}]: {m.get('summary', '')}"
+                      for m in self.memory.get_memories(solution_id)]
+        candidates += [f"[{f['workflow_name']}] fact: {f['fact']}"
+                       for f in self.kg_manager.get_subgraph(solution_id, query)["facts"]]
+        candidates = list(dict.fromkeys(candidates))
+        
+        stats = {"candidates": len(candidates), "included": 0, "pruned": len(candidates),
+                 "context_tokens": 0, "pruned_tokens": sum(count_tokens(c) for c in candidates)}
+        if not candidates:
+            return [], stats
+        
+        rag = get_agentic_rag_service()
+        vectors, _ = rag._compute_tfidf(candidates + [query])
+        scores = [rag._cosine_similarity(vectors[-1], vector) for vector in vectors[:-1]]
+        # Most similar first; newer candidates win ties
+        ranked = sorted(range(len(candidates)), key=lambda i: (-scores[i], -i))
+        
+        selected = []
+        for i in ranked:
+            if len(selected) >= KAG_CONTEXT_TOP_K or scores[i] <= KAG_CONTEXT_MIN_SCORE:
+                break
+            tokens = count_tokens(candidates[i])
+            if stats["context_tokens"] + tokens > KAG_CONTEXT_TOKEN_BUDGET:
+                continue
+            selected.append(candidates[i])
+            stats["context_tokens"] += tokens
+        
+        stats.update({
+            "included": len(selected),
+            "pruned": len(candidates) - len(selected),
+            "pruned_tokens": stats["pruned_tokens"] - stats["context_tokens"]
+        })
+        return selected, stats
+    
+    async def _retrieve_context_node(self, state: KAGState) -> Dict[str, Any]:
+        """Node 1: Retrieve previous context from memory
+        
+        Only the earlier memories and knowledge-graph facts most relevant to this
+        workflow's output are included, so the prompt does not grow with history.
+        """
         try:
-            previous_context = self.memory.get_solution_context(state["solution_id"])
+            selected, context_stats = self._rank_context(
+                state["solution_id"],
+                f"{state['workflow_name']}\n{state['workflow_output'][:KG_QUERY_CHARS]}"
+            )
+            previous_context = "\n".join(selected)
             
             # Build full context
             full_context = state.get("context", "")
@@ -126,30 +356,42 @@ class KAGService:
             
             return {
                 "previous_context": previous_context,
-                "context": full_context
+                "context": full_context,
+                "context_stats": context_stats
             }
         except Exception as e:
             return {"error": f"Context retrieval failed: {str(e)}"}
     
-    def _extract_facts_node(self, state: KAGState) -> Dict[str, Any]:
+    async def _extract_facts_node(self, state: KAGState) -> Dict[str, Any]:
         """Node 2: Extract facts using Gemini"""
         if state.get("error"):
             return {}
         
         try:
-            result: GeminiResponse = self.gemini_client.extract_facts(
+            result: GeminiResponse = await self.gemini_client.extract_facts(
                 state["workflow_output"], 
                 state["context"]
             )
             
-            return {
+            update = {
                 "facts": result.facts,
-                "reasoning": result.reasoning
+                "reasoning": result.reasoning,
+                "extraction_mode": result.parse_mode
             }
+            # A validated (or repaired) structured extraction already carries the summary
+            if self.single_pass and result.parse_mode in ("schema", "repaired") and result.summary.strip():
+                update["summary"] = result.summary.strip()
+            return update
         except Exception as e:
             return {"error": f"Fact extraction failed: {str(e)}"}
     
-    def _generate_summary_node(self, state: KAGState) -> Dict[str, Any]:
+    def _route_after_extraction(self, state: KAGState) -> str:
+        """Skip the summary call when the extraction produced a summary (or failed)"""
+        if state.get("error") or state.get("summary"):
+            return "store_memory"
+        return "generate_summary"
+    
+    async def _generate_summary_node(self, state: KAGState) -> Dict[str, Any]:
         """Node 3: Generate summary from facts"""
         if state.get("error"):
             return {}
@@ -164,14 +406,16 @@ Output: {state['workflow_output'][:500]}
 
 Generate a 2-3 sentence summary."""
             
-            result = self.gemini_client.generate_content(summary_prompt)
+            result = await self.gemini_client.generate(summary_prompt)
+            if not result.get("text"):
+                raise ValueError(result.get("error", "empty summary"))
             
-            return {"summary": result.content}
+            return {"summary": result["text"].strip()}
         except Exception as e:
             # Fallback summary
             return {"summary": f"Workflow {state['workflow_name']} completed processing"}
     
-    def _store_memory_node(self, state: KAGState) -> Dict[str, Any]:
+    async def _store_memory_node(self, state: KAGState) -> Dict[str, Any]:
         """Node 4: Store results in memory"""
         if state.get("error"):
             return {"memory_stored": False}
@@ -191,6 +435,20 @@ Generate a 2-3 sentence summary."""
                 state["workflow_id"], 
                 memory_entry
             )
+            self.kg_manager.add_facts(
+                state["solution_id"],
+                state["workflow_id"],
+                state["workflow_name"],
+                memory_entry["facts"]
+            )
+            self._schedule_summary_merge(state["solution_id"])
+            self._failed.pop(f"{state['solution_id']}:{state['workflow_id']}", None)
+            # Handoffs reasoned from an older memory of this workflow are stale now
+            self.handoff_cache.invalidate(
+                state["solution_id"],
+                state["workflow_id"],
+                keep_fingerprint=memory_fingerprint(memory_entry)
+            )
             
             return {"memory_stored": True}
         except Exception as e:
@@ -199,7 +457,7 @@ Generate a 2-3 sentence summary."""
                 "error": f"Memory storage failed: {str(e)}"
             }
     
-    def invoke_kag(self, 
+    async def invoke_kag(self, 
                    workflow_output: str,
                    workflow_name: str,
                    solution_id: str,
@@ -230,11 +488,13 @@ Generate a 2-3 sentence summary."""
             "summary": "",
             "reasoning": "",
             "memory_stored": False,
-            "error": None
+            "error": None,
+            "extraction_mode": None,
+            "context_stats": None
         }
         
         # Execute LangGraph workflow
-        final_state = self.graph.invoke(initial_state)
+        final_state = await self.graph.ainvoke(initial_state)
         
         # Handle errors
         if final_state.get("error"):
@@ -252,30 +512,146 @@ Generate a 2-3 sentence summary."""
             "facts": final_state.get("facts", []),
             "reasoning": final_state.get("reasoning", ""),
             "memory_stored": final_state.get("memory_stored", False),
-            "context_available": bool(final_state.get("previous_context"))
+            "context_available": bool(final_state.get("previous_context")),
+            "extraction_mode": final_state.get("extraction_mode"),
+            "context_stats": final_state.get("context_stats")
         }
     
-    def prepare_handoff(self,
+    def ingest_in_background(self,
+                             workflow_output: str,
+                             workflow_name: str,
+                             solution_id: str,
+                             workflow_id: str,
+                             context: str = "") -> "asyncio.Task":
+        """
+        Schedule invoke_kag for a workflow output without waiting for it
+        
+        Ingestions of one solution run one after another, so each still sees the
+        memories of the workflows before it, but none of them holds up the next
+        workflow. The task resolves to the invoke_kag result (errors included).
+        """
+        key = f"{solution_id}:{workflow_id}"
+        previous = self._live(self._solution_tail.get(solution_id))
+        
+        async def ingest() -> Dict[str, Any]:
+            if previous is not None:
+                await asyncio.wait([previous])
+            try:
+                return await self.invoke_kag(workflow_output, workflow_name, solution_id, workflow_id, context)
+            except Exception as e:
+                return {
+                    "summary": f"Error in KAG processing: {str(e)}",
+                    "facts": [],
+                    "reasoning": "",
+                    "memory_stored": False,
+                    "context_available": False,
+                    "error": str(e)
+                }
+        
+        task = asyncio.get_running_loop().create_task(ingest())
+        self._pending[key] = {"task": task, "workflow_output": workflow_output, "workflow_name": workflow_name}
+        self._solution_tail[solution_id] = task
+        
+        def done(_task):
+            if self._pending.get(key, {}).get("task") is task:
+                del self._pending[key]
+                error = "Ingestion cancelled" if task.cancelled() else task.result().get("error")
+                if error:
+                    self._failed[key] = {"error": error, "workflow_output": workflow_output, "workflow_name": workflow_name}
+                else:
+                    self._failed.pop(key, None)
+            if self._solution_tail.get(solution_id) is task:
+                del self._solution_tail[solution_id]
+        
+        task.add_done_callback(done)
+        return task
+    
+    @staticmethod
+    def _live(task: Optional["asyncio.Task"]) -> Optional["asyncio.Task"]:
+        """The task if it can still be awaited from the running loop"""
+        if task is None or task.done() or task.get_loop().is_closed():
+            return None
+        return task
+    
+    def is_pending(self, solution_id: str, workflow_id: str) -> bool:
+        """Whether the workflow's output is still being ingested"""
+        pending = self._pending.get(f"{solution_id}:{workflow_id}")
+        return pending is not None and self._live(pending["task"]) is not None
+    
+    async def wait_for_memory(self, solution_id: str, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Wait for the background ingestion of one workflow; None if nothing is pending"""
+        pending = self._pending.get(f"{solution_id}:{workflow_id}")
+        task = self._live(pending["task"]) if pending else None
+        if task is None:
+            return None
+        return await asyncio.shield(task)
+    
+    async def wait_for_solution(self, solution_id: str):
+        """Wait until every background ingestion of the solution has been stored"""
+        tail = self._live(self._solution_tail.get(solution_id))
+        if tail is not None:
+            await asyncio.wait([tail])
+    
+    async def prepare_handoff(self,
                        source_workflow_id: str,
                        target_workflow_id: str,
                        target_workflow_description: str,
-                       solution_id: str) -> Dict[str, Any]:
+                       solution_id: str,
+                       fast: Optional[bool] = None) -> Dict[str, Any]:
         """
         Prepare data handoff from source workflow to target workflow
         
+        Only the source workflow's own ingestion is awaited. With ``fast`` (default
+        KAG_FAST_HANDOFF) nothing is awaited and Gemini is not called: the target
+        gets the extracted facts if they are already stored, else the raw output.
+        If the source's latest ingestion failed, the target gets its raw output
+        marked with ``memory_stale`` and ``ingestion_error``.
+        
         Args:
             source_workflow_id: ID of source workflow
             target_workflow_id: ID of target workflow
             target_workflow_description: Description of target workflow task
             solution_id: Solution ID
+            fast: Use the fast handoff instead of Gemini reasoning
             
         Returns:
             Handoff data package with context and instructions
         """
-        # Get source workflow memories
-        source_memories = self.memory.get_memories(solution_id, source_workflow_id)
+        fast = self.fast_handoff if fast is None else fast
+        key = f"{solution_id}:{source_workflow_id}"
+        
+        if fast:
+            pending = self._pending.get(key)
+            if pending is not None and self.is_pending(solution_id, source_workflow_id):
+                return {
+                    "handoff_data": pending["workflow_output"][:KAG_FAST_HANDOFF_CHARS],
+                    "relevance": f"Raw output of {pending['workflow_name']} (facts are still being extracted)",
+                    "context": "",
+                    "facts": [],
+                    "source_summary": "",
+                    "handoff_mode": "raw"
+                }
+        else:
+            await self.wait_for_memory(solution_id, source_workflow_id)
+        
+        failed = self._failed.get(key)
+        if failed is not None:
+            # The stored memory (if any) is from an earlier run of the source workflow
+            return {
+                "handoff_data": failed["workflow_output"][:KAG_FAST_HANDOFF_CHARS],
+                "relevance": f"Raw output of {failed['workflow_name']} (fact extraction failed)",
+                "context": "",
+                "facts": [],
+                "source_summary": "",
+                "handoff_mode": "raw",
+                "memory_stale": True,
+                "ingestion_error": failed["error"]
+            }
         
-        if not source_memories:
+        # Get the most recent memory of the source workflow
+        latest_memory = self.memory.get_latest(solution_id, source_workflow_id)
+        
+        if latest_memory is None:
             return {
                 "handoff_data": "",
                 "relevance": "No previous context available",
@@ -283,28 +659,117 @@ Generate a 2-3 sentence summary."""
                 "facts": []
             }
         
-        # Get the most recent memory
-        latest_memory = source_memories[-1]
+        # Facts of earlier workflows related to the target, from the knowledge graph
+        source_facts = latest_memory.get("facts", [])
+        subgraph = self.kg_manager.get_subgraph(solution_id, target_workflow_description)
+        related_facts = [f["fact"] for f in subgraph["facts"] if f["fact"] not in source_facts]
+        graph_context = {"entities": subgraph["seeds"], "facts": related_facts}
         
-        # Use Gemini to reason about the handoff
-        handoff_reasoning = self.gemini_client.reason_about_handoff(
-            source_workflow_summary=latest_memory.get("summary", ""),
-            source_facts=latest_memory.get("facts", []),
-            target_workflow_description=target_workflow_description
-        )
+        if fast:
+            return {
+                "handoff_data": "\n".join(
+                    [latest_memory.get("summary", "")] + [f"- {fact}" for fact in source_facts + related_facts]
+                ).strip(),
+                "relevance": f"Extracted facts of {latest_memory.get('workflow_name', source_workflow_id)}",
+                "context": "",
+                "facts": source_facts,
+                "source_summary": latest_memory.get("summary", ""),
+                "graph_context": graph_context,
+                "handoff_mode": "facts"
+            }
+        
+        # Reuse the reasoning for an unchanged source memory, related facts and target
+        fingerprint = memory_fingerprint(latest_memory)
+        cache_key = HandoffCache.make_key(fingerprint, target_workflow_description, related_facts)
+        handoff_reasoning = self.handoff_cache.get(cache_key)
+        cached = handoff_reasoning is not None
+        
+        if not cached:
+            # Use Gemini to reason about the handoff
+            handoff_reasoning = await self.gemini_client.reason_about_handoff(
+                source_workflow_summary=latest_memory.get("summary", ""),
+                source_facts=source_facts + related_facts,
+                target_workflow_description=target_workflow_description
+            )
+            if not str(handoff_reasoning.get("context", "")).startswith("Error generating detailed handoff"):
+                self.handoff_cache.set(solution_id, source_workflow_id, cache_key, fingerprint, handoff_reasoning)
         
         return {
             **handoff_reasoning,
-            "facts": latest_memory.get("facts", []),
-            "source_summary": latest_memory.get("summary", "")
+            "facts": source_facts,
+            "source_summary": latest_memory.get("summary", ""),
+            "graph_context": graph_context,
+            "handoff_mode": "reasoned",
+            "handoff_cached": cached
         }
     
-    def get_solution_summary(self, solution_id: str) -> Dict[str, Any]:
+    def _schedule_summary_merge(self, solution_id: str) -> Optional["asyncio.Task"]:
+        """Start merging new memories into the rolling summary unless a merge is running
+        
+        A running merge picks up memories added while it waits on Gemini before it
+        finishes, so at most one merge per solution is in flight.
+        """
+        task = self._live(self._summary_tasks.get(solution_id))
+        if task is not None:
+            return task
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        task = self._summary_tasks[solution_id] = loop.create_task(self._merge_summary(solution_id))
+        return task
+    
+    async def _merge_summary(self, solution_id: str):
+        """Fold memories newer than the rolling summary into it, one Gemini call per round"""
+        while True:
+            cached = self._summaries.get(solution_id, {})
+            watermark = cached.get("merged_through", "")
+            memories = self.memory.get_memories(solution_id)
+            new_memories = [m for m in memories if m.get("timestamp", "") > watermark]
+            if not new_memories:
+                return
+            
+            messages = []
+            if cached.get("overall_context"):
+                messages.append({"role": "summary so far", "content": cached["overall_context"]})
+            messages.append({"role": "workflow", "content": "\n\n".join(
+                f"{m.get('workflow_name', 'Unknown')}: {m.get('summary', '')}" for m in new_memories
+            )})
+            error = "Summary merge failed"
+            try:
+                overall_summary = await self.gemini_client.summarize_conversation(
+                    messages,
+                    f"Solution with {len(memories)} workflows"
+                )
+            except Exception as e:
+                overall_summary, error = "", f"Summary merge failed: {str(e)}"
+            if solution_id not in self._summary_tasks:
+                return  # memory cleared while summarizing
+            if not overall_summary.strip():
+                # Keep the last good summary; reads retry only after the backoff
+                self._summaries[solution_id] = {**cached, "error": error, "failed_at": time.monotonic()}
+                return
+            
+            self._summaries[solution_id] = {
+                "overall_context": overall_summary,
+                "merged_through": max(m.get("timestamp", "") for m in new_memories),
+                "updated_at": datetime.now().isoformat(),
+                "merges": cached.get("merges", 0) + 1
+            }
+    
+    async def get_solution_summary(self, solution_id: str, wait: bool = False) -> Dict[str, Any]:
         """
         Get comprehensive summary of all workflows in a solution
         
+        The overall context is the rolling summary kept up to date in the
+        background, so reading it is a lookup. ``summary_stale`` marks a summary
+        that does not cover every memory yet; ``wait`` waits for the merge. After
+        a failed merge, reads return the last good summary with ``summary_error``
+        and only retry once KAG_SUMMARY_RETRY_SECONDS have passed.
+        
         Args:
             solution_id: Solution ID
+            wait: Wait until the rolling summary covers every memory
             
         Returns:
             Summary data
@@ -316,7 +781,9 @@ Generate a 2-3 sentence summary."""
                 "total_workflows": 0,
                 "summaries": [],
                 "combined_facts": [],
-                "overall_context": ""
+                "overall_context": "",
+                "summary_stale": False,
+                "pending_memories": 0
             }
         
         summaries = []
@@ -330,27 +797,41 @@ Generate a 2-3 sentence summary."""
             })
             all_facts.extend(mem.get("facts", []))
         
-        # Generate overall context using Gemini
-        context_text = "\n\n".join([
-            f"{s['workflow_name']}: {s['summary']}"
-            for s in summaries
-        ])
+        def pending() -> int:
+            watermark = self._summaries.get(solution_id, {}).get("merged_through", "")
+            return sum(1 for mem in all_memories if mem.get("timestamp", "") > watermark)
         
-        overall_summary = self.gemini_client.summarize_conversation(
-            [{"role": "workflow", "content": context_text}],
-            f"Solution with {len(summaries)} workflows"
-        )
+        failed_at = self._summaries.get(solution_id, {}).get("failed_at")
+        backing_off = failed_at is not None and time.monotonic() - failed_at < KAG_SUMMARY_RETRY_SECONDS
+        if pending() and not backing_off:
+            # Memories loaded from the store after a restart have no merge running yet
+            task = self._schedule_summary_merge(solution_id)
+            if wait and task is not None:
+                await asyncio.shield(task)
         
+        cached = self._summaries.get(solution_id, {})
         return {
             "total_workflows": len(summaries),
             "summaries": summaries,
             "combined_facts": all_facts,
-            "overall_context": overall_summary
+            "overall_context": cached.get("overall_context", ""),
+            "summary_stale": pending() > 0,
+            "pending_memories": pending(),
+            "summary_updated_at": cached.get("updated_at"),
+            "summary_error": cached.get("error")
         }
     
     def clear_solution_memory(self, solution_id: str):
         """Clear all memory for a solution"""
         self.memory.clear_solution(solution_id)
+        self.kg_manager.clear_solution(solution_id)
+        self.handoff_cache.invalidate(solution_id)
+        for key in [k for k in self._failed if k.startswith(f"{solution_id}:")]:
+            del self._failed[key]
+        self._summaries.pop(solution_id, None)
+        task = self._summary_tasks.pop(solution_id, None)
+        if self._live(task) is not None:
+            task.cancel()
 
 
 # Global KAG service instance
@@ -365,7 +846,7 @@ def get_kag_service() -> KAGService:
     return _kag_service
 
 
-def invoke_kag(workflow_output: str,
+async def invoke_kag(workflow_output: str,
                workflow_name: str,
                solution_id: str,
                workflow_id: str,
@@ -376,4 +857,4 @@ def invoke_kag(workflow_output: str,
     This is the main entry point for workflow-to-workflow communication
     """
     service = get_kag_service()
-    return service.invoke_kag(workflow_output, workflow_name, solution_id, workflow_id, context)
+    return await service.invoke_kag(workflow_output, workflow_name, solution_id, workflow_id, context)
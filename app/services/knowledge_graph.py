@@ -0,0 +1,376 @@
+"""
+Knowledge Graph for KAG Facts
+Turns extracted facts into entities, fact nodes and co-occurrence relations in
+an embedded SQLite graph (or Neo4j when configured), and retrieves only the
+subgraph relevant to a workflow instead of every summary of the solution
+"""
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.storage import DATA_BASE
+
+try:
+    from neo4j import GraphDatabase
+    NEO4J_AVAILABLE = True
+except ImportError:
+    GraphDatabase = None
+    NEO4J_AVAILABLE = False
+
+KG_ENABLED = os.getenv("KG_ENABLED", "true").lower() == "true"
+KG_BACKEND = os.getenv("KG_BACKEND", "sqlite")  # "sqlite" or "neo4j"
+KG_DB_PATH = os.getenv("KG_DB_PATH", str(DATA_BASE / "knowledge_graph.db"))
+KG_MAX_FACTS = int(os.getenv("KG_MAX_FACTS", "20"))
+KG_MAX_NEIGHBORS = int(os.getenv("KG_MAX_NEIGHBORS", "10"))
+# Entities of one fact linked pairwise (bounds edges per fact)
+KG_MAX_ENTITIES_PER_FACT = int(os.getenv("KG_MAX_ENTITIES_PER_FACT", "8"))
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "")
+
+_NAMED = re.compile(r"\b[A-Z][\w&.-]*(?:\s+[A-Z][\w&.-]*)*")
+_TERM = re.compile(r"[a-z][a-z0-9-]{3,}")
+_STOPWORDS = {
+    "this", "that", "with", "from", "have", "were", "been", "will", "would", "could", "should",
+    "their", "there", "they", "them", "than", "then", "into", "also", "about", "over", "more",
+    "most", "some", "such", "only", "very", "each", "which", "what", "when", "where", "while",
+    "these", "those", "other", "after", "before", "between", "through", "during", "under",
+    "workflow", "output", "result", "results", "information", "task", "using", "based"
+}
+
+# (fact_id, fact, workflow_id, workflow_name, entity)
+Mention = Tuple[int, str, str, str, str]
+
+
+def _stem(term: str) -> str:
+    if len(term) > 4 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def extract_entities(text: str) -> Dict[str, str]:
+    """Normalized entity -> type ("named" for capitalized phrases, else "term")"""
+    entities: Dict[str, str] = {}
+    for match in _NAMED.finditer(text):
+        words = [w.strip(".-").lower() for w in match.group(0).split()]
+        # Every sub-phrase too, so "Compare Acme Corp" also yields "acme corp"
+        for start in range(len(words)):
+            for end in range(start + 1, min(len(words), start + 4) + 1):
+                name = " ".join(words[start:end])
+                if len(name) > 1 and name not in _STOPWORDS:
+                    entities[name] = "named"
+    for term in _TERM.findall(text.lower()):
+        term = _stem(term)
+        if term not in _STOPWORDS:
+            entities.setdefault(term, "term")
+    return entities
+
+
+class SQLiteGraphStore:
+    """Embedded graph: entity and fact tables with mention and adjacency tables"""
+
+    def __init__(self, db_path: str = KG_DB_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and db_path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS kg_entities ("
+            " solution_id TEXT NOT NULL, entity TEXT NOT NULL, type TEXT NOT NULL,"
+            " PRIMARY KEY (solution_id, entity));"
+            "CREATE TABLE IF NOT EXISTS kg_facts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, solution_id TEXT NOT NULL, workflow_id TEXT NOT NULL,"
+            " workflow_name TEXT NOT NULL, fact TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS kg_mentions ("
+            " solution_id TEXT NOT NULL, entity TEXT NOT NULL, fact_id INTEGER NOT NULL,"
+            " PRIMARY KEY (solution_id, entity, fact_id));"
+            "CREATE TABLE IF NOT EXISTS kg_edges ("
+            " solution_id TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, weight INTEGER NOT NULL,"
+            " PRIMARY KEY (solution_id, source, target));"
+            "CREATE INDEX IF NOT EXISTS kg_facts_solution ON kg_facts (solution_id, id);"
+        )
+        self._conn.commit()
+
+    def add_fact(self, solution_id: str, workflow_id: str, workflow_name: str, fact: str,
+                 entities: Dict[str, str], related: List[Tuple[str, str]]):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO kg_facts (solution_id, workflow_id, workflow_name, fact) VALUES (?, ?, ?, ?)",
+                (solution_id, workflow_id, workflow_name, fact)
+            )
+            fact_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO kg_entities (solution_id, entity, type) VALUES (?, ?, ?) "
+                "ON CONFLICT (solution_id, entity) DO UPDATE SET type = CASE WHEN excluded.type = 'named' "
+                "THEN 'named' ELSE kg_entities.type END",
+                [(solution_id, entity, kind) for entity, kind in entities.items()]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO kg_mentions (solution_id, entity, fact_id) VALUES (?, ?, ?)",
+                [(solution_id, entity, fact_id) for entity in entities]
+            )
+            self._conn.executemany(
+                "INSERT INTO kg_edges (solution_id, source, target, weight) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (solution_id, source, target) DO UPDATE SET weight = weight + 1",
+                [(solution_id, a, b) for x, y in related for a, b in ((x, y), (y, x))]
+            )
+            self._conn.commit()
+
+    def find_entities(self, solution_id: str, names: Iterable[str]) -> List[str]:
+        names = list(names)
+        if not names:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT entity FROM kg_entities WHERE solution_id = ? AND entity IN ({','.join('?' * len(names))})",
+                [solution_id, *names]
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def neighbors(self, solution_id: str, entities: List[str], limit: int) -> List[Tuple[str, int]]:
+        """Entities adjacent to ``entities``, strongest relations first"""
+        if not entities:
+            return []
+        marks = ",".join("?" * len(entities))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT target, SUM(weight) AS w FROM kg_edges WHERE solution_id = ? AND source IN ({marks}) "
+                f"AND target NOT IN ({marks}) GROUP BY target ORDER BY w DESC, target LIMIT ?",
+                [solution_id, *entities, *entities, limit]
+            ).fetchall()
+
+    def edges(self, solution_id: str, entities: List[str]) -> List[Tuple[str, str, int]]:
+        if not entities:
+            return []
+        marks = ",".join("?" * len(entities))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT source, target, weight FROM kg_edges WHERE solution_id = ? AND source IN ({marks}) "
+                f"AND target IN ({marks}) AND source < target",
+                [solution_id, *entities, *entities]
+            ).fetchall()
+
+    def mentions(self, solution_id: str, entities: Optional[List[str]] = None) -> List[Mention]:
+        """Facts mentioning ``entities`` (every fact of the solution when None)"""
+        with self._lock:
+            if entities is None:
+                return [(fact_id, fact, wf_id, wf_name, "") for fact_id, fact, wf_id, wf_name in self._conn.execute(
+                    "SELECT id, fact, workflow_id, workflow_name FROM kg_facts WHERE solution_id = ? ORDER BY id",
+                    (solution_id,)
+                ).fetchall()]
+            if not entities:
+                return []
+            return self._conn.execute(
+                "SELECT f.id, f.fact, f.workflow_id, f.workflow_name, m.entity FROM kg_mentions m "
+                "JOIN kg_facts f ON f.id = m.fact_id "
+                f"WHERE m.solution_id = ? AND m.entity IN ({','.join('?' * len(entities))})",
+                [solution_id, *entities]
+            ).fetchall()
+
+    def delete_solution(self, solution_id: str):
+        with self._lock:
+            for table in ("kg_entities", "kg_facts", "kg_mentions", "kg_edges"):
+                self._conn.execute(f"DELETE FROM {table} WHERE solution_id = ?", (solution_id,))
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("kg_entities", "kg_facts", "kg_edges")}
+        return {"backend": "sqlite", "db_path": self.db_path, "entities": counts["kg_entities"],
+                "facts": counts["kg_facts"], "edges": counts["kg_edges"] // 2}
+
+
+class Neo4jGraphStore:
+    """Same graph in Neo4j: (:Fact)-[:MENTIONS]->(:Entity)-[:RELATED_TO]-(:Entity)"""
+
+    def __init__(self, uri: str = NEO4J_URI, user: str = NEO4J_USER, password: str = NEO4J_PASSWORD):
+        self._driver = GraphDatabase.driver(uri, auth=(user, password))
+        self._driver.verify_connectivity()
+        self.uri = uri
+
+    def _run(self, query: str, **params) -> List[Any]:
+        with self._driver.session() as session:
+            return list(session.run(query, **params))
+
+    def add_fact(self, solution_id: str, workflow_id: str, workflow_name: str, fact: str,
+                 entities: Dict[str, str], related: List[Tuple[str, str]]):
+        self._run(
+            "CREATE (f:Fact {solution_id: $solution_id, workflow_id: $workflow_id, workflow_name: $workflow_name, "
+            "text: $fact, created: timestamp()}) "
+            "WITH f UNWIND $entities AS entity "
+            "MERGE (e:Entity {solution_id: $solution_id, name: entity.name}) "
+            "ON CREATE SET e.type = entity.type "
+            "ON MATCH SET e.type = CASE WHEN entity.type = 'named' THEN 'named' ELSE e.type END "
+            "MERGE (f)-[:MENTIONS]->(e)",
+            solution_id=solution_id, workflow_id=workflow_id, workflow_name=workflow_name, fact=fact,
+            entities=[{"name": name, "type": kind} for name, kind in entities.items()]
+        )
+        if related:
+            self._run(
+                "UNWIND $pairs AS pair "
+                "MATCH (a:Entity {solution_id: $solution_id, name: pair[0]}), "
+                "(b:Entity {solution_id: $solution_id, name: pair[1]}) "
+                "MERGE (a)-[r:RELATED_TO]-(b) ON CREATE SET r.weight = 1 ON MATCH SET r.weight = r.weight + 1",
+                solution_id=solution_id, pairs=[list(pair) for pair in related]
+            )
+
+    def find_entities(self, solution_id: str, names: Iterable[str]) -> List[str]:
+        return [record["name"] for record in self._run(
+            "MATCH (e:Entity {solution_id: $solution_id}) WHERE e.name IN $names RETURN e.name AS name",
+            solution_id=solution_id, names=list(names)
+        )]
+
+    def neighbors(self, solution_id: str, entities: List[str], limit: int) -> List[Tuple[str, int]]:
+        return [(record["name"], record["weight"]) for record in self._run(
+            "MATCH (e:Entity {solution_id: $solution_id})-[r:RELATED_TO]-(n:Entity) "
+            "WHERE e.name IN $names AND NOT n.name IN $names "
+            "RETURN n.name AS name, sum(r.weight) AS weight ORDER BY weight DESC, name LIMIT $limit",
+            solution_id=solution_id, names=entities, limit=limit
+        )]
+
+    def edges(self, solution_id: str, entities: List[str]) -> List[Tuple[str, str, int]]:
+        return [(record["source"], record["target"], record["weight"]) for record in self._run(
+            "MATCH (a:Entity {solution_id: $solution_id})-[r:RELATED_TO]-(b:Entity) "
+            "WHERE a.name IN $names AND b.name IN $names AND a.name < b.name "
+            "RETURN a.name AS source, b.name AS target, r.weight AS weight",
+            solution_id=solution_id, names=entities
+        )]
+
+    def mentions(self, solution_id: str, entities: Optional[List[str]] = None) -> List[Mention]:
+        if entities is None:
+            query = ("MATCH (f:Fact {solution_id: $solution_id}) RETURN id(f) AS id, f.text AS fact, "
+                     "f.workflow_id AS workflow_id, f.workflow_name AS workflow_name, '' AS entity ORDER BY f.created")
+        else:
+            query = ("MATCH (f:Fact {solution_id: $solution_id})-[:MENTIONS]->(e:Entity) WHERE e.name IN $names "
+                     "RETURN id(f) AS id, f.text AS fact, f.workflow_id AS workflow_id, "
+                     "f.workflow_name AS workflow_name, e.name AS entity")
+        return [(r["id"], r["fact"], r["workflow_id"], r["workflow_name"], r["entity"])
+                for r in self._run(query, solution_id=solution_id, names=entities or [])]
+
+    def delete_solution(self, solution_id: str):
+        self._run("MATCH (n {solution_id: $solution_id}) DETACH DELETE n", solution_id=solution_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        record = self._run(
+            "OPTIONAL MATCH (e:Entity) WITH count(e) AS entities "
+            "OPTIONAL MATCH (f:Fact) WITH entities, count(f) AS facts "
+            "OPTIONAL MATCH (:Entity)-[r:RELATED_TO]-(:Entity) RETURN entities, facts, count(r) / 2 AS edges"
+        )[0]
+        return {"backend": "neo4j", "uri": self.uri, "entities": record["entities"],
+                "facts": record["facts"], "edges": record["edges"]}
+
+
+class KnowledgeGraphManager:
+    """Stores KAG facts as a graph and answers entity-indexed subgraph queries"""
+
+    def __init__(self, store=None,
+                 max_facts: int = KG_MAX_FACTS,
+                 max_neighbors: int = KG_MAX_NEIGHBORS):
+        self.store = store
+        self.max_facts = max_facts
+        self.max_neighbors = max_neighbors
+
+    def is_available(self) -> bool:
+        return self.store is not None
+
+    def add_facts(self, solution_id: str, workflow_id: str, workflow_name: str, facts: List[str]) -> int:
+        """Index the entities and relations of each fact; returns the number of facts stored"""
+        if self.store is None:
+            return 0
+        stored = 0
+        for fact in facts:
+            fact = str(fact).strip()
+            if not fact:
+                continue
+            entities = extract_entities(fact)
+            linked = list(entities)[:KG_MAX_ENTITIES_PER_FACT]
+            self.store.add_fact(solution_id, workflow_id, workflow_name, fact, entities, list(combinations(linked, 2)))
+            stored += 1
+        return stored
+
+    def get_subgraph(self, solution_id: str, query: str, max_facts: Optional[int] = None) -> Dict[str, Any]:
+        """Entities of ``query`` found in the solution's graph, their strongest
+        neighbours, the edges between them and the facts mentioning them,
+        ranked by how many seed (2 points) and neighbour (1 point) entities
+        each fact mentions"""
+        subgraph = {"seeds": [], "entities": [], "edges": [], "facts": []}
+        if self.store is None:
+            return subgraph
+        seeds = self.store.find_entities(solution_id, extract_entities(query))
+        if not seeds:
+            return subgraph
+        neighbors = [name for name, _ in self.store.neighbors(solution_id, seeds, self.max_neighbors)]
+        entities = seeds + neighbors
+
+        seed_set: Set[str] = set(seeds)
+        scores: Dict[int, int] = defaultdict(int)
+        facts: Dict[int, Dict[str, Any]] = {}
+        for fact_id, fact, workflow_id, workflow_name, entity in self.store.mentions(solution_id, entities):
+            scores[fact_id] += 2 if entity in seed_set else 1
+            facts[fact_id] = {"fact": fact, "workflow_id": workflow_id, "workflow_name": workflow_name}
+
+        ranked = sorted(scores, key=lambda fact_id: (-scores[fact_id], fact_id))[:max_facts or self.max_facts]
+        subgraph.update({
+            "seeds": seeds,
+            "entities": entities,
+            "edges": [{"source": a, "target": b, "weight": w} for a, b, w in self.store.edges(solution_id, entities)],
+            "facts": [{**facts[fact_id], "score": scores[fact_id]} for fact_id in ranked]
+        })
+        return subgraph
+
+    def get_related_facts(self, solution_id: str, query: Optional[str] = None) -> List[str]:
+        """Facts relevant to ``query``, or every fact of the solution"""
+        if self.store is None:
+            return []
+        if query is None:
+            return [fact for _, fact, _, _, _ in self.store.mentions(solution_id)]
+        return [f["fact"] for f in self.get_subgraph(solution_id, query)["facts"]]
+
+    def clear_solution(self, solution_id: str):
+        if self.store is not None:
+            self.store.delete_solution(solution_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        if self.store is None:
+            return {"backend": None}
+        return self.store.get_stats()
+
+
+def create_graph_store():
+    """The configured graph store; SQLite unless Neo4j is selected and reachable"""
+    if not KG_ENABLED:
+        return None
+    if KG_BACKEND == "neo4j":
+        if NEO4J_AVAILABLE and NEO4J_PASSWORD:
+            try:
+                return Neo4jGraphStore()
+            except Exception as e:
+                print(f"⚠️ Neo4j unavailable ({NEO4J_URI}): {e}; using the SQLite knowledge graph")
+        else:
+            print("⚠️ KG_BACKEND=neo4j needs the neo4j package and NEO4J_PASSWORD; using the SQLite knowledge graph")
+    try:
+        return SQLiteGraphStore(KG_DB_PATH)
+    except sqlite3.Error as e:
+        print(f"⚠️ Knowledge graph unavailable ({KG_DB_PATH}): {e}")
+        return None
+
+
+# Global knowledge graph manager
+_kg_manager = None
+
+
+def get_kg_manager() -> KnowledgeGraphManager:
+    """Get or create the global knowledge graph manager"""
+    global _kg_manager
+    if _kg_manager is None:
+        _kg_manager = KnowledgeGraphManager(create_graph_store())
+    return _kg_manager
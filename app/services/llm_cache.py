@@ -0,0 +1,208 @@
+"""
+Exact-match LLM Response Cache
+Two-tier cache (in-memory LRU + optional SQLite on disk) for LLMClient responses
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")  # Empty disables the disk tier
+LLM_CACHE_DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def normalize_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Normalize a message list so formatting-only differences share a cache entry"""
+    return [
+        {"role": str(m.get("role", "user")).lower(), "content": " ".join(str(m.get("content", "")).split())}
+        for m in messages
+    ]
+
+
+def make_cache_key(provider: str, model: str, temperature: float, messages: List[Dict[str, str]]) -> str:
+    """Build the cache key from provider, model, temperature and normalized messages"""
+    payload = {
+        "provider": provider,
+        "model": model,
+        "temperature": round(float(temperature), 4),
+        "messages": normalize_messages(messages),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """SQLite-backed cache tier with TTL and a byte budget"""
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, tokens INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, int, float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, tokens, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0], row[1], row[2]
+
+    def set(self, key: str, value: str, tokens: int, size: int, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, tokens, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, tokens, size, expires_at, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired rows, then least recently accessed rows over the byte budget"""
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMResponseCache:
+    """Exact-match response cache with an LRU memory tier and optional disk tier"""
+
+    def __init__(self,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 db_path: Optional[str] = None,
+                 disk_max_bytes: int = LLM_CACHE_DISK_MAX_BYTES,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (value, tokens, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[str, int, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(db_path, disk_max_bytes) if db_path else None
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, int]]:
+        """Look up ``(response, tokens)``; counts the hit or miss and promotes disk hits to memory"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= now:
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_tokens += entry[1]
+                return entry[0], entry[1]
+
+        if self._disk is not None:
+            row = self._disk.get(key)
+            if row is not None:
+                value, tokens, expires_at = row
+                with self._lock:
+                    self._store(key, value, tokens, expires_at)
+                    self.hits += 1
+                    self.saved_tokens += tokens
+                return value, tokens
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str, tokens: int = 0):
+        """Store a response; ``tokens`` is what a future hit saves"""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, value, tokens, expires_at)
+        if self._disk is not None:
+            self._disk.set(key, value, tokens, len(value.encode("utf-8")), expires_at)
+
+    def _store(self, key: str, value: str, tokens: int, expires_at: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, tokens, expires_at, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def clear(self):
+        """Drop all entries from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._disk is not None:
+            self._disk.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups > 0 else 0,
+            "saved_tokens": self.saved_tokens,
+            "disk_tier": self._disk is not None
+        }
+
+
+# Global cache instance
+_llm_cache = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Get or create the global LLM response cache"""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache(db_path=LLM_CACHE_DB_PATH or None, enabled=LLM_CACHE_ENABLED)
+    return _llm_cache
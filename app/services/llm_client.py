@@ -1,6 +1,17 @@
 import os
+import json
 import asyncio
-from typing import List, Dict
+from typing import Any, List, Dict, AsyncIterator, Optional, Tuple
+
+from app.services.llm_cache import get_llm_cache, make_cache_key
+from app.services.semantic_cache import get_semantic_cache, make_scope_key
+from app.services.single_flight import get_single_flight, make_request_key
+from app.services.rate_limiter import get_governor, backoff_delay, LLM_MAX_RETRIES, RETRYABLE_STATUS_CODES
+from app.services.llm_router import get_llm_router, parse_targets, Target, LLM_FALLBACK_PROVIDERS
+from app.services.tokenizer import count_tokens, count_message_tokens, truncate_to_tokens, TOKENS_PER_MESSAGE
+from app.services.conversation_context import ConversationContext
+from app.services.batch_inference import current_batch
+from app.services.http_pool import get_http_client as _http_client
 
 GROQ_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
@@ -9,6 +20,30 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
 ANTHROPIC_KEY = os.getenv("ANTHROPIC_API_KEY")
 ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4.5")
 
+# Base URLs can point at a compatible stand-in such as app/mock_server.py
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/")
+GROQ_CHAT_URL = f"{GROQ_BASE_URL}/chat/completions"
+ANTHROPIC_MESSAGES_URL = f"{ANTHROPIC_BASE_URL}/v1/messages"
+
+# Prompt-prefix caching: mark the stable system prompt as cacheable (Anthropic
+# cache_control) once it reaches the provider's minimum cacheable length
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "true").lower() == "true"
+LLM_PROMPT_CACHE_MIN_TOKENS = int(os.getenv("LLM_PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+# Tokens allowed per request (system prompt, summary, history, prompt and the
+# completion limit) by message format; the final prompt is trimmed to what the
+# rest leaves over. Groq's default fits its on-demand per-request limit, the
+# Anthropic one the model context window.
+LLM_REQUEST_TOKEN_BUDGETS = {
+    "groq": int(os.getenv("LLM_REQUEST_TOKEN_BUDGET_GROQ", "6000")),
+    "anthropic": int(os.getenv("LLM_REQUEST_TOKEN_BUDGET_ANTHROPIC", "200000")),
+}
+TRUNCATION_MARKER = "\n[... truncated to fit the request token budget]"
+
+# Delay between tokens emitted by the mock streaming provider
+MOCK_STREAM_DELAY = float(os.getenv("MOCK_STREAM_DELAY", "0.005"))
+
 # LangChain integration
 try:
     from langchain_groq import ChatGroq
@@ -17,13 +52,67 @@ try:
 except ImportError:
     LANGCHAIN_AVAILABLE = False
 
+class LLMResult(str):
+    """Completion text carrying token usage and the provider that produced it.
+
+    Behaves as a plain ``str``. ``usage_source`` is "provider" when the counts
+    come from the provider's ``usage`` field, "estimate" when they were counted
+    locally, "cache" for cache hits, "coalesced" for callers that shared another
+    caller's in-flight request and "none" for failed calls (all three no tokens).
+    ``cached_tokens`` were read from the provider's prompt cache and
+    ``cache_write_tokens`` written to it (both included in ``prompt_tokens``).
+    """
+
+    def __new__(cls, text: str, prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0,
+                provider: str = "", model: str = "", usage_source: str = "none", cache_write_tokens: int = 0):
+        result = super().__new__(cls, text)
+        result.prompt_tokens = prompt_tokens
+        result.completion_tokens = completion_tokens
+        result.cached_tokens = cached_tokens
+        result.cache_write_tokens = cache_write_tokens
+        result.provider = provider
+        result.model = model
+        result.usage_source = usage_source
+        return result
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "total_tokens": self.total_tokens,
+            "source": self.usage_source
+        }
+
+
 class LLMClient:
-    def __init__(self, provider: str = None, api_key: str = None, model: str = None):
+    def __init__(self, provider: str = None, api_key: str = None, model: str = None, temperature: float = 0.7,
+                 max_tokens: Optional[int] = None, context: Optional[ConversationContext] = None,
+                 system_prompt: Optional[str] = None):
         self.provider = (provider or LLM_PROVIDER).lower()
         self.api_key = api_key
         self.model = model
-        self.context_window: List[Dict[str, str]] = []
-        self.max_context_messages = 20
+        self.temperature = temperature
+        # Completion limit; None uses the provider default (800 Groq, 1024 Anthropic)
+        self.max_tokens = max_tokens
+        # Stable instructions sent first on every call, so providers can cache the prefix
+        self.system_prompt = system_prompt or None
+        # Token-budgeted history; older turns are folded into a running summary.
+        # Pass a context from the ContextStore to scope it to a run or chat session.
+        self.context = context if context is not None else ConversationContext()
+        # Cache outcome of the last call: None (not consulted), "hit", "semantic_hit" or "miss"
+        self.last_cache_status: Optional[str] = None
+        self.last_saved_tokens = 0
+        # Whether the last generate() joined an identical request already in flight
+        self.last_coalesced = False
+        # Result of the last generate()/stream() call, with its token usage
+        self.last_result: Optional[LLMResult] = None
 
     def get_chat_model(self):
         """Get LangChain-compatible chat model for agent execution"""
@@ -45,103 +134,336 @@ class LLMClient:
             model = GROQ_MODEL
             return ChatGroq(api_key=key, model=model, temperature=0.7)
 
+    @property
+    def context_window(self) -> List[Dict[str, str]]:
+        """Turns not yet folded into the running summary"""
+        return self.context.messages
+
     def add_to_context(self, role: str, content: str):
-        self.context_window.append({"role": role, "content": content})
-        if len(self.context_window) > self.max_context_messages:
-            self.context_window = self.context_window[-self.max_context_messages:]
+        self.context.add(role, content)
 
     def get_context(self) -> List[Dict[str, str]]:
-        return self.context_window.copy()
+        """Messages sent with the next request: running summary plus recent turns within the token budget"""
+        return self.context.window()
 
     def clear_context(self):
-        self.context_window = []
+        self.context.clear()
+
+    def _system_messages(self) -> List[Dict[str, str]]:
+        return [{"role": "system", "content": self.system_prompt}] if self.system_prompt else []
+
+    def _cacheable_prefix(self) -> bool:
+        """Whether the system prompt is long enough to be worth a prompt-cache breakpoint"""
+        return bool(LLM_PROMPT_CACHE and self.system_prompt and count_tokens(self.system_prompt) >= LLM_PROMPT_CACHE_MIN_TOKENS)
+
+    def _fit_prompt(self, messages: List[Dict[str, str]], max_tokens: int, budget: int,
+                    prefix_tokens: int = 0) -> List[Dict[str, str]]:
+        """Trim the final turn (the prompt) so the request stays within ``budget`` tokens.
+
+        The budget covers ``prefix_tokens`` sent outside ``messages``, the other
+        messages and the ``max_tokens`` completion. The prompt always keeps at
+        least a quarter of the budget, even when the history is large.
+        """
+        prompt = messages[-1]["content"]
+        available = budget - max_tokens - prefix_tokens - count_message_tokens(messages[:-1]) - TOKENS_PER_MESSAGE
+        available = max(available, budget // 4) - count_tokens(TRUNCATION_MARKER)
+        if count_tokens(prompt) <= available:
+            return messages
+        return messages[:-1] + [{**messages[-1], "content": truncate_to_tokens(prompt, available) + TRUNCATION_MARKER}]
+
+    def _groq_messages(self, prompt: str, history: bool = True, max_tokens: Optional[int] = None,
+                       budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """Build the Groq message list; ``history=False`` sends only the summary and the prompt.
+
+        Segments are ordered stable-first - system prompt, running summary,
+        recent turns, prompt - so the provider's automatic prefix caching can
+        reuse the system prompt across calls. The prompt is trimmed to the
+        Groq request token budget (see ``_fit_prompt``).
+        """
+        if history:
+            messages = self._system_messages() + self.get_context()
+        else:
+            summary = self.context.summary_message()
+            messages = self._system_messages() + ([summary] if summary else [])
+        if not messages or messages[-1]["content"] != prompt:
+            messages.append({"role": "user", "content": prompt})
+        budget = LLM_REQUEST_TOKEN_BUDGETS["groq"] if budget is None else budget
+        return self._fit_prompt(messages, max_tokens or self.max_tokens or 800, budget)
+
+    def _anthropic_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """Build the Anthropic message list (user/assistant turns only; the summary goes in ``system``)."""
+        messages = []
+        for msg in self.context.window(include_summary=False):
+            if msg["role"] in ["user", "assistant"]:
+                messages.append(msg)
+        if not messages or messages[-1]["content"] != prompt:
+            messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _anthropic_payload(self, model: str, prompt: str, **extra) -> Dict:
+        summary = self.context.summary_message()
+        system_tokens = count_tokens(self.system_prompt or "") + (count_tokens(summary["content"]) if summary else 0)
+        messages = self._fit_prompt(self._anthropic_messages(prompt), self.max_tokens or 1024,
+                                    LLM_REQUEST_TOKEN_BUDGETS["anthropic"], system_tokens)
+        payload = {"model": model, "messages": messages, "max_tokens": self.max_tokens or 1024, "temperature": self.temperature}
+        if self.system_prompt:
+            # System prompt first with a cache breakpoint after it; the summary changes and follows it
+            block = {"type": "text", "text": self.system_prompt}
+            if self._cacheable_prefix():
+                block["cache_control"] = {"type": "ephemeral"}
+            payload["system"] = [block] + ([{"type": "text", "text": summary["content"]}] if summary else [])
+        elif summary:
+            payload["system"] = summary["content"]
+        payload.update(extra)
+        return payload
+
+    def _resolved_model(self) -> str:
+        return _resolve_model(self.provider, self.model)
+
+    def _cache_key(self, prompt: str, cache: Optional[bool]) -> Optional[str]:
+        """Cache key for this request, or None when the cache does not apply.
+        
+        The cache applies when the temperature is 0 or the caller opts in
+        with ``cache=True``; ``cache=False`` always bypasses it.
+        """
+        if not get_llm_cache().enabled or cache is False:
+            return None
+        if not cache and self.temperature != 0:
+            return None
+        messages = self._system_messages() + self.get_context() + [{"role": "user", "content": prompt}]
+        return make_cache_key(self.provider, self._resolved_model(), self.temperature, messages)
+
+    def _lookup_cache(self, prompt: str, cache: Optional[bool], semantic_scope: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Consult the exact-match cache, then the semantic cache.
+        
+        Returns ``(cache_key, scope_key, cached_text)`` and records the outcome
+        in ``last_cache_status`` / ``last_saved_tokens``.
+        """
+        cache_key = self._cache_key(prompt, cache)
+        scope_key = None
+        semantic_cache = get_semantic_cache()
+        if semantic_scope and semantic_cache.enabled and cache is not False:
+            scope_key = make_scope_key(semantic_scope, self.provider, self._resolved_model(), self._system_messages() + self.get_context())
+        
+        self.last_cache_status = None if cache_key is None and scope_key is None else "miss"
+        self.last_saved_tokens = 0
+        cached = get_llm_cache().get(cache_key) if cache_key else None
+        if cached:
+            self.last_cache_status = "hit"
+        elif scope_key:
+            cached = semantic_cache.get(scope_key, prompt)
+            if cached:
+                self.last_cache_status = "semantic_hit"
+        if cached:
+            self.last_saved_tokens = cached[1]
+            return cache_key, scope_key, cached[0]
+        return cache_key, scope_key, None
 
-    async def generate(self, prompt: str, add_to_context: bool = True) -> str:
+    def _request_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """System prompt and context window plus ``prompt`` as the final user turn"""
+        messages = self._system_messages() + self.get_context()
+        if not messages or messages[-1]["content"] != prompt:
+            messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _request_key(self, prompt: str) -> str:
+        """Key identifying the exact provider request ``_complete`` would send.
+
+        Requests of a batch run are scoped to it, so interactive callers never
+        join a request parked in a batch job.
+        """
+        messages = self._request_messages(prompt)
+        key = make_request_key(self.provider, self._resolved_model(), self.temperature, self.max_tokens, self.api_key, messages)
+        batch = current_batch()
+        return f"{key}:batch:{batch.directory}" if batch is not None else key
+
+    def _store_cache(self, cache_key: Optional[str], scope_key: Optional[str], prompt: str, response_text: str):
+        tokens = getattr(response_text, "total_tokens", 0) or count_tokens(prompt) + count_tokens(response_text)
+        if cache_key:
+            get_llm_cache().set(cache_key, response_text, tokens=tokens)
+        if scope_key:
+            get_semantic_cache().set(scope_key, prompt, response_text, tokens=tokens)
+
+    def _estimated_result(self, prompt: str, text: str, provider: str, model: str) -> LLMResult:
+        """Result with usage counted locally, for calls the provider did not report"""
+        return LLMResult(
+            text,
+            prompt_tokens=count_message_tokens(self._request_messages(prompt)),
+            completion_tokens=count_tokens(text),
+            provider=provider,
+            model=model,
+            usage_source="estimate"
+        )
+
+    def _as_result(self, prompt: str, text: str, ok: bool) -> LLMResult:
+        """Wrap a bare completion text; failed calls spend no tokens"""
+        if isinstance(text, LLMResult):
+            return text
+        if not ok:
+            return LLMResult(text, provider=self.provider, model=self._resolved_model())
+        return self._estimated_result(prompt, text, self.provider, self._resolved_model())
+
+    def _cached_result(self, text: str) -> LLMResult:
+        return LLMResult(text, provider=self.provider, model=self._resolved_model(), usage_source="cache")
+
+    async def generate(self, prompt: str, add_to_context: bool = True, cache: Optional[bool] = None,
+                       semantic_scope: Optional[str] = None) -> LLMResult:
+        """Generate a completion for ``prompt``.
+        
+        Returns an ``LLMResult`` - the response text with its token usage.
+        ``cache`` controls the exact-match response cache (see ``_cache_key``).
+        ``semantic_scope`` identifies the prompt template (agent, system prompt,
+        tools); when set, near-duplicate prompts in that scope may be served
+        from the semantic cache.
+        """
+        cache_key, scope_key, cached = self._lookup_cache(prompt, cache, semantic_scope)
+        
         if add_to_context:
             self.add_to_context("user", prompt)
-        provider = self.provider
+        self.last_coalesced = False
+        if cached:
+            response_text = self._cached_result(cached)
+        else:
+            # Identical concurrent requests share one provider call; only the caller
+            # that made it (the leader) reports its token usage
+            leader = False
+
+            def complete():
+                nonlocal leader
+                leader = True
+                return self._complete(prompt)
+
+            response_text, ok = await get_single_flight("llm").do(self._request_key(prompt), complete)
+            if leader:
+                response_text = self._as_result(prompt, response_text, ok)
+                if ok:
+                    self._store_cache(cache_key, scope_key, prompt, response_text)
+            else:
+                self.last_coalesced = True
+                response_text = LLMResult(response_text, provider=getattr(response_text, "provider", self.provider),
+                                          model=getattr(response_text, "model", self._resolved_model()),
+                                          usage_source="coalesced")
+        self.last_result = response_text
+        if add_to_context and response_text:
+            self.add_to_context("assistant", response_text)
+        return response_text
+
+    async def _post(self, provider: str, url: str, payload: Dict, headers: Dict):
+        """POST to the provider under its rate-limit governor (see ``_post_request``)."""
+        return await _post_request(provider, url, payload, headers)
+
+    def _targets(self) -> List[Target]:
+        """The client's provider/model followed by configured fallbacks that have an API key"""
+        targets = [(self.provider, self._resolved_model())]
+        for provider, model in parse_targets(LLM_FALLBACK_PROVIDERS):
+            if _provider_key(provider):
+                targets.append((provider, _resolve_model(provider, model)))
+        return targets
+
+    async def _complete(self, prompt: str) -> Tuple[str, bool]:
+        """Complete ``prompt`` via the router, which hedges slow calls and fails over on errors.
+
+        Inside a batch run the request is queued for the run's batch job instead.
+        """
+        batch = current_batch()
+        if batch is not None:
+            return await self._complete_batched(batch, prompt)
+        response_text, ok, _ = await get_llm_router().complete(
+            self._targets(), lambda target: self._call_provider(prompt, *target)
+        )
+        return response_text, ok
+
+    async def _complete_batched(self, batch, prompt: str) -> Tuple[LLMResult, bool]:
+        """Queue the request in the provider's batch format and wait for the job's answer."""
+        provider, model = self.provider, self._resolved_model()
+        if _provider_family(provider) == "anthropic":
+            body = self._anthropic_payload(model, prompt)
+        else:
+            body = {"model": model, "messages": self._groq_messages(prompt), "max_tokens": self.max_tokens or 800, "temperature": self.temperature}
+        try:
+            response = await batch.submit(provider, body)
+        except Exception as e:
+            return LLMResult(f"[batch-error: {str(e)[:100]}]", provider=provider, model=model), False
+        response_text = _response_text(response)
+        usage = _parse_usage(response)
+        if not response_text:
+            return LLMResult("[batch-empty-response]", provider=provider, model=model), False
+        if usage:
+            return LLMResult(response_text, *usage, provider, model, usage_source="provider",
+                             cache_write_tokens=_parse_cache_writes(response)), True
+        return self._estimated_result(prompt, response_text, provider, model), True
+
+    async def _call_provider(self, prompt: str, provider: str, model: str) -> Tuple[LLMResult, bool]:
+        """Call one provider/model; returns the result and whether it is a real completion."""
+        api_key = self.api_key if provider == self.provider else None
+        usage = None
+        cache_writes = 0
         response_text = ""
+        ok = True
         if provider == "groq":
-            key = self.api_key or GROQ_KEY
-            model = self.model or GROQ_MODEL
+            key = api_key or GROQ_KEY
+            model = model or GROQ_MODEL
             if key:
                 import httpx
-                url = "https://api.groq.com/openai/v1/chat/completions"
+                url = GROQ_CHAT_URL
                 headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
-                messages = self.context_window.copy() if self.context_window else []
-                if not messages or messages[-1]["content"] != prompt:
-                    messages.append({"role": "user", "content": prompt})
-                
-                # Truncate messages to prevent 413 Payload Too Large
-                max_chars_per_message = 3000  # Limit each message to 3000 chars
-                truncated_messages = []
-                for msg in messages:
-                    content = msg.get("content", "")
-                    if len(content) > max_chars_per_message:
-                        content = content[:max_chars_per_message] + "\n\n[... content truncated due to size ...]"
-                    truncated_messages.append({"role": msg["role"], "content": content})
-                
-                # Keep only last 10 messages to reduce payload size
-                if len(truncated_messages) > 10:
-                    truncated_messages = truncated_messages[-10:]
-                
-                payload = {"model": model, "messages": truncated_messages, "max_tokens": 800, "temperature": 0.7}
+                payload = {"model": model, "messages": self._groq_messages(prompt), "max_tokens": self.max_tokens or 800, "temperature": self.temperature}
                 try:
-                    async with httpx.AsyncClient(timeout=60.0) as client:
-                        r = await client.post(url, json=payload, headers=headers)
-                        r.raise_for_status()
-                        j = r.json()
-                        response_text = j.get("choices", [{}])[0].get("message", {}).get("content", "")
-                        if not response_text:
-                            response_text = "[groq-empty-response]"
+                    r = await self._post(provider, url, payload, headers)
+                    j = r.json()
+                    response_text = j.get("choices", [{}])[0].get("message", {}).get("content", "")
+                    usage = _parse_usage(j)
+                    if not response_text:
+                        response_text = "[groq-empty-response]"
+                        ok = False
                 except httpx.HTTPStatusError as e:
                     if e.response.status_code == 413:
-                        # Payload too large - try with even smaller context
-                        truncated_messages = truncated_messages[-3:]  # Keep only last 3 messages
-                        for i, msg in enumerate(truncated_messages):
-                            truncated_messages[i]["content"] = msg["content"][:1500]
-                        payload["messages"] = truncated_messages
-                        payload["max_tokens"] = 500
+                        # Payload too large - retry with only the running summary and the
+                        # prompt, trimmed to half the request budget
+                        payload["max_tokens"] = min(500, payload["max_tokens"])
+                        payload["messages"] = self._groq_messages(prompt, history=False, max_tokens=payload["max_tokens"],
+                                                                  budget=LLM_REQUEST_TOKEN_BUDGETS["groq"] // 2)
                         try:
-                            async with httpx.AsyncClient(timeout=60.0) as client:
-                                r = await client.post(url, json=payload, headers=headers)
-                                r.raise_for_status()
-                                j = r.json()
-                                response_text = j.get("choices", [{}])[0].get("message", {}).get("content", "")
-                        except Exception:
-                            response_text = f"Analysis: Based on the available information, I'll provide a summary. {prompt[:500]}"
+                            r = await self._post(provider, url, payload, headers)
+                            j = r.json()
+                            response_text = j.get("choices", [{}])[0].get("message", {}).get("content", "")
+                            usage = _parse_usage(j)
+                            if not response_text:
+                                response_text = "[groq-empty-response]"
+                                ok = False
+                        except Exception as retry_error:
+                            ok = False
+                            response_text = f"[groq-error: request too large (413); trimmed retry failed: {str(retry_error)[:100]}]"
                     else:
+                        ok = False
                         response_text = f"AI service returned error {e.response.status_code}. Using simplified response."
                 except httpx.ConnectError as e:
+                    ok = False
                     response_text = f"I'm having trouble connecting to the AI service. Using fallback response: I understand you said '{prompt[:100]}'. However, I'm currently unable to connect to my AI backend. Please check your internet connection or API configuration."
                 except Exception as e:
+                    ok = False
                     response_text = f"Error connecting to AI: {str(e)[:100]}. I can still help with basic responses, but advanced AI features are temporarily unavailable."
             else:
                 await asyncio.sleep(0.01)
                 response_text = f"[mock-groq] response for: {prompt[:200]}"
         elif provider == "anthropic" or provider.startswith("claude"):
-            key = self.api_key or ANTHROPIC_KEY
-            model = self.model or ANTHROPIC_MODEL
+            key = api_key or ANTHROPIC_KEY
+            model = model or ANTHROPIC_MODEL
             if key:
-                import httpx
-                url = "https://api.anthropic.com/v1/messages"
+                url = ANTHROPIC_MESSAGES_URL
                 headers = {"x-api-key": key, "anthropic-version": "2023-06-01", "Content-Type": "application/json"}
-                messages = []
-                for msg in self.context_window:
-                    if msg["role"] in ["user", "assistant"]:
-                        messages.append(msg)
-                if not messages or messages[-1]["content"] != prompt:
-                    messages.append({"role": "user", "content": prompt})
-                payload = {"model": model, "messages": messages, "max_tokens": 1024}
+                payload = self._anthropic_payload(model, prompt)
                 try:
-                    async with httpx.AsyncClient(timeout=60.0) as client:
-                        r = await client.post(url, json=payload, headers=headers)
-                        r.raise_for_status()
-                        j = r.json()
-                        response_text = j.get("content", [{}])[0].get("text", "")
-                        if not response_text:
-                            response_text = "[anthropic-empty-response]"
+                    r = await self._post(provider, url, payload, headers)
+                    j = r.json()
+                    response_text = j.get("content", [{}])[0].get("text", "")
+                    usage = _parse_usage(j)
+                    cache_writes = _parse_cache_writes(j)
+                    if not response_text:
+                        response_text = "[anthropic-empty-response]"
+                        ok = False
                 except Exception as e:
+                    ok = False
                     response_text = f"[anthropic-error: {str(e)[:100]}]"
             else:
                 await asyncio.sleep(0.01)
@@ -149,6 +471,308 @@ class LLMClient:
         else:
             await asyncio.sleep(0.01)
             response_text = f"[mock-llm-{provider}] response for: {prompt[:200]}"
+        if usage:
+            prompt_tokens, completion_tokens, cached_tokens = usage
+            return LLMResult(response_text, prompt_tokens, completion_tokens, cached_tokens,
+                             provider, model, usage_source="provider", cache_write_tokens=cache_writes), ok
+        if not ok:
+            return LLMResult(response_text, provider=provider, model=model), ok
+        return self._estimated_result(prompt, response_text, provider, model), ok
+
+    async def stream(self, prompt: str, add_to_context: bool = True, cache: Optional[bool] = None,
+                     semantic_scope: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the completion as text deltas.
+
+        Groq and Anthropic are consumed as server-sent events; without an API
+        key a mock provider yields the mock response word by word. The joined
+        deltas are added to the context window once the stream finishes. A
+        response cache hit is yielded as a single delta.
+        """
+        cache_key, scope_key, cached = self._lookup_cache(prompt, cache, semantic_scope)
+        
+        if add_to_context:
+            self.add_to_context("user", prompt)
+        if cached:
+            self.last_result = self._cached_result(cached)
+            yield cached
+            if add_to_context:
+                self.add_to_context("assistant", cached)
+            return
+        
+        if current_batch() is not None:
+            # Batch runs are not interactive - wait for the batch job and yield the whole answer
+            response_text, ok = await self._complete(prompt)
+            response_text = self._as_result(prompt, response_text, ok)
+            self.last_result = response_text
+            yield response_text
+            if ok:
+                self._store_cache(cache_key, scope_key, prompt, response_text)
+            if add_to_context and response_text:
+                self.add_to_context("assistant", response_text)
+            return
+        
+        provider = self.provider
+        chunks: List[str] = []
+        streamed = True
+        result = None
+        # Filled from the provider's usage events, when it sends them
+        usage: Dict[str, int] = {}
+        if provider == "groq" and (self.api_key or GROQ_KEY):
+            key = self.api_key or GROQ_KEY
+            model = self.model or GROQ_MODEL
+            headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+            payload = {"model": model, "messages": self._groq_messages(prompt), "max_tokens": self.max_tokens or 800, "temperature": self.temperature,
+                       "stream": True, "stream_options": {"include_usage": True}}
+            events = _sse_deltas(GROQ_CHAT_URL, payload, headers, _groq_delta, get_governor("groq", model), usage)
+        elif (provider == "anthropic" or provider.startswith("claude")) and (self.api_key or ANTHROPIC_KEY):
+            key = self.api_key or ANTHROPIC_KEY
+            model = self.model or ANTHROPIC_MODEL
+            headers = {"x-api-key": key, "anthropic-version": "2023-06-01", "Content-Type": "application/json"}
+            payload = self._anthropic_payload(model, prompt, stream=True)
+            events = _sse_deltas(ANTHROPIC_MESSAGES_URL, payload, headers, _anthropic_delta, get_governor("anthropic", model), usage)
+        else:
+            model = self._resolved_model()
+            events = _mock_deltas(provider, prompt)
+        try:
+            async for delta in events:
+                chunks.append(delta)
+                yield delta
+        except Exception:
+            if chunks:
+                raise
+            # Nothing was streamed yet - fall back to the buffered path
+            response_text, streamed = await self._complete(prompt)
+            result = self._as_result(prompt, response_text, streamed)
+            chunks.append(result)
+            yield result
+        response_text = "".join(chunks)
+        if result is not None:
+            response_text = result
+        elif usage:
+            response_text = LLMResult(response_text, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+                                      usage.get("cached_tokens", 0), provider, model, usage_source="provider",
+                                      cache_write_tokens=usage.get("cache_write_tokens", 0))
+        else:
+            response_text = self._estimated_result(prompt, response_text, provider, model)
+        self.last_result = response_text
+        if streamed and response_text:
+            self._store_cache(cache_key, scope_key, prompt, response_text)
         if add_to_context and response_text:
             self.add_to_context("assistant", response_text)
-        return response_text
+
+
+def _groq_delta(event: Dict) -> str:
+    """Extract the text delta from an OpenAI-compatible stream chunk."""
+    choices = event.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+def _anthropic_delta(event: Dict) -> str:
+    """Extract the text delta from an Anthropic stream event."""
+    if event.get("type") == "content_block_delta":
+        return (event.get("delta") or {}).get("text") or ""
+    return ""
+
+
+def _provider_family(provider: str) -> str:
+    return "anthropic" if provider == "anthropic" or provider.startswith("claude") else provider
+
+
+def _resolve_model(provider: str, model: Optional[str]) -> str:
+    """Model that a call to ``provider`` will use when ``model`` is not set."""
+    if provider == "groq":
+        return model or GROQ_MODEL
+    if _provider_family(provider) == "anthropic":
+        return model or ANTHROPIC_MODEL
+    return model or ""
+
+
+def _provider_key(provider: str) -> Optional[str]:
+    """API key configured in the environment for ``provider``."""
+    if provider == "groq":
+        return GROQ_KEY
+    if _provider_family(provider) == "anthropic":
+        return ANTHROPIC_KEY
+    return None
+
+
+async def _post_request(provider: str, url: str, payload: Dict, headers: Dict):
+    """POST to the provider under its rate-limit governor.
+
+    Waits for request/token budget before sending, syncs the budgets from
+    the response headers and retries 429/529 with jittered backoff. Rejected
+    or unsent requests give their token reservation back, so each retry
+    reserves only once.
+    """
+    governor = get_governor(_provider_family(provider), payload.get("model", ""))
+    estimated = _estimate_request_tokens(payload)
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await governor.acquire(estimated)
+        try:
+            r = await _http_client().post(url, json=payload, headers=headers)
+        except Exception:
+            governor.refund(estimated)
+            raise
+        if r.is_error:
+            # Refund before syncing, so the provider's remaining budget still caps the bucket
+            governor.refund(estimated)
+        if r.status_code in RETRYABLE_STATUS_CODES and attempt < LLM_MAX_RETRIES:
+            governor.throttled(r.headers)
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        governor.update_from_headers(r.headers)
+        r.raise_for_status()
+        usage = _parse_usage(r.json())
+        governor.record_usage(sum(usage[:2]) if usage else estimated, estimated)
+        return r
+
+
+async def execute_request(provider: str, body: Dict) -> Dict:
+    """Send one provider-format request body and return the response body.
+
+    Used by the local batch backend. Without an API key the mock provider
+    answers in the provider's response format (without ``usage``).
+    """
+    key = _provider_key(provider)
+    anthropic = _provider_family(provider) == "anthropic"
+    if key:
+        if anthropic:
+            headers = {"x-api-key": key, "anthropic-version": "2023-06-01", "Content-Type": "application/json"}
+            r = await _post_request(provider, ANTHROPIC_MESSAGES_URL, body, headers)
+        else:
+            headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+            r = await _post_request(provider, GROQ_CHAT_URL, body, headers)
+        return r.json()
+    await asyncio.sleep(0.01)
+    prompt = str((body.get("messages") or [{}])[-1].get("content", ""))
+    label = {"groq": "mock-groq", "anthropic": "mock-anthropic"}.get(_provider_family(provider), f"mock-llm-{provider}")
+    text = f"[{label}] response for: {prompt[:200]}"
+    if anthropic:
+        return {"type": "message", "role": "assistant", "model": body.get("model", ""), "content": [{"type": "text", "text": text}]}
+    return {"object": "chat.completion", "model": body.get("model", ""), "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]}
+
+
+def _response_text(body: Dict) -> str:
+    """Completion text of a Groq (OpenAI format) or Anthropic response body"""
+    if "choices" in body:
+        return ((body.get("choices") or [{}])[0].get("message") or {}).get("content") or ""
+    return ((body.get("content") or [{}])[0]).get("text") or ""
+
+
+def _estimate_request_tokens(payload: Dict) -> int:
+    """Budget estimate for a request: messages and Anthropic ``system`` text, counted like
+    ``_fit_prompt`` counts them, plus the max output."""
+    system = payload.get("system") or []
+    blocks = [system] if isinstance(system, str) else [block.get("text", "") for block in system]
+    return (count_message_tokens(payload.get("messages", [])) + sum(count_tokens(text) for text in blocks)
+            + int(payload.get("max_tokens", 0)))
+
+
+def _parse_usage(body: Dict) -> Optional[Tuple[int, int, int]]:
+    """``(prompt, completion, cached)`` tokens from a Groq (OpenAI format) or Anthropic ``usage`` field.
+
+    Anthropic reports cache reads and writes separately from ``input_tokens``;
+    they are folded into the prompt count so both formats mean the same thing.
+    """
+    usage = body.get("usage")
+    if not isinstance(usage, dict):
+        return None
+    if "prompt_tokens" in usage or "completion_tokens" in usage:
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        return int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0), int(cached or 0)
+    if "input_tokens" in usage or "output_tokens" in usage:
+        cached = int(usage.get("cache_read_input_tokens") or 0)
+        prompt = int(usage.get("input_tokens") or 0) + cached + int(usage.get("cache_creation_input_tokens") or 0)
+        return prompt, int(usage.get("output_tokens") or 0), cached
+    return None
+
+
+def _parse_cache_writes(body: Dict) -> int:
+    """Prompt tokens written to the provider's cache (Anthropic ``cache_creation_input_tokens``)"""
+    usage = body.get("usage")
+    if not isinstance(usage, dict):
+        return 0
+    return int(usage.get("cache_creation_input_tokens") or 0)
+
+
+def _merge_stream_usage(usage: Dict[str, int], event: Dict):
+    """Collect usage from stream events.
+
+    Groq sends it in the final chunk (``usage`` or ``x_groq.usage``); Anthropic
+    sends input tokens in ``message_start`` and the output count in ``message_delta``.
+    """
+    for body in (event, event.get("x_groq") or {}, event.get("message") or {}):
+        parsed = _parse_usage(body)
+        if parsed:
+            for name, value in zip(("prompt_tokens", "completion_tokens", "cached_tokens"), parsed):
+                usage[name] = max(usage.get(name, 0), value)
+        cache_writes = _parse_cache_writes(body)
+        if cache_writes:
+            usage["cache_write_tokens"] = max(usage.get("cache_write_tokens", 0), cache_writes)
+
+
+async def _sse_deltas(url: str, payload: Dict, headers: Dict, extract, governor=None,
+                      usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+    """POST a streaming request and yield text deltas from its SSE body.
+
+    Token usage reported in the stream is merged into ``usage`` when given.
+    With a ``governor`` the request reserves its estimated tokens up front and
+    settles them against the reported usage when the stream ends; a request
+    that was rejected or never reached the provider is refunded.
+    """
+    usage = usage if usage is not None else {}
+    estimated = _estimate_request_tokens(payload)
+    if governor:
+        await governor.acquire(estimated)
+    reserved = governor is not None
+    responded = False
+    try:
+        async with _http_client().stream("POST", url, json=payload, headers=headers) as r:
+            responded = True
+            if governor:
+                if r.is_error:
+                    governor.refund(estimated)
+                    reserved = False
+                if r.status_code in RETRYABLE_STATUS_CODES:
+                    governor.throttled(r.headers)
+                else:
+                    governor.update_from_headers(r.headers)
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                if event.get("type") == "message_stop":
+                    break
+                _merge_stream_usage(usage, event)
+                delta = extract(event)
+                if delta:
+                    yield delta
+    finally:
+        if reserved:
+            if not responded:
+                governor.refund(estimated)
+            else:
+                actual = usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+                governor.record_usage(actual or estimated, estimated)
+
+
+async def _mock_deltas(provider: str, prompt: str) -> AsyncIterator[str]:
+    """Mock streaming provider: yields the mock response word by word."""
+    if provider == "groq":
+        label = "groq"
+    elif provider == "anthropic" or provider.startswith("claude"):
+        label = "anthropic"
+    else:
+        label = f"llm-{provider}"
+    text = f"[mock-{label}] response for: {prompt[:200]}"
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        await asyncio.sleep(MOCK_STREAM_DELAY)
+        yield word if i == 0 else " " + word
@@ -0,0 +1,213 @@
+"""
+LLM Provider Router
+Hedged requests and health-aware failover across LLM providers/models
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Comma-separated secondary targets, e.g. "anthropic,groq:llama-3.3-70b-versatile"
+LLM_FALLBACK_PROVIDERS = os.getenv("LLM_FALLBACK_PROVIDERS", "")
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+# Latency samples needed before the p95 is trusted as a hedge trigger
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Never hedge earlier than this, whatever the p95 says
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+LLM_PROVIDER_FAILURE_THRESHOLD = int(os.getenv("LLM_PROVIDER_FAILURE_THRESHOLD", "3"))
+LLM_PROVIDER_COOLDOWN_SECONDS = float(os.getenv("LLM_PROVIDER_COOLDOWN_SECONDS", "30"))
+
+# (provider, model); an empty model means the provider's default
+Target = Tuple[str, str]
+# Calls one target and returns (text, ok)
+TargetCall = Callable[[Target], Awaitable[Tuple[str, bool]]]
+
+
+def parse_targets(spec: str) -> List[Target]:
+    """Parse "provider[:model],..." into targets"""
+    targets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        provider, _, model = item.partition(":")
+        targets.append((provider.strip().lower(), model.strip()))
+    return targets
+
+
+class ProviderHealth:
+    """Latency and failure history for one provider/model"""
+
+    def __init__(self, window: int = 200):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self, threshold: int, cooldown: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= threshold:
+            # Too many failures in a row - skip this target until the cooldown passes
+            self.open_until = time.monotonic() + cooldown
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def p95(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "healthy": self.healthy(),
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "samples": len(self.latencies),
+            "p95_latency": round(p95, 3) if p95 is not None else None
+        }
+
+
+class LLMRouter:
+    """Routes one completion over an ordered list of provider targets.
+
+    The first healthy target is called. If it has not answered by its observed
+    p95 latency, a hedge request goes to the next target and whichever succeeds
+    first wins; the other request is cancelled. A failed response fails over to
+    the next target. Targets that fail repeatedly are moved to the back of the
+    list until their cooldown expires.
+    """
+
+    def __init__(self,
+                 hedge_enabled: bool = LLM_HEDGE_ENABLED,
+                 min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+                 min_hedge_delay: float = LLM_HEDGE_MIN_DELAY,
+                 failure_threshold: int = LLM_PROVIDER_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = LLM_PROVIDER_COOLDOWN_SECONDS):
+        self.hedge_enabled = hedge_enabled
+        self.min_samples = min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._health: Dict[Target, ProviderHealth] = {}
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def health(self, target: Target) -> ProviderHealth:
+        health = self._health.get(target)
+        if health is None:
+            health = self._health[target] = ProviderHealth()
+        return health
+
+    def order(self, targets: List[Target]) -> List[Target]:
+        """De-duplicate targets and move unhealthy ones to the back"""
+        unique = list(dict.fromkeys(targets))
+        return sorted(unique, key=lambda t: not self.health(t).healthy())
+
+    def hedge_delay(self, target: Target) -> Optional[float]:
+        """Seconds to wait on ``target`` before hedging, or None without enough history"""
+        health = self.health(target)
+        if not self.hedge_enabled or len(health.latencies) < self.min_samples:
+            return None
+        return max(self.min_hedge_delay, health.p95())
+
+    async def _attempt(self, target: Target, call: TargetCall) -> Tuple[str, bool]:
+        start = time.monotonic()
+        try:
+            text, ok = await call(target)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            text, ok = f"[{target[0]}-error: {str(e)[:100]}]", False
+        if ok:
+            self.health(target).record_success(time.monotonic() - start)
+        else:
+            self.health(target).record_failure(self.failure_threshold, self.cooldown_seconds)
+        return text, ok
+
+    async def complete(self, targets: List[Target], call: TargetCall) -> Tuple[str, bool, Target]:
+        """Return ``(text, ok, target)`` from the first target to succeed.
+
+        When every target fails, the last failure is returned with ``ok=False``.
+        """
+        targets = self.order(targets)
+        self.requests += 1
+        tasks: Dict["asyncio.Task", Tuple[Target, bool]] = {}
+        last: Tuple[str, bool, Target] = ("", False, targets[0])
+        next_index = 0
+        hedged = False
+
+        def start(is_hedge: bool):
+            nonlocal next_index
+            target = targets[next_index]
+            next_index += 1
+            tasks[asyncio.ensure_future(self._attempt(target, call))] = (target, is_hedge)
+
+        try:
+            while tasks or next_index < len(targets):
+                if not tasks:
+                    if next_index > 0:
+                        self.failovers += 1
+                    start(False)
+
+                timeout = None
+                if not hedged and len(tasks) == 1 and next_index < len(targets):
+                    (running_target, _), = tasks.values()
+                    timeout = self.hedge_delay(running_target)
+
+                done, _ = await asyncio.wait(tasks.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than its p95 - race it against the next target
+                    hedged = True
+                    self.hedges += 1
+                    start(True)
+                    continue
+
+                for task in done:
+                    target, is_hedge = tasks.pop(task)
+                    text, ok = task.result()
+                    if ok:
+                        if is_hedge:
+                            self.hedge_wins += 1
+                        return text, ok, target
+                    last = (text, ok, target)
+            return last
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing statistics"""
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "targets": {f"{p}:{m}" if m else p: h.get_stats() for (p, m), h in self._health.items()}
+        }
+
+
+# Global router instance
+_llm_router = None
+
+
+def get_llm_router() -> LLMRouter:
+    """Get or create the global LLM router"""
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMRouter()
+    return _llm_router
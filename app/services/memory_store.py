@@ -0,0 +1,105 @@
+"""
+Persistent KAG Memory Store
+SQLite backend for ConversationMemory so facts, summaries and reasoning survive
+restarts and are shared by every worker using the same database file
+"""
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.storage import DATA_BASE
+
+# Empty keeps KAG memory in-process only
+KAG_MEMORY_DB_PATH = os.getenv("KAG_MEMORY_DB_PATH", str(DATA_BASE / "kag_memory.db"))
+
+
+def encode_memory(memory: Dict[str, Any]) -> bytes:
+    """Compact form of a memory entry: minified JSON, zlib-compressed"""
+    return zlib.compress(json.dumps(memory, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def decode_memory(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class SQLiteMemoryStore:
+    """Append-only memory rows per (solution, workflow).
+
+    Row ids are never reused, so a reader that remembers the last id it saw
+    can pick up rows written since - by this process or another worker - with
+    one indexed query.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kag_memory ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, solution_id TEXT NOT NULL, "
+            "workflow_id TEXT NOT NULL, data BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS kag_memory_solution ON kag_memory (solution_id, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS kag_memory_workflow ON kag_memory (solution_id, workflow_id, id)")
+        self._conn.commit()
+
+    def append(self, solution_id: str, workflow_id: str, memory: Dict[str, Any], keep: int = 0) -> int:
+        """Write a memory; with ``keep`` only the newest ``keep`` rows of the workflow are retained"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO kag_memory (solution_id, workflow_id, data) VALUES (?, ?, ?)",
+                (solution_id, workflow_id, encode_memory(memory))
+            )
+            if keep:
+                self._conn.execute(
+                    "DELETE FROM kag_memory WHERE solution_id = ? AND workflow_id = ? AND id NOT IN ("
+                    "SELECT id FROM kag_memory WHERE solution_id = ? AND workflow_id = ? ORDER BY id DESC LIMIT ?)",
+                    (solution_id, workflow_id, solution_id, workflow_id, keep)
+                )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def load(self, solution_id: str, after: int = 0) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """``(id, workflow_id, memory)`` rows of a solution newer than ``after``, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, workflow_id, data FROM kag_memory WHERE solution_id = ? AND id > ? ORDER BY id",
+                (solution_id, after)
+            ).fetchall()
+        return [(row_id, workflow_id, decode_memory(data)) for row_id, workflow_id, data in rows]
+
+    def delete_solution(self, solution_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM kag_memory WHERE solution_id = ?", (solution_id,))
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows, solutions, size = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT solution_id), COALESCE(SUM(LENGTH(data)), 0) FROM kag_memory"
+            ).fetchone()
+        return {"db_path": self.db_path, "rows": rows, "solutions": solutions, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_memory_store(db_path: Optional[str] = None) -> Optional[SQLiteMemoryStore]:
+    """The configured store, or None (in-process memory only) when no path is set or it cannot be opened"""
+    if db_path is None:
+        db_path = KAG_MEMORY_DB_PATH
+    if not db_path:
+        return None
+    try:
+        return SQLiteMemoryStore(db_path)
+    except sqlite3.Error as e:
+        print(f"⚠️ KAG memory store unavailable ({db_path}): {e}; keeping memory in-process")
+        return None
@@ -30,6 +30,18 @@ class MetricsData(BaseModel):
     token_usage_count: int = Field(0, description="Total tokens used (input + output)")
     token_input_count: int = Field(0, description="Input tokens used")
     token_output_count: int = Field(0, description="Output tokens used")
+    token_cached_count: int = Field(0, description="Input tokens served from the provider's prompt cache")
+    token_cache_write_count: int = Field(0, description="Input tokens written to the provider's prompt cache")
+    prompt_cache_hit_ratio: float = Field(0.0, description="Share of input tokens served from the prompt cache (0-100)")
+    token_estimated_count: int = Field(0, description="Tokens counted locally because the provider reported no usage")
+    
+    # LLM Response Cache Metrics
+    llm_cache_hits: int = Field(0, description="LLM calls served from the response cache")
+    llm_cache_misses: int = Field(0, description="Cacheable LLM calls that missed the cache")
+    llm_cache_hit_ratio: float = Field(0.0, description="Response cache hit ratio (0-100)")
+    llm_cache_saved_tokens: int = Field(0, description="Tokens not spent thanks to cache hits")
+    llm_semantic_cache_hits: int = Field(0, description="Cache hits served by near-duplicate prompt matching")
+    llm_coalesced_hits: int = Field(0, description="LLM calls that joined an identical call already in flight")
     
     # Quality Metrics
     accuracy: float = Field(0.0, description="Estimated accuracy score (0-100)")
@@ -69,6 +81,9 @@ class MetricsTracker:
         self.token_count: int = 0
         self.token_input: int = 0
         self.token_output: int = 0
+        self.token_cached: int = 0
+        self.token_cache_write: int = 0
+        self.token_estimated: int = 0
         self.tool_invocations: List[Dict[str, Any]] = []
         self.agent_executions: List[Dict[str, Any]] = []
         self.errors: List[str] = []
@@ -76,6 +91,11 @@ class MetricsTracker:
         self.steps_executed: int = 0
         self.decision_points: int = 0
         self.branches_taken: List[int] = []
+        self.llm_cache_hits: int = 0
+        self.llm_cache_misses: int = 0
+        self.llm_cache_saved_tokens: int = 0
+        self.llm_semantic_cache_hits: int = 0
+        self.llm_coalesced_hits: int = 0
     
     def start(self):
         """Start tracking."""
@@ -85,11 +105,30 @@ class MetricsTracker:
         """End tracking."""
         self.end_time = time.time()
     
-    def add_token_usage(self, input_tokens: int, output_tokens: int):
-        """Track token usage."""
+    def add_token_usage(self, input_tokens: int, output_tokens: int, cached_tokens: int = 0, estimated: bool = False,
+                        cache_write_tokens: int = 0):
+        """Track token usage; ``cached_tokens``/``cache_write_tokens`` are prompt-cache reads/writes within ``input_tokens``."""
         self.token_input += input_tokens
         self.token_output += output_tokens
         self.token_count += input_tokens + output_tokens
+        self.token_cached += cached_tokens
+        self.token_cache_write += cache_write_tokens
+        if estimated:
+            self.token_estimated += input_tokens + output_tokens
+    
+    def add_llm_cache_lookup(self, hit: bool, saved_tokens: int = 0, semantic: bool = False):
+        """Track an LLM response cache lookup."""
+        if hit:
+            self.llm_cache_hits += 1
+            self.llm_cache_saved_tokens += saved_tokens
+            if semantic:
+                self.llm_semantic_cache_hits += 1
+        else:
+            self.llm_cache_misses += 1
+    
+    def add_llm_coalesced(self):
+        """Track an LLM call answered by an identical call already in flight."""
+        self.llm_coalesced_hits += 1
     
     def add_tool_invocation(self, tool_id: str, success: bool, error: Optional[str] = None):
         """Track tool invocation."""
@@ -100,12 +139,13 @@ class MetricsTracker:
             "timestamp": time.time()
         })
     
-    def add_agent_execution(self, agent_id: str, success: bool, tokens_used: int = 0):
+    def add_agent_execution(self, agent_id: str, success: bool, tokens_used: int = 0, model: Optional[str] = None):
         """Track agent execution."""
         self.agent_executions.append({
             "agent_id": agent_id,
             "success": success,
             "tokens_used": tokens_used,
+            "model": model,
             "timestamp": time.time()
         })
     
@@ -193,6 +233,10 @@ class MetricsTracker:
             if len(self.errors) > 0:
                 context_relation = max(0, context_relation - (len(self.errors) * 10))
         
+        # Calculate response cache hit ratio
+        cache_lookups = self.llm_cache_hits + self.llm_cache_misses
+        cache_hit_ratio = (self.llm_cache_hits / cache_lookups * 100) if cache_lookups > 0 else 0
+        
         # Calculate decision depth and branching factor
         decision_depth = self.decision_points
         branching_factor = (sum(self.branches_taken) / len(self.branches_taken)) if self.branches_taken else 1.0
@@ -202,6 +246,16 @@ class MetricsTracker:
             token_usage_count=self.token_count,
             token_input_count=self.token_input,
             token_output_count=self.token_output,
+            token_cached_count=self.token_cached,
+            token_cache_write_count=self.token_cache_write,
+            prompt_cache_hit_ratio=round(self.token_cached / self.token_input * 100, 2) if self.token_input else 0.0,
+            token_estimated_count=self.token_estimated,
+            llm_cache_hits=self.llm_cache_hits,
+            llm_cache_misses=self.llm_cache_misses,
+            llm_cache_hit_ratio=round(cache_hit_ratio, 2),
+            llm_cache_saved_tokens=self.llm_cache_saved_tokens,
+            llm_semantic_cache_hits=self.llm_semantic_cache_hits,
+            llm_coalesced_hits=self.llm_coalesced_hits,
             accuracy=round(accuracy, 2),
             response_quality=round(response_quality, 2),
             hallucination_rate=round(hallucination_rate, 2),
@@ -0,0 +1,112 @@
+"""
+Model Tiering
+Resolves the provider/model/temperature/max_tokens an agent runs with, from its
+llm_config and tier policies that send lightweight steps to small, fast models
+"""
+import os
+import json
+from typing import Any, Dict, Optional
+
+# Tier models per provider family. Tiers run on LLM_PROVIDER unless overridden
+# with LLM_<TIER>_PROVIDER / LLM_<TIER>_MODEL
+PROVIDER_TIERS = {
+    "groq": {"small": "llama-3.1-8b-instant", "large": "llama-3.3-70b-versatile"},
+    "anthropic": {"small": "claude-haiku-4.5", "large": "claude-sonnet-4.5"},
+}
+TIERS = ("small", "large")
+
+# Step kind -> tier; extend or override with LLM_TIER_POLICY='{"classification": "small"}'
+DEFAULT_TIER_POLICY = {
+    "pre_inspection": "small",
+    "inspection": "small",
+    "routing": "small",
+    "classification": "small",
+    "extraction": "small",
+    "formatting": "small",
+    "summarization": "small",
+    "reasoning": "large",
+    "analysis": "large",
+    "planning": "large",
+    "synthesis": "large",
+}
+
+LLM_SETTINGS = ("provider", "model", "temperature", "max_tokens")
+
+
+def _provider_family(provider: str) -> str:
+    return "anthropic" if provider.startswith("claude") else provider
+
+
+def _tier_model(tier: str, provider: str) -> Optional[str]:
+    """Model of ``tier`` on ``provider``; LLM_<TIER>_MODEL applies when it targets that provider"""
+    prefix = f"LLM_{tier.upper()}"
+    model = os.getenv(f"{prefix}_MODEL")
+    tier_provider = os.getenv(f"{prefix}_PROVIDER", os.getenv("LLM_PROVIDER", "groq")).lower()
+    if model and _provider_family(tier_provider) == _provider_family(provider):
+        return model
+    return PROVIDER_TIERS.get(_provider_family(provider), {}).get(tier)
+
+
+def get_tiers() -> Dict[str, Dict[str, str]]:
+    """Tier definitions after environment overrides"""
+    tiers = {}
+    for name in TIERS:
+        provider = os.getenv(f"LLM_{name.upper()}_PROVIDER", os.getenv("LLM_PROVIDER", "groq")).lower()
+        tiers[name] = {"provider": provider}
+        model = _tier_model(name, provider)
+        if model:
+            tiers[name]["model"] = model
+    return tiers
+
+
+def get_tier_policy() -> Dict[str, str]:
+    """Step-kind to tier mapping after LLM_TIER_POLICY overrides"""
+    policy = dict(DEFAULT_TIER_POLICY)
+    raw = os.getenv("LLM_TIER_POLICY")
+    if raw:
+        try:
+            policy.update({str(k).lower(): str(v).lower() for k, v in json.loads(raw).items()})
+        except (ValueError, AttributeError):
+            print(f"⚠️ Ignoring invalid LLM_TIER_POLICY: {raw}")
+    return policy
+
+
+def tier_for(step_kind: Optional[str]) -> Optional[str]:
+    """Tier for a step kind; tier names themselves ("small", "large") are accepted too"""
+    if not step_kind:
+        return None
+    step_kind = step_kind.lower()
+    if step_kind in TIERS:
+        return step_kind
+    return get_tier_policy().get(step_kind)
+
+
+def resolve_llm_config(llm_config: Optional[Dict[str, Any]], step_kind: Optional[str] = None) -> Dict[str, Any]:
+    """Settings for one agent step.
+
+    The agent's ``llm_config`` (provider, model, temperature, max_tokens) is
+    the baseline. A tier - from the workflow node's ``step_kind``, else the
+    agent's own ``tier``/``step_kind`` - picks the model, so the same agent
+    can route on a small model and reason on a large one. An explicit model
+    is never replaced, and an explicit provider keeps the tier on that
+    provider. Unset values fall back to the LLMClient defaults.
+    """
+    llm_config = llm_config or {}
+    settings = {key: llm_config[key] for key in LLM_SETTINGS if llm_config.get(key) is not None}
+
+    tier = tier_for(step_kind) or tier_for(llm_config.get("tier")) or tier_for(llm_config.get("step_kind"))
+    if tier and "model" not in settings:
+        if "provider" in settings:
+            model = _tier_model(tier, str(settings["provider"]).lower())
+            tier_settings = {"model": model} if model else {}
+        else:
+            tier_settings = get_tiers()[tier]
+        if tier_settings:
+            settings.update(tier_settings)
+            settings["tier"] = tier
+
+    if "temperature" in settings:
+        settings["temperature"] = float(settings["temperature"])
+    if "max_tokens" in settings:
+        settings["max_tokens"] = int(settings["max_tokens"])
+    return settings
@@ -1,10 +1,14 @@
 import asyncio
+import hashlib
 import uuid
-from typing import Any, Dict, List, TypedDict, Annotated
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypedDict, Annotated
 from langgraph.graph import StateGraph, END
 from operator import add
 from app.storage import load
 from app.services.llm_client import LLMClient
+from app.services.model_tiers import resolve_llm_config
+from app.services.context_store import get_context_store
 from app.services.tool_orchestrator import tool_orchestrator, ToolExecutionStrategy
 from app.services.output_formatter import output_formatter
 from app.services.metrics_service import create_metrics_tracker, MetricsTracker
@@ -26,18 +30,25 @@ class WorkflowState(TypedDict):
     steps: List[Dict[str, Any]]  # Execution steps for visualization
 
 
+# Async callback receiving node events (node_started, token, node_completed)
+NodeEventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Metrics tracker of the workflow run the current task belongs to, so runs
+# executing concurrently (batch inputs, parallel requests) never share one
+_current_metrics: ContextVar[Optional[MetricsTracker]] = ContextVar("current_metrics", default=None)
+
+
 class LangGraphOrchestrator:
     """Orchestrator using LangGraph + LangChain agents for workflow execution."""
     
-    def __init__(self):
-        self.agent_llms: Dict[str, LLMClient] = {}
-        self.current_metrics: MetricsTracker = None
+    @property
+    def current_metrics(self) -> Optional[MetricsTracker]:
+        """Metrics of the run in progress in this task (and the tasks it spawned)"""
+        return _current_metrics.get()
     
-    def get_agent_llm(self, agent_id: str) -> LLMClient:
-        """Get or create LLM client for an agent."""
-        if agent_id not in self.agent_llms:
-            self.agent_llms[agent_id] = LLMClient()
-        return self.agent_llms[agent_id]
+    @current_metrics.setter
+    def current_metrics(self, tracker: Optional[MetricsTracker]):
+        _current_metrics.set(tracker)
     
     def create_tool_from_def(self, tool_def: Dict[str, Any]) -> Tool:
         """Create a LangChain Tool from tool definition."""
@@ -135,11 +146,25 @@ class LangGraphOrchestrator:
                 description=f"Generic tool: {tool_name}"
             )
     
-    def get_agent_llm(self, agent_id: str) -> LLMClient:
-        """Get or create LLM client for an agent."""
-        if agent_id not in self.agent_llms:
-            self.agent_llms[agent_id] = LLMClient()
-        return self.agent_llms[agent_id]
+    def get_agent_llm(self, agent_id: str, settings: Optional[Dict[str, Any]] = None,
+                      scope_id: Optional[str] = None, system_prompt: Optional[str] = None) -> LLMClient:
+        """Build the LLM client for one agent step from resolved llm_config ``settings``.
+        
+        Clients hold no state between steps. The agent's conversation context
+        comes from the context store, scoped to the workflow run or chat session
+        ``scope_id``, so prompts never carry over between runs or users. Without
+        a scope the step gets a fresh context. ``system_prompt`` is sent as the
+        stable, cacheable prefix of every request.
+        """
+        settings = settings or {}
+        return LLMClient(
+            provider=settings.get("provider"),
+            model=settings.get("model"),
+            temperature=settings.get("temperature", 0.7),
+            max_tokens=settings.get("max_tokens"),
+            context=get_context_store().get(scope_id, agent_id) if scope_id else None,
+            system_prompt=system_prompt
+        )
     
     async def run_tool(self, tool_def: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a tool using advanced tool orchestrator."""
@@ -174,8 +199,16 @@ class LangGraphOrchestrator:
                 "tool_type": tool_def.get("type")
             }
     
-    async def run_agent(self, agent_def: Dict[str, Any], task: str, state: WorkflowState) -> Dict[str, Any]:
-        """Execute an agent with its tools."""
+    async def run_agent(self, agent_def: Dict[str, Any], task: str, state: WorkflowState,
+                        node_id: str = None, on_event: Optional[NodeEventHandler] = None,
+                        step_kind: Optional[str] = None, scope_id: Optional[str] = None) -> Dict[str, Any]:
+        """Execute an agent with its tools.
+        
+        When ``on_event`` is given the LLM response is streamed and every text
+        delta is forwarded as a ``token`` event for ``node_id``. ``step_kind``
+        (e.g. "routing", "reasoning") selects a model tier for this step, and
+        ``scope_id`` (run or chat session) scopes the agent's conversation context.
+        """
         agent_id = agent_def.get("id", "unknown-agent")
         agent_name = agent_def.get("name", agent_id)
         agent_type = agent_def.get("type", "zero_shot")
@@ -184,16 +217,16 @@ class LangGraphOrchestrator:
         # Track agent execution start
         agent_success = True
         
-        # Get dedicated LLM for this agent
-        agent_llm = self.get_agent_llm(agent_id)
+        # Get dedicated LLM for this agent, configured from its llm_config and the step's tier
+        llm_settings = resolve_llm_config(agent_def.get("llm_config"), step_kind)
+        # The system prompt is identical on every step, so it is sent as the request's
+        # stable prefix (cacheable by the provider) rather than inside the prompt
+        agent_llm = self.get_agent_llm(agent_id, llm_settings, scope_id, system_prompt=system_prompt)
         
-        # Build prompt with context from previous agents (communication)
+        # Build prompt stable-first: the node task, then context from previous agents
+        # (communication), then tool results
         prompt = task
         
-        # Add system prompt
-        if system_prompt:
-            prompt = f"{system_prompt}\n\n{prompt}"
-        
         # Add communication context from agents this node receives from
         if state.get("messages"):
             recent_msgs = state["messages"][-5:]
@@ -203,7 +236,7 @@ class LangGraphOrchestrator:
                 if m.get('type') in ['agent_result', 'tool_result']
             ])
             if context_str:
-                prompt = f"Previous communication:\n{context_str}\n\nYour task: {prompt}"
+                prompt = f"Your task: {prompt}\n\nPrevious communication:\n{context_str}"
         
         # Load and execute tools first to provide context to LLM
         tool_results = {}
@@ -300,19 +333,45 @@ class LangGraphOrchestrator:
                         elif result.data.get("content"):
                             prompt += f"\n\n=== {tool_name} Result ===\n{str(result.data.get('content'))[:300]}"
         
+        # Template identity for the semantic cache: same agent, system prompt and tools
+        template_hash = hashlib.sha256(json.dumps([system_prompt, agent_def.get("tools", [])]).encode("utf-8")).hexdigest()[:16]
+        semantic_scope = f"{agent_id}:{template_hash}"
+        
         # Call LLM with enriched context
-        llm_response = await agent_llm.generate(prompt)
+        if on_event:
+            deltas = []
+            async for delta in agent_llm.stream(prompt, semantic_scope=semantic_scope):
+                deltas.append(delta)
+                await on_event({"type": "token", "node_id": node_id, "agent_id": agent_id, "delta": delta})
+            llm_response = "".join(deltas)
+        else:
+            llm_response = await agent_llm.generate(prompt, semantic_scope=semantic_scope)
         
-        # Track token usage from LLM response (estimate if not available)
+        # Track token usage reported by the provider (counted locally when it reports none)
         if self.current_metrics:
-            # Rough token estimation: 1 token ≈ 4 characters
-            estimated_input_tokens = len(prompt) // 4
-            estimated_output_tokens = len(llm_response) // 4
-            self.current_metrics.add_token_usage(estimated_input_tokens, estimated_output_tokens)
+            cache_hit = agent_llm.last_cache_status in ("hit", "semantic_hit")
+            if agent_llm.last_cache_status:
+                self.current_metrics.add_llm_cache_lookup(
+                    hit=cache_hit,
+                    saved_tokens=agent_llm.last_saved_tokens,
+                    semantic=agent_llm.last_cache_status == "semantic_hit"
+                )
+            if agent_llm.last_coalesced:
+                self.current_metrics.add_llm_coalesced()
+            # Cache hits and coalesced calls cost no provider tokens (their usage is zero)
+            usage = agent_llm.last_result
+            self.current_metrics.add_token_usage(
+                usage.prompt_tokens,
+                usage.completion_tokens,
+                cached_tokens=usage.cached_tokens,
+                estimated=usage.usage_source == "estimate",
+                cache_write_tokens=usage.cache_write_tokens
+            )
             self.current_metrics.add_agent_execution(
                 agent_id=agent_id,
                 success=agent_success,
-                tokens_used=estimated_input_tokens + estimated_output_tokens
+                tokens_used=usage.total_tokens,
+                model=usage.model or None
             )
         
         result = {
@@ -328,8 +387,12 @@ class LangGraphOrchestrator:
         
         return result
     
-    async def build_graph_from_workflow(self, workflow_def: Dict[str, Any]) -> StateGraph:
-        """Build a LangGraph StateGraph from workflow definition."""
+    async def build_graph_from_workflow(self, workflow_def: Dict[str, Any], on_event: Optional[NodeEventHandler] = None,
+                                        scope_id: Optional[str] = None) -> StateGraph:
+        """Build a LangGraph StateGraph from workflow definition.
+        
+        ``scope_id`` (run or chat session) scopes the agents' conversation contexts.
+        """
         workflow_type = workflow_def.get("type", "sequence")
         nodes = workflow_def.get("nodes", [])
         
@@ -342,9 +405,11 @@ class LangGraphOrchestrator:
             agent_ref = node.get("agent_ref")
             task = node.get("task", "")
             node_tools = node.get("tools", [])  # Tools specific to this workflow node
+            step_kind = node.get("step_kind")  # Selects a model tier (see model_tiers)
             
             # Create node function for agent execution
-            async def node_fn(state: WorkflowState, agent_id=agent_ref, node_task=task, nid=node_id, tools_override=node_tools):
+            async def node_fn(state: WorkflowState, agent_id=agent_ref, node_task=task, nid=node_id, tools_override=node_tools,
+                              node_step_kind=step_kind):
                 # Track step execution
                 if self.current_metrics:
                     self.current_metrics.add_step()
@@ -366,7 +431,14 @@ class LangGraphOrchestrator:
                 else:
                     print(f"DEBUG: No tool override for node {nid}, using agent default tools: {agent.get('tools', [])}")
                 
-                result = await self.run_agent(agent, node_task, state)
+                if on_event:
+                    await on_event({"type": "node_started", "node_id": nid, "agent_id": agent_id})
+                
+                result = await self.run_agent(agent, node_task, state, node_id=nid, on_event=on_event,
+                                              step_kind=node_step_kind, scope_id=scope_id)
+                
+                if on_event:
+                    await on_event({"type": "node_completed", "node_id": nid, "agent_id": agent_id, "llm_response": result["llm_response"]})
                 
                 return {
                     "messages": [{"sender": nid, "agent": agent_id, "content": result, "type": "agent_result"}],
@@ -421,7 +493,8 @@ class LangGraphOrchestrator:
         
         return graph.compile()
     
-    async def run_workflow(self, workflow_def: Dict[str, Any], run_id: str = None, initial_state: Dict[str, Any] = None, format_output: bool = True) -> Dict[str, Any]:
+    async def run_workflow(self, workflow_def: Dict[str, Any], run_id: str = None, initial_state: Dict[str, Any] = None, format_output: bool = True,
+                           on_event: Optional[NodeEventHandler] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Execute workflow using LangGraph.
         
         Args:
@@ -429,8 +502,12 @@ class LangGraphOrchestrator:
             run_id: Optional run ID
             initial_state: Optional initial state for resuming chat sessions
             format_output: Whether to format the output (default: True)
+            on_event: Optional async callback receiving node events and streamed token deltas
+            session_id: Chat session whose agent contexts persist across runs; without
+                it the agents' contexts belong to this run and are released when it ends
         """
         run_id = run_id or str(uuid.uuid4())
+        scope_id = session_id or run_id
         workflow_id = workflow_def.get("id", "unknown")
         
         # Initialize metrics tracker
@@ -439,7 +516,7 @@ class LangGraphOrchestrator:
         
         try:
             # Build LangGraph
-            compiled_graph = await self.build_graph_from_workflow(workflow_def)
+            compiled_graph = await self.build_graph_from_workflow(workflow_def, on_event=on_event, scope_id=scope_id)
             
             # Use provided initial state or create new one
             if initial_state:
@@ -534,12 +611,17 @@ class LangGraphOrchestrator:
                 return formatted_result
             
             return raw_result
+        
+        finally:
+            if not session_id:
+                get_context_store().release(run_id)
 
 
 # Global orchestrator instance
 orchestrator = LangGraphOrchestrator()
 
 
-async def run_workflow(workflow_obj: Dict[str, Any], run_id: str = None, format_output: bool = True) -> Dict[str, Any]:
-    """Convenience function to run workflow with optional formatting."""
-    return await orchestrator.run_workflow(workflow_obj, run_id, initial_state=None, format_output=format_output)
+async def run_workflow(workflow_obj: Dict[str, Any], run_id: str = None, format_output: bool = True,
+                       on_event: Optional[NodeEventHandler] = None) -> Dict[str, Any]:
+    """Convenience function to run workflow with optional formatting and event streaming."""
+    return await orchestrator.run_workflow(workflow_obj, run_id, initial_state=None, format_output=format_output, on_event=on_event)
@@ -0,0 +1,337 @@
+"""
+Incremental Inverted Index for Agentic RAG
+Postings, document frequencies and chunk norms are maintained as workflow
+outputs are stored, so a query only walks the postings of its own terms.
+With NumPy/SciPy installed, chunks are scored as a sparse matrix instead.
+BM25Index ranks the same chunks with Okapi BM25 / BM25+.
+"""
+import os
+import math
+import heapq
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    sparse = None
+    NUMPY_AVAILABLE = False
+
+RAG_VECTORIZED = os.getenv("RAG_VECTORIZED", "true").lower() == "true"
+# Default ranking for research solutions: "tfidf" or "bm25" (overridable per
+# solution through communication_config["ranking"])
+RAG_RANKING = os.getenv("RAG_RANKING", "tfidf")
+RAG_BM25_K1 = float(os.getenv("RAG_BM25_K1", "1.2"))
+RAG_BM25_B = float(os.getenv("RAG_BM25_B", "0.75"))
+# BM25+ lower bound per matching term; 0 is plain Okapi BM25
+RAG_BM25_DELTA = float(os.getenv("RAG_BM25_DELTA", "0.0"))
+
+Hit = Tuple[int, float]
+
+
+class InvertedIndex:
+    """TF-IDF index over the chunks of one solution's workflow outputs.
+
+    Weights match ``AgenticRAGService._compute_tfidf``: tf = count / chunk
+    length and idf = log(N / (df + 1)) + 1, here over the indexed chunks
+    only. Because idf depends on N, chunk norms are refreshed on every
+    ``add`` (write time), never at query time.
+    """
+
+    def __init__(self, tokenize: Callable[[str], List[str]]):
+        self._tokenize = tokenize
+        self.chunks: List[Dict[str, Any]] = []
+        # term -> [(chunk_id, count)], appended in chunk order
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.df: Counter = Counter()
+        self.lengths: List[int] = []
+        self._terms: List[Counter] = []
+        self.norms: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def idf(self, term: str) -> float:
+        return math.log(len(self.chunks) / (self.df.get(term, 0) + 1)) + 1
+
+    def add(self, chunks: List[str], source: Dict[str, Any]):
+        """Index the chunks of one workflow output"""
+        for text in chunks:
+            chunk_id = len(self.chunks)
+            terms = Counter(self._tokenize(text))
+            self.chunks.append({"text": text, **source})
+            self._terms.append(terms)
+            self.lengths.append(sum(terms.values()))
+            for term, count in terms.items():
+                self.postings.setdefault(term, []).append((chunk_id, count))
+                self.df[term] += 1
+        self._refresh_norms()
+
+    def _refresh_norms(self):
+        idf = {term: self.idf(term) for term in self.df}
+        self.norms = [
+            math.sqrt(sum((count / length * idf[term]) ** 2 for term, count in terms.items())) if length else 0.0
+            for terms, length in zip(self._terms, self.lengths)
+        ]
+
+    def search(self, query: str, top_k: int = 3, min_score: Optional[float] = None) -> List[Hit]:
+        """``(chunk_id, cosine similarity)`` of the best chunks, best first"""
+        terms = Counter(self._tokenize(query))
+        total = sum(terms.values())
+        if not total or not self.chunks:
+            return []
+
+        query_weights = {term: count / total * self.idf(term) for term, count in terms.items()}
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+        if query_norm == 0:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term, query_weight in query_weights.items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            weight = query_weight * self.idf(term)
+            for chunk_id, count in postings:
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + count / self.lengths[chunk_id] * weight
+
+        results = [
+            (chunk_id, score / (self.norms[chunk_id] * query_norm))
+            for chunk_id, score in scores.items() if self.norms[chunk_id] > 0
+        ]
+        if min_score is not None:
+            results = [r for r in results if r[1] > min_score]
+        return heapq.nlargest(top_k, results, key=lambda r: (r[1], -r[0]))
+
+    def search_many(self, queries: List[str], top_k: int = 3, min_score: Optional[float] = None) -> List[List[Hit]]:
+        return [self.search(query, top_k, min_score) for query in queries]
+
+
+class VectorIndex:
+    """The same TF-IDF cosine ranking as ``InvertedIndex``, vectorized.
+
+    Terms map to column ids; raw term frequencies are kept as COO triplets and
+    turned into a CSR matrix of L2-normalized TF-IDF chunk vectors on the
+    first search after a write. A query is one sparse matrix-vector product and top-k uses
+    ``argpartition``; ``search_many`` scores a batch as one matrix product.
+    """
+
+    def __init__(self, tokenize: Callable[[str], List[str]]):
+        self._tokenize = tokenize
+        self.chunks: List[Dict[str, Any]] = []
+        self.vocabulary: Dict[str, int] = {}
+        self._rows: List[int] = []
+        self._cols: List[int] = []
+        self._tf: List[float] = []
+        self._df: List[int] = []
+        self._idf = None
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, chunks: List[str], source: Dict[str, Any]):
+        """Index the chunks of one workflow output"""
+        for text in chunks:
+            chunk_id = len(self.chunks)
+            terms = Counter(self._tokenize(text))
+            length = sum(terms.values())
+            self.chunks.append({"text": text, **source})
+            for term, count in terms.items():
+                column = self.vocabulary.get(term)
+                if column is None:
+                    column = self.vocabulary[term] = len(self._df)
+                    self._df.append(0)
+                self._df[column] += 1
+                self._rows.append(chunk_id)
+                self._cols.append(column)
+                self._tf.append(count / length)
+        self._matrix = None
+
+    def _build(self):
+        n = len(self.chunks)
+        self._idf = np.log(n / (np.asarray(self._df, dtype=np.float64) + 1)) + 1
+        cols = np.asarray(self._cols, dtype=np.int64)
+        weights = np.asarray(self._tf, dtype=np.float64) * self._idf[cols]
+        matrix = sparse.csr_matrix((weights, (self._rows, cols)), shape=(n, len(self._df)))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        # Term-major (vocabulary x chunks) so a product only reads the query's rows
+        self._matrix = sparse.csr_matrix((sparse.diags(1 / norms) @ matrix).T)
+
+    def _query_matrix(self, queries: List[str]):
+        """CSR of L2-normalized query vectors; unseen terms count toward the norm"""
+        unseen_idf = math.log(len(self.chunks)) + 1
+        rows, cols, data = [], [], []
+        for row, query in enumerate(queries):
+            terms = Counter(self._tokenize(query))
+            total = sum(terms.values())
+            weights, norm = [], 0.0
+            for term, count in terms.items():
+                column = self.vocabulary.get(term)
+                weight = count / total * (self._idf[column] if column is not None else unseen_idf)
+                norm += weight * weight
+                if column is not None:
+                    weights.append((column, weight))
+            for column, weight in weights:
+                rows.append(row)
+                cols.append(column)
+                data.append(weight / math.sqrt(norm))
+        return sparse.csr_matrix((data, (rows, cols)), shape=(len(queries), len(self._df)))
+
+    @staticmethod
+    def _top_k(scores, top_k: int, min_score: Optional[float]) -> List[Hit]:
+        threshold = 0.0 if min_score is None else max(min_score, 0.0)
+        candidates = np.flatnonzero(scores > threshold)
+        if len(candidates) > top_k:
+            kth = scores[candidates[np.argpartition(-scores[candidates], top_k - 1)[top_k - 1]]]
+            # Keep every chunk tied with the k-th so ties resolve to the lowest ids
+            candidates = candidates[scores[candidates] >= kth]
+        order = np.lexsort((candidates, -scores[candidates]))[:top_k]
+        return [(int(i), float(scores[i])) for i in candidates[order]]
+
+    def search(self, query: str, top_k: int = 3, min_score: Optional[float] = None) -> List[Hit]:
+        """``(chunk_id, cosine similarity)`` of the best chunks, best first"""
+        return self.search_many([query], top_k, min_score)[0]
+
+    def search_many(self, queries: List[str], top_k: int = 3, min_score: Optional[float] = None) -> List[List[Hit]]:
+        """``search`` for each query, scored together"""
+        if not self.chunks or not self._df or top_k <= 0:
+            return [[] for _ in queries]
+        if self._matrix is None:
+            self._build()
+        scores = (self._query_matrix(queries) @ self._matrix).toarray()
+        return [self._top_k(row, top_k, min_score) for row in scores]
+
+
+class BM25Index:
+    """Okapi BM25 (BM25+ when ``delta`` > 0) over the chunks of one solution.
+
+    Postings are kept in chunk order with each term's largest frequency and
+    shortest chunk, which bound its score for any chunk. ``search`` uses
+    MaxScore: terms whose bounds together cannot beat the current k-th score
+    only rescore candidates found through the other terms, and a candidate is
+    dropped as soon as its remaining bounds cannot reach the k-th score.
+    """
+
+    def __init__(self, tokenize: Callable[[str], List[str]], k1: Optional[float] = None,
+                 b: Optional[float] = None, delta: Optional[float] = None):
+        self._tokenize = tokenize
+        self.k1 = RAG_BM25_K1 if k1 is None else k1
+        self.b = RAG_BM25_B if b is None else b
+        self.delta = RAG_BM25_DELTA if delta is None else delta
+        self.chunks: List[Dict[str, Any]] = []
+        self.lengths: List[int] = []
+        self.total_length = 0
+        # term -> ([chunk_id], [count]), ids ascending
+        self.postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        # term -> (largest count, shortest chunk containing it)
+        self._bounds: Dict[str, Tuple[int, int]] = {}
+        # Chunks scored by the last search, for benchmarks and tests
+        self.last_scored = 0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, chunks: List[str], source: Dict[str, Any]):
+        """Index the chunks of one workflow output"""
+        for text in chunks:
+            chunk_id = len(self.chunks)
+            terms = Counter(self._tokenize(text))
+            length = sum(terms.values())
+            self.chunks.append({"text": text, **source})
+            self.lengths.append(length)
+            self.total_length += length
+            for term, count in terms.items():
+                ids, counts = self.postings.setdefault(term, ([], []))
+                ids.append(chunk_id)
+                counts.append(count)
+                max_count, min_length = self._bounds.get(term, (0, length))
+                self._bounds[term] = (max(max_count, count), min(min_length, length))
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings[term][0])
+        return math.log(1 + (len(self.chunks) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 3, min_score: Optional[float] = None,
+               k1: Optional[float] = None, b: Optional[float] = None,
+               delta: Optional[float] = None) -> List[Hit]:
+        """``(chunk_id, BM25 score)`` of the best chunks, best first"""
+        k1 = self.k1 if k1 is None else k1
+        b = self.b if b is None else b
+        delta = self.delta if delta is None else delta
+        self.last_scored = 0
+        query_terms = Counter(t for t in self._tokenize(query) if t in self.postings)
+        if not query_terms or top_k <= 0 or not self.total_length:
+            return []
+
+        average_length = self.total_length / len(self.chunks)
+        lengths = self.lengths
+
+        def term_score(weight: float, count: int, length: int) -> float:
+            norm = k1 * (1 - b + b * length / average_length)
+            return weight * (count * (k1 + 1) / (count + norm) + delta)
+
+        # (bound, weight, ids, counts) with the smallest bounds first
+        terms = []
+        for term, query_count in query_terms.items():
+            weight = query_count * self.idf(term)
+            max_count, min_length = self._bounds[term]
+            bound = term_score(weight, max_count, min_length) * (1 + 1e-9)
+            terms.append((bound, weight, *self.postings[term]))
+        terms.sort(key=lambda t: t[0])
+        prefix = list(accumulate(t[0] for t in terms))
+
+        heap: List[Tuple[float, int]] = []
+        threshold = 0.0 if min_score is None else min_score
+        cursors = [0] * len(terms)
+        # terms[:first_essential] cannot reach the threshold on their own
+        first_essential = 0
+        while True:
+            while first_essential < len(terms) and prefix[first_essential] <= threshold:
+                first_essential += 1
+            candidate = min(
+                (terms[i][2][cursors[i]] for i in range(first_essential, len(terms)) if cursors[i] < len(terms[i][2])),
+                default=None
+            )
+            if candidate is None:
+                break
+
+            self.last_scored += 1
+            length = lengths[candidate]
+            score = 0.0
+            for i in range(first_essential, len(terms)):
+                _, weight, ids, counts = terms[i]
+                if cursors[i] < len(ids) and ids[cursors[i]] == candidate:
+                    score += term_score(weight, counts[cursors[i]], length)
+                    cursors[i] += 1
+            for i in range(first_essential - 1, -1, -1):
+                if score + prefix[i] <= threshold:
+                    break
+                _, weight, ids, counts = terms[i]
+                cursors[i] = bisect_left(ids, candidate, cursors[i])
+                if cursors[i] < len(ids) and ids[cursors[i]] == candidate:
+                    score += term_score(weight, counts[cursors[i]], length)
+            else:
+                # Candidates come in id order, so a tie never displaces an earlier chunk
+                if score > threshold:
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, (score, -candidate))
+                    else:
+                        heapq.heapreplace(heap, (score, -candidate))
+                    if len(heap) == top_k:
+                        threshold = max(threshold, heap[0][0])
+
+        return [(-neg_id, score) for score, neg_id in sorted(heap, reverse=True)]
+
+
+def create_index(tokenize: Callable[[str], List[str]]):
+    """A vectorized index when NumPy/SciPy are installed, else the inverted index"""
+    if NUMPY_AVAILABLE and RAG_VECTORIZED:
+        return VectorIndex(tokenize)
+    return InvertedIndex(tokenize)
@@ -0,0 +1,205 @@
+"""
+Provider Rate-Limit Governor
+Token buckets for requests-per-minute and tokens-per-minute budgets per provider/model,
+kept in sync with the provider's rate-limit and retry-after response headers
+"""
+import os
+import re
+import time
+import random
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Any, Mapping, Optional, Tuple
+
+# Default budgets per provider (override with <PROVIDER>_RPM_LIMIT / <PROVIDER>_TPM_LIMIT)
+DEFAULT_LIMITS = {
+    "groq": (30, 6000),
+    "anthropic": (50, 40000),
+}
+FALLBACK_LIMITS = (60, 100000)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "20"))
+# Status codes that mean "slow down and retry" (429 rate limited, 529 Anthropic overloaded)
+RETRYABLE_STATUS_CODES = {429, 529}
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse a reset/retry duration into seconds.
+
+    Accepts plain seconds ("12", "0.5"), Groq/OpenAI style durations
+    ("2m59.56s", "7.66s", "120ms") and RFC 3339 timestamps (Anthropic resets).
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if reset_at.tzinfo is None:
+            reset_at = reset_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Continuously refilling token bucket"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated = now
+
+    def wait_time(self, amount: float, now: Optional[float] = None) -> float:
+        """Seconds until ``amount`` tokens are available"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < amount:
+            wait = max(wait, (amount - self.tokens) / self.refill_per_second)
+        return wait
+
+    def consume(self, amount: float):
+        self._refill(time.monotonic())
+        self.tokens -= min(amount, self.capacity)
+
+    def sync(self, remaining: Optional[float], reset_seconds: Optional[float]):
+        """Align with the provider's view: never hold more than it reports remaining"""
+        now = time.monotonic()
+        self._refill(now)
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0 and reset_seconds:
+                self.blocked_until = max(self.blocked_until, now + reset_seconds)
+
+
+def _header(headers: Mapping[str, str], *names: str) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitGovernor:
+    """Keeps calls to one provider/model under its request and token budgets"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.retry_after_until = 0.0
+        self.total_requests = 0
+        self.total_wait_seconds = 0.0
+        self.throttled_responses = 0
+
+    def wait_time(self, estimated_tokens: int) -> float:
+        now = time.monotonic()
+        return max(
+            self.retry_after_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+            0.0
+        )
+
+    async def acquire(self, estimated_tokens: int) -> float:
+        """Wait until a request of ``estimated_tokens`` fits the budgets, then reserve it"""
+        waited = 0.0
+        while True:
+            wait = self.wait_time(estimated_tokens)
+            if wait <= 0:
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+                self.total_requests += 1
+                self.total_wait_seconds += waited
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def record_usage(self, actual_tokens: int, estimated_tokens: int):
+        """Correct the token bucket once the provider reports real usage"""
+        self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens + estimated_tokens - actual_tokens)
+
+    def refund(self, estimated_tokens: int):
+        """Return a reservation for a request that spent no tokens (rejected or never sent)"""
+        self.record_usage(0, estimated_tokens)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Sync the buckets with Groq/OpenAI or Anthropic rate-limit headers"""
+        self.requests.sync(
+            _number(_header(headers, "x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining")),
+            parse_duration(_header(headers, "x-ratelimit-reset-requests", "anthropic-ratelimit-requests-reset"))
+        )
+        self.tokens.sync(
+            _number(_header(headers, "x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining")),
+            parse_duration(_header(headers, "x-ratelimit-reset-tokens", "anthropic-ratelimit-tokens-reset"))
+        )
+        retry_after = parse_duration(_header(headers, "retry-after"))
+        if retry_after:
+            self.retry_after_until = max(self.retry_after_until, time.monotonic() + retry_after)
+
+    def throttled(self, headers: Mapping[str, str]):
+        """Record a 429/529 response; pauses everyone until the provider's retry-after"""
+        self.throttled_responses += 1
+        self.update_from_headers(headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "available_requests": round(self.requests.tokens, 2),
+            "available_tokens": round(self.tokens.tokens, 2),
+            "total_requests": self.total_requests,
+            "total_wait_seconds": round(self.total_wait_seconds, 3),
+            "throttled_responses": self.throttled_responses
+        }
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry ``attempt`` (0-based)"""
+    return random.uniform(0, min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+# Governors per (provider, model)
+_governors: Dict[Tuple[str, str], RateLimitGovernor] = {}
+
+
+def get_governor(provider: str, model: str) -> RateLimitGovernor:
+    """Get or create the governor for a provider/model"""
+    key = (provider, model)
+    governor = _governors.get(key)
+    if governor is None:
+        rpm, tpm = DEFAULT_LIMITS.get(provider, FALLBACK_LIMITS)
+        prefix = provider.upper()
+        rpm = float(os.getenv(f"{prefix}_RPM_LIMIT", rpm))
+        tpm = float(os.getenv(f"{prefix}_TPM_LIMIT", tpm))
+        governor = _governors[key] = RateLimitGovernor(rpm, tpm)
+    return governor
@@ -0,0 +1,140 @@
+"""
+Semantic Near-Duplicate Prompt Cache
+Serves cached LLM responses for paraphrased prompts using the TF-IDF machinery
+of AgenticRAGService (no embedding service required)
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.services.agentic_rag_service import get_agentic_rag_service
+
+LLM_SEMANTIC_CACHE_ENABLED = os.getenv("LLM_SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+LLM_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.9"))
+LLM_SEMANTIC_CACHE_MIN_CHARS = int(os.getenv("LLM_SEMANTIC_CACHE_MIN_CHARS", "20"))
+LLM_SEMANTIC_CACHE_MAX_CHARS = int(os.getenv("LLM_SEMANTIC_CACHE_MAX_CHARS", "4000"))
+LLM_SEMANTIC_CACHE_SCOPE_ENTRIES = int(os.getenv("LLM_SEMANTIC_CACHE_SCOPE_ENTRIES", "256"))
+LLM_SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("LLM_SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+
+def make_scope_key(template_id: str, provider: str, model: str, context: List[Dict[str, str]]) -> str:
+    """Scope prompts by template identity, model and the exact preceding conversation.
+
+    Only prompts in the same scope are compared, so a paraphrase can never be
+    answered with a response generated for another agent, model or history.
+    """
+    history = "\n".join(f"{m.get('role', '')}:{' '.join(str(m.get('content', '')).split())}" for m in context)
+    raw = f"{template_id}\x00{provider}\x00{model}\x00{history}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SemanticLLMCache:
+    """Near-duplicate prompt cache scored with TF-IDF cosine similarity"""
+
+    def __init__(self,
+                 threshold: float = LLM_SEMANTIC_CACHE_THRESHOLD,
+                 min_prompt_chars: int = LLM_SEMANTIC_CACHE_MIN_CHARS,
+                 max_prompt_chars: int = LLM_SEMANTIC_CACHE_MAX_CHARS,
+                 max_entries_per_scope: int = LLM_SEMANTIC_CACHE_SCOPE_ENTRIES,
+                 ttl_seconds: float = LLM_SEMANTIC_CACHE_TTL_SECONDS,
+                 enabled: bool = True):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.min_prompt_chars = min_prompt_chars
+        self.max_prompt_chars = max_prompt_chars
+        self.max_entries_per_scope = max_entries_per_scope
+        self.ttl_seconds = ttl_seconds
+        self._rag = get_agentic_rag_service()
+        # scope -> prompt -> (response, tokens, expires_at)
+        self._scopes: Dict[str, "OrderedDict[str, Tuple[str, int, float]]"] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.saved_tokens = 0
+
+    def accepts(self, prompt: str) -> bool:
+        """Guard rail: very short prompts are too ambiguous, very long ones too specific"""
+        return self.min_prompt_chars <= len(prompt) <= self.max_prompt_chars
+
+    def get(self, scope: str, prompt: str) -> Optional[Tuple[str, int, float]]:
+        """Return ``(response, tokens, similarity)`` for the closest prompt above the threshold"""
+        if not self.accepts(prompt):
+            self.skipped += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries:
+                for cached_prompt in [p for p, e in entries.items() if e[2] <= now]:
+                    del entries[cached_prompt]
+            candidates = list(entries.items()) if entries else []
+
+        best = None
+        if candidates:
+            documents = [p for p, _ in candidates] + [prompt]
+            vectors, _ = self._rag._compute_tfidf(documents)
+            query_vector = vectors[-1]
+            if query_vector:
+                for i, (cached_prompt, entry) in enumerate(candidates):
+                    similarity = self._rag._cosine_similarity(query_vector, vectors[i])
+                    if similarity >= self.threshold and (best is None or similarity > best[2]):
+                        best = (entry[0], entry[1], similarity, cached_prompt)
+
+        with self._lock:
+            if best is None:
+                self.misses += 1
+                return None
+            entries = self._scopes.get(scope)
+            if entries is not None and best[3] in entries:
+                entries.move_to_end(best[3])
+            self.hits += 1
+            self.saved_tokens += best[1]
+        return best[0], best[1], best[2]
+
+    def set(self, scope: str, prompt: str, response: str, tokens: int = 0):
+        """Remember a response for future near-duplicate prompts in the same scope"""
+        if not self.accepts(prompt):
+            return
+        with self._lock:
+            entries = self._scopes.setdefault(scope, OrderedDict())
+            entries[prompt] = (response, tokens, time.time() + self.ttl_seconds)
+            entries.move_to_end(prompt)
+            while len(entries) > self.max_entries_per_scope:
+                entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached prompts"""
+        with self._lock:
+            self._scopes.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "scopes": len(self._scopes),
+            "entries": sum(len(e) for e in self._scopes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_ratio": self.hits / lookups if lookups > 0 else 0,
+            "saved_tokens": self.saved_tokens
+        }
+
+
+# Global cache instance
+_semantic_cache = None
+
+
+def get_semantic_cache() -> SemanticLLMCache:
+    """Get or create the global semantic LLM cache"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticLLMCache(enabled=LLM_SEMANTIC_CACHE_ENABLED)
+    return _semantic_cache
@@ -0,0 +1,109 @@
+"""
+Single-Flight Request Coalescing
+Concurrent callers with the same request key share one in-flight execution
+"""
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+def make_request_key(*parts: Any) -> str:
+    """Hash arbitrary JSON-serializable request parts into a single-flight key"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """An in-flight execution and the number of callers awaiting it"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+        self.abandoned = False
+
+
+class SingleFlight:
+    """Collapses identical concurrent requests into one execution.
+
+    The first caller for a key starts the work as a task; later callers with
+    the same key await that task instead of starting their own. Results and
+    exceptions are delivered to every waiter. A cancelled waiter only stops
+    waiting - the shared work is cancelled once no caller is left.
+    """
+
+    def __init__(self, name: str = "", enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._inflight: Dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` for ``key`` or join the execution already in flight"""
+        if not self.enabled:
+            return await fn()
+
+        call = self._inflight.get(key)
+        if call is None or call.task.done() or call.abandoned:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._inflight[key] = call
+            self.executed += 1
+            call.task.add_done_callback(lambda task, k=key, c=call: self._finish(k, c))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up - stop the shared work
+                call.abandoned = True
+                call.task.cancel()
+
+    def _finish(self, key: str, call: _Call):
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if call.task.cancelled():
+            self.cancelled += 1
+        elif call.task.exception() is not None:
+            self.errors += 1
+
+    def in_flight(self) -> int:
+        """Number of distinct requests currently executing"""
+        return len(self._inflight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        total = self.executed + self.coalesced
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / total if total > 0 else 0,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "in_flight": self.in_flight()
+        }
+
+
+# Named single-flight groups (e.g. "llm", "tools")
+_groups: Dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Get or create the named single-flight group"""
+    group: Optional[SingleFlight] = _groups.get(name)
+    if group is None:
+        group = _groups[name] = SingleFlight(name, enabled=SINGLE_FLIGHT_ENABLED)
+    return group
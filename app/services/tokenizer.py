@@ -0,0 +1,55 @@
+"""
+Local Token Counting
+Counts tokens with tiktoken when installed, otherwise with a BPE-like approximation.
+Used where a provider does not report usage (mock providers, failed streams).
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Chat formats add a few tokens per message for role and separators
+TOKENS_PER_MESSAGE = 4
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in ``text``"""
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_encoding().encode(text, disallowed_special=()))
+    # Approximation: each punctuation mark is a token and words split into
+    # ~4-character sub-word pieces, which tracks cl100k on English text
+    return sum((len(piece) + 3) // 4 for piece in _PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of ``text`` within ``max_tokens`` tokens"""
+    if max_tokens <= 0 or not text:
+        return ""
+    if TIKTOKEN_AVAILABLE:
+        tokens = _encoding().encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding().decode(tokens[:max_tokens])
+    used = 0
+    for match in _PIECES.finditer(text):
+        used += (len(match.group()) + 3) // 4
+        if used > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Count the prompt tokens of a chat message list"""
+    return sum(count_tokens(str(m.get("content", ""))) + TOKENS_PER_MESSAGE for m in messages)
@@ -12,6 +12,11 @@ from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
 from enum import Enum
 
+from app.services.single_flight import get_single_flight, make_request_key
+
+# Send web searches to a DDGS-compatible /search endpoint (e.g. the mock server) instead of DuckDuckGo
+WEBSEARCH_BASE_URL = os.getenv("WEBSEARCH_BASE_URL", "").rstrip("/")
+
 
 class ToolType(Enum):
     """All supported tool types"""
@@ -88,7 +93,25 @@ class ToolOrchestrator:
         inputs: Dict[str, Any],
         context: Optional[Dict] = None
     ) -> ToolResult:
-        """Execute a single tool with proper error handling"""
+        """Execute a single tool with proper error handling.
+        
+        Identical concurrent calls to idempotent tools (web search, GET APIs)
+        are coalesced into one execution.
+        """
+        if self._is_idempotent(tool_def):
+            key = make_request_key(tool_def.get("id"), tool_def.get("type"), tool_def.get("config", {}), inputs)
+            return await get_single_flight("tools").do(
+                key, lambda: self._execute_tool(tool_def, inputs, context)
+            )
+        return await self._execute_tool(tool_def, inputs, context)
+    
+    async def _execute_tool(
+        self,
+        tool_def: Dict[str, Any],
+        inputs: Dict[str, Any],
+        context: Optional[Dict] = None
+    ) -> ToolResult:
+        """Execute a single tool and log it to the execution history"""
         start_time = datetime.now()
         
         try:
@@ -274,8 +297,6 @@ class ToolOrchestrator:
         context: Dict
     ) -> Any:
         """Handle web search tools with DuckDuckGo"""
-        from ddgs import DDGS
-        
         config = tool_def.get("config", {})
         query = inputs.get("query") or inputs.get("q") or inputs.get("prompt") or inputs.get("task") or ""
         
@@ -284,14 +305,24 @@ class ToolOrchestrator:
         safesearch = config.get("safesearch", "moderate")
         timelimit = config.get("timelimit")
         
-        with DDGS() as ddgs:
-            results = list(ddgs.text(
-                query=query,
-                region=region,
-                safesearch=safesearch,
-                timelimit=timelimit,
-                max_results=max_results
-            ))
+        if WEBSEARCH_BASE_URL:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.get(
+                    f"{WEBSEARCH_BASE_URL}/search",
+                    params={"q": query, "max_results": max_results}
+                )
+                response.raise_for_status()
+                results = response.json().get("results", [])
+        else:
+            from ddgs import DDGS
+            with DDGS() as ddgs:
+                results = list(ddgs.text(
+                    query=query,
+                    region=region,
+                    safesearch=safesearch,
+                    timelimit=timelimit,
+                    max_results=max_results
+                ))
         
         return {
             "query": query,
@@ -561,6 +592,17 @@ class ToolOrchestrator:
         else:
             return True
     
+    def _is_idempotent(self, tool_def: Dict[str, Any]) -> bool:
+        """Whether concurrent identical calls may share one execution"""
+        tool_type = tool_def.get("type")
+        if tool_type == ToolType.WEBSEARCH.value:
+            return True
+        if tool_type in (ToolType.API.value, ToolType.HTTP.value):
+            config = tool_def.get("config", {})
+            method = (config.get("api") or config).get("method", "GET")
+            return method.upper() == "GET"
+        return False
+    
     def get_execution_stats(self) -> Dict[str, Any]:
         """Get execution statistics"""
         total_executions = len(self.execution_history)
@@ -571,7 +613,8 @@ class ToolOrchestrator:
             "total_executions": total_executions,
             "successful": successful,
             "failed": failed,
-            "success_rate": successful / total_executions if total_executions > 0 else 0
+            "success_rate": successful / total_executions if total_executions > 0 else 0,
+            "coalesced": get_single_flight("tools").coalesced
         }
 
 
@@ -0,0 +1,96 @@
+"""
+Microbenchmark: ConversationMemory lookups with many live solutions
+
+Compares the indexed store against the previous flat "solution:workflow" dict,
+which scanned every key and re-sorted by timestamp on each solution lookup.
+
+    python benchmarks/bench_conversation_memory.py --solutions 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.kag_service import ConversationMemory
+
+
+class FlatConversationMemory:
+    """The previous implementation, kept here as the baseline"""
+
+    def __init__(self):
+        self.memories: Dict[str, List[Dict[str, Any]]] = {}
+
+    def add_memory(self, solution_id: str, workflow_id: str, memory: Dict[str, Any]):
+        key = f"{solution_id}:{workflow_id}"
+        if key not in self.memories:
+            self.memories[key] = []
+        self.memories[key].append({**memory, "timestamp": datetime.now().isoformat()})
+
+    def get_memories(self, solution_id: str, workflow_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        if workflow_id:
+            return self.memories.get(f"{solution_id}:{workflow_id}", [])
+        all_memories = []
+        for key, memories in self.memories.items():
+            if key.startswith(f"{solution_id}:"):
+                all_memories.extend(memories)
+        return sorted(all_memories, key=lambda x: x.get("timestamp", ""))
+
+    def clear_solution(self, solution_id: str):
+        for key in [key for key in self.memories.keys() if key.startswith(f"{solution_id}:")]:
+            del self.memories[key]
+
+
+def populate(memory, solutions: int, workflows: int, entries: int):
+    for s in range(solutions):
+        for w in range(workflows):
+            for e in range(entries):
+                memory.add_memory(f"sol{s}", f"wf{w}", {"workflow_name": f"wf{w}", "summary": f"run {e}", "facts": []})
+
+
+def timed(fn, iterations: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(solutions: int, workflows: int, entries: int, lookups: int):
+    rng = random.Random(0)
+    targets = [(f"sol{rng.randrange(solutions)}", f"wf{rng.randrange(workflows)}") for _ in range(lookups)]
+
+    print(f"📊 {solutions} solutions x {workflows} workflows x {entries} memories, {lookups} lookups\n")
+    print(f"{'operation':<28}{'flat (us)':>14}{'indexed (us)':>16}{'speedup':>10}")
+
+    results = {}
+    for name, memory in (("flat", FlatConversationMemory()), ("indexed", ConversationMemory())):
+        start = time.perf_counter()
+        populate(memory, solutions, workflows, entries)
+        results.setdefault("populate (total ms)", {})[name] = (time.perf_counter() - start) * 1e3
+
+        it = iter(targets)
+        latest = getattr(memory, "get_latest", None) or (lambda s, w: memory.get_memories(s, w)[-1])
+        results.setdefault("latest workflow memory", {})[name] = timed(lambda: latest(*next(it)), lookups)
+        it = iter(targets)
+        results.setdefault("solution memories", {})[name] = timed(lambda: memory.get_memories(next(it)[0]), lookups)
+        it = iter(targets)
+        results.setdefault("clear solution", {})[name] = timed(lambda: memory.clear_solution(next(it)[0]), lookups)
+
+    for operation, timings in results.items():
+        speedup = timings["flat"] / timings["indexed"] if timings["indexed"] else float("inf")
+        print(f"{operation:<28}{timings['flat']:>14.1f}{timings['indexed']:>16.1f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--solutions", type=int, default=10000)
+    parser.add_argument("--workflows", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=2)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    run(args.solutions, args.workflows, args.entries, args.lookups)
@@ -0,0 +1,122 @@
+"""
+Microbenchmark: AgenticRAGService retrieval latency as a solution's memory grows
+
+Compares the previous per-query path, which recomputed TF-IDF vectors for every
+stored chunk plus the query, against the incremental inverted index and the
+NumPy/SciPy sparse-matrix index (one query at a time and as one batch), and
+BM25 with MaxScore early termination against scoring every matching chunk.
+
+    python benchmarks/bench_rag_index.py --sizes 100 400 1600 6400
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.agentic_rag_service import AgenticRAGService
+from app.services.rag_index import BM25Index, InvertedIndex, NUMPY_AVAILABLE, VectorIndex
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_chunks(count: int, vocabulary: List[str], rng: random.Random) -> List[str]:
+    # Zipf-like term distribution, roughly one chunk's worth of words each
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return [" ".join(rng.choices(vocabulary, weights, k=120)) for _ in range(count)]
+
+
+def legacy_search(rag: AgenticRAGService, chunks: List[str], query: str, top_k: int = 3):
+    """The previous initialize_agent_memory retrieval, kept here as the baseline"""
+    vectors, _ = rag._compute_tfidf(chunks + [query])
+    query_vector = vectors[-1]
+    similarities = [(i, rag._cosine_similarity(query_vector, vectors[i])) for i in range(len(chunks))]
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    return similarities[:top_k]
+
+
+def exhaustive_bm25(index: BM25Index, query: str, top_k: int = 3):
+    """BM25 over every posting of the query terms, no early termination"""
+    terms = Counter(t for t in index._tokenize(query) if t in index.postings)
+    average_length = index.total_length / len(index)
+    scores = Counter()
+    for term, query_count in terms.items():
+        weight = query_count * index.idf(term)
+        for chunk_id, count in zip(*index.postings[term]):
+            norm = index.k1 * (1 - index.b + index.b * index.lengths[chunk_id] / average_length)
+            scores[chunk_id] += weight * (count * (index.k1 + 1) / (count + norm) + index.delta)
+    return scores.most_common(top_k)
+
+
+def timed(fn, iterations: int) -> float:
+    """Mean milliseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e3
+
+
+def run(sizes: List[int], queries: int):
+    rng = random.Random(0)
+    rag = AgenticRAGService()
+    vocabulary = make_vocabulary(5000, rng)
+    chunks = make_chunks(max(sizes), vocabulary, rng)
+    query_texts = [" ".join(rng.sample(vocabulary[:500], 8)) for _ in range(queries)]
+
+    print(f"📊 {queries} queries per corpus size, 120 words per chunk\n")
+    print(f"{'chunks':>8}{'legacy (ms)':>14}{'inverted (ms)':>16}{'vector (ms)':>14}{'batch (ms)':>13}")
+
+    for size in sizes:
+        corpus = chunks[:size]
+        source = {"workflow_id": "wf", "workflow_name": "bench"}
+        inverted = InvertedIndex(rag._tokenize)
+        inverted.add(corpus, source)
+
+        it = iter(query_texts)
+        legacy = timed(lambda: legacy_search(rag, corpus, next(it)), queries)
+        it = iter(query_texts)
+        indexed = timed(lambda: inverted.search(next(it)), queries)
+
+        vector = batch = float("nan")
+        if NUMPY_AVAILABLE:
+            vectorized = VectorIndex(rag._tokenize)
+            vectorized.add(corpus, source)
+            vectorized.search(query_texts[0])  # build the matrix outside the timing
+            it = iter(query_texts)
+            vector = timed(lambda: vectorized.search(next(it)), queries)
+            # Per query, with all queries scored as one matrix product
+            batch = timed(lambda: vectorized.search_many(query_texts), 1) / queries
+        print(f"{size:>8}{legacy:>14.2f}{indexed:>16.3f}{vector:>14.3f}{batch:>13.3f}")
+
+    # Short queries mixing rare and common terms, as built from workflow descriptions
+    bm25_queries = [" ".join(rng.sample(vocabulary[:20], 2) + rng.sample(vocabulary[1000:], 2)) for _ in range(queries)]
+    print(f"\n{'chunks':>8}{'bm25 all (ms)':>16}{'maxscore (ms)':>16}{'scored':>10}")
+    for size in sizes:
+        index = BM25Index(rag._tokenize)
+        index.add(chunks[:size], {"workflow_id": "wf", "workflow_name": "bench"})
+        it = iter(bm25_queries)
+        exhaustive = timed(lambda: exhaustive_bm25(index, next(it)), queries)
+        scored = []
+
+        def maxscore(query):
+            index.search(query)
+            scored.append(index.last_scored)
+
+        it = iter(bm25_queries)
+        early = timed(lambda: maxscore(next(it)), queries)
+        print(f"{size:>8}{exhaustive:>16.3f}{early:>16.3f}{sum(scored) / len(scored):>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 400, 1600, 6400])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.queries)
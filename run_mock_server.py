@@ -0,0 +1,14 @@
+import uvicorn
+import sys
+import os
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "app.mock_server:app",
+        host="0.0.0.0",
+        port=int(os.getenv("MOCK_SERVER_PORT", "8100")),
+        reload=False
+    )
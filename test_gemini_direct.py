@@ -2,6 +2,7 @@
 Test Gemini Client with Direct API Calls (No LangChain)
 """
 import sys
+import asyncio
 import os
 sys.path.insert(0, os.path.abspath('.'))
 
@@ -12,7 +13,7 @@ def test_generate():
     print("\n=== Testing generate() ===")
     client = get_gemini_client()
     
-    result = client.generate("What is 2+2? Give a brief answer.")
+    result = asyncio.run(client.generate("What is 2+2? Give a brief answer."))
     print(f"Response: {result.get('text', 'No text')}")
     print(f"Success: {'text' in result}")
     
@@ -30,10 +31,10 @@ def test_extract_facts():
     - Mobile app generates 60% of orders
     """
     
-    result = client.extract_facts(
+    result = asyncio.run(client.extract_facts(
         workflow_output,
         context="Data Analysis workflow - Analyze customer purchase patterns"
-    )
+    ))
     
     print(f"Summary: {result.summary}")
     print(f"Facts ({len(result.facts)}):")
@@ -53,10 +54,10 @@ def test_summarize_conversation():
         {"role": "assistant", "content": "Filtered to 89 high-value customers"}
     ]
     
-    summary = client.summarize_conversation(
+    summary = asyncio.run(client.summarize_conversation(
         messages,
         workflow_context="Customer filtering workflow"
-    )
+    ))
     print(f"Summary: {summary}")
 
 def test_handoff_reasoning():
@@ -64,7 +65,7 @@ def test_handoff_reasoning():
     print("\n=== Testing reason_about_handoff() ===")
     client = get_gemini_client()
     
-    result = client.reason_about_handoff(
+    result = asyncio.run(client.reason_about_handoff(
         source_workflow_summary="Identified 89 high-value California customers with purchases over $100",
         source_facts=[
             "234 total customers in California",
@@ -72,7 +73,7 @@ def test_handoff_reasoning():
             "Average purchase value: $156"
         ],
         target_workflow_description="Send targeted email campaign to high-value customers"
-    )
+    ))
     
     print(f"Handoff Data: {result.get('handoff_data', 'N/A')}")
     print(f"Relevance: {result.get('relevance', 'N/A')}")
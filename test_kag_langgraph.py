@@ -3,6 +3,7 @@ Test KAG Service with LangGraph Implementation
 Comprehensive testing of Knowledge-Aided Generation workflow
 """
 import sys
+import asyncio
 import os
 from datetime import datetime
 
@@ -50,13 +51,13 @@ def test_basic_kag_invocation():
     Recommendation: Continue current strategy with minor optimizations.
     """
     
-    result = service.invoke_kag(
+    result = asyncio.run(service.invoke_kag(
         workflow_output=workflow_output,
         workflow_name="Market Analysis",
         solution_id="solution_001",
         workflow_id="workflow_001",
         context="Analyzing Q3 business metrics"
-    )
+    ))
     
     print_result("✅ Summary", result.get("summary"))
     print_result("✅ Facts", result.get("facts", []))
@@ -81,38 +82,38 @@ def test_multi_workflow_context():
     
     # Workflow 1: Data Collection
     print("📊 Workflow 1: Data Collection")
-    result1 = service.invoke_kag(
+    result1 = asyncio.run(service.invoke_kag(
         workflow_output="Collected 10,000 customer records. Data quality: 95%",
         workflow_name="Data Collection",
         solution_id=solution_id,
         workflow_id="wf_001",
         context="Initial data gathering phase"
-    )
+    ))
     print_result("  Summary", result1.get("summary"), indent=1)
     print_result("  Facts", result1.get("facts", []), indent=1)
     
     # Workflow 2: Data Analysis (should have context from workflow 1)
     print("\n📊 Workflow 2: Data Analysis")
-    result2 = service.invoke_kag(
+    result2 = asyncio.run(service.invoke_kag(
         workflow_output="Analysis reveals 3 customer segments. High-value segment: 2,000 customers",
         workflow_name="Data Analysis",
         solution_id=solution_id,
         workflow_id="wf_002",
         context="Analyzing collected customer data"
-    )
+    ))
     print_result("  Summary", result2.get("summary"), indent=1)
     print_result("  Facts", result2.get("facts", []), indent=1)
     print_result("  Context Available", result2.get("context_available"), indent=1)
     
     # Workflow 3: Generate Report (should have context from both previous workflows)
     print("\n📊 Workflow 3: Generate Report")
-    result3 = service.invoke_kag(
+    result3 = asyncio.run(service.invoke_kag(
         workflow_output="Report generated with actionable insights for each segment",
         workflow_name="Report Generation",
         solution_id=solution_id,
         workflow_id="wf_003",
         context="Final reporting phase"
-    )
+    ))
     print_result("  Summary", result3.get("summary"), indent=1)
     print_result("  Context Available", result3.get("context_available"), indent=1)
     
@@ -133,21 +134,21 @@ def test_handoff_preparation():
     solution_id = "solution_003"
     
     # Source workflow
-    service.invoke_kag(
+    asyncio.run(service.invoke_kag(
         workflow_output="Research identified 5 viable market opportunities",
         workflow_name="Market Research",
         solution_id=solution_id,
         workflow_id="source_wf",
         context="Market opportunity analysis"
-    )
+    ))
     
     # Prepare handoff to next workflow
-    handoff = service.prepare_handoff(
+    handoff = asyncio.run(service.prepare_handoff(
         source_workflow_id="source_wf",
         target_workflow_id="target_wf",
         target_workflow_description="Create detailed business plan for top opportunities",
         solution_id=solution_id
-    )
+    ))
     
     print_result("✅ Handoff Data", handoff.get("handoff_data"))
     print_result("✅ Relevance", handoff.get("relevance"))
@@ -178,16 +179,16 @@ def test_solution_summary():
     ]
     
     for i, (name, output) in enumerate(workflows):
-        service.invoke_kag(
+        asyncio.run(service.invoke_kag(
             workflow_output=output,
             workflow_name=name,
             solution_id=solution_id,
             workflow_id=f"wf_{i}",
             context=f"Phase {i+1}"
-        )
+        ))
     
     # Get solution summary
-    summary = service.get_solution_summary(solution_id)
+    summary = asyncio.run(service.get_solution_summary(solution_id))
     
     print_result("✅ Total Workflows", summary.get("total_workflows"))
     print_result("✅ Combined Facts Count", len(summary.get("combined_facts", [])))
@@ -214,13 +215,13 @@ def test_memory_management():
     
     # Add some memories
     for i in range(3):
-        service.invoke_kag(
+        asyncio.run(service.invoke_kag(
             workflow_output=f"Workflow {i} output",
             workflow_name=f"Workflow {i}",
             solution_id=solution_id,
             workflow_id=f"wf_{i}",
             context=""
-        )
+        ))
     
     # Verify memories exist
     memories_before = service.memory.get_memories(solution_id)
@@ -248,25 +249,25 @@ def test_error_handling():
     service = KAGService()
     
     # Test with empty output
-    result = service.invoke_kag(
+    result = asyncio.run(service.invoke_kag(
         workflow_output="",
         workflow_name="Empty Test",
         solution_id="solution_006",
         workflow_id="wf_empty",
         context=""
-    )
+    ))
     
     print_result("✅ Handled Empty Output", result.get("memory_stored") is not None)
     
     # Test with very long output
     long_output = "Test " * 10000
-    result2 = service.invoke_kag(
+    result2 = asyncio.run(service.invoke_kag(
         workflow_output=long_output,
         workflow_name="Long Test",
         solution_id="solution_006",
         workflow_id="wf_long",
         context=""
-    )
+    ))
     
     print_result("✅ Handled Long Output", result2.get("memory_stored") is not None)
     
@@ -287,13 +288,13 @@ def test_langgraph_state_transitions():
     expected_nodes = ["retrieve_context", "extract_facts", "generate_summary", "store_memory"]
     
     # Execute and verify state progression
-    result = service.invoke_kag(
+    result = asyncio.run(service.invoke_kag(
         workflow_output="Testing LangGraph state flow",
         workflow_name="State Test",
         solution_id="solution_007",
         workflow_id="wf_state",
         context="State transition test"
-    )
+    ))
     
     # Verify all expected keys are present
     expected_keys = ["summary", "facts", "reasoning", "memory_stored", "context_available"]
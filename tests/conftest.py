@@ -0,0 +1,56 @@
+"""
+Shared test setup: keep the KAG memory store and knowledge graph in memory so
+test runs never write SQLite files into the data directory, and fake Gemini
+with an httpx MockTransport.
+"""
+import os
+
+os.environ.setdefault("KAG_MEMORY_DB_PATH", ":memory:")
+os.environ.setdefault("KG_DB_PATH", ":memory:")
+
+import json
+
+import httpx
+import pytest
+
+from app.services import kag_service as kag_module
+from app.services.gemini_client import GeminiClient
+from app.services.kag_service import ConversationMemory, KAGService
+from app.services.knowledge_graph import KnowledgeGraphManager, SQLiteGraphStore
+
+
+def gemini_reply(text: str) -> dict:
+    """A generateContent response body with ``text`` as the only part"""
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+def gemini_prompt(request: httpx.Request) -> str:
+    """The prompt text of a generateContent request"""
+    return json.loads(request.content)["contents"][0]["parts"][0]["text"]
+
+
+@pytest.fixture
+def mock_gemini(monkeypatch):
+    """Route every httpx.AsyncClient request to ``handler``; returns the installer"""
+    real_client = httpx.AsyncClient
+
+    def install(handler):
+        transport = httpx.MockTransport(handler)
+        monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs))
+
+    return install
+
+
+@pytest.fixture
+def kag_service(monkeypatch, mock_gemini):
+    """Factory for a KAGService answered by a Gemini ``handler``, with in-memory stores"""
+    monkeypatch.setattr(kag_module, "get_gemini_client", lambda: GeminiClient(api_key="test-key"))
+
+    def make(handler, **kwargs) -> KAGService:
+        mock_gemini(handler)
+        kag = KAGService(**kwargs)
+        kag.memory = ConversationMemory()
+        kag.kg_manager = KnowledgeGraphManager(SQLiteGraphStore(":memory:"))
+        return kag
+
+    return make
@@ -0,0 +1,161 @@
+"""
+Tests for offline batch inference: request collection, JSONL jobs and resume.
+"""
+import asyncio
+import json
+
+from app import storage
+from app.services import batch_inference
+from app.services import orchestrator as orchestrator_module
+from app.services.batch_inference import (
+    BatchCollector, BatchJob, batch_mode, parse_result_line, request_id, to_batch_line
+)
+from app.services.llm_client import LLMClient
+
+
+async def _generate_all(collector, prompts):
+    with batch_mode(collector):
+        return await asyncio.gather(*(LLMClient(provider="mock").generate(p, add_to_context=False) for p in prompts))
+
+
+def test_calls_are_collected_into_one_job(tmp_path):
+    collector = BatchCollector(tmp_path, max_requests=100, flush_seconds=0.05)
+    prompts = [f"report {i}" for i in range(5)]
+
+    results = asyncio.run(_generate_all(collector, prompts))
+
+    assert [str(r) for r in results] == [f"[mock-llm-mock] response for: {p}" for p in prompts]
+    assert all(r.usage_source == "estimate" for r in results)
+    jobs = list((tmp_path / "jobs").glob("*.json"))
+    assert len(jobs) == 1
+    job = BatchJob.load(jobs[0])
+    assert job.status == "completed" and len(job.custom_ids) == 5
+    line = job.read_input()[0]
+    assert line["method"] == "POST" and line["url"] == "/v1/chat/completions" and line["body"]["model"] == ""
+    assert len(job.output_path.read_text().splitlines()) == 5
+
+
+def test_full_queue_is_submitted_without_waiting(tmp_path):
+    collector = BatchCollector(tmp_path, max_requests=2, flush_seconds=60)
+    asyncio.run(_generate_all(collector, ["a", "b", "c", "d"]))
+    assert collector.get_stats()["jobs"] == {"completed": 2}
+
+
+def test_replay_reuses_persisted_results(tmp_path):
+    asyncio.run(_generate_all(BatchCollector(tmp_path, flush_seconds=0.01), ["x", "y"]))
+
+    restarted = BatchCollector(tmp_path, flush_seconds=0.01)
+    results = asyncio.run(_generate_all(restarted, ["x", "y"]))
+    assert [str(r) for r in results] == ["[mock-llm-mock] response for: x", "[mock-llm-mock] response for: y"]
+    assert restarted.submitted_requests == 0 and restarted.reused_results == 2
+
+
+def test_resume_polls_submitted_job_instead_of_resubmitting(tmp_path):
+    client = LLMClient(provider="mock")
+    body = {"model": "", "messages": client._groq_messages("pending"), "max_tokens": 800, "temperature": 0.7}
+    job = BatchJob(tmp_path / "jobs", "mock")
+    (tmp_path / "jobs").mkdir()
+    job.write_input({request_id("mock", body): body})
+    job.backend, job.status = "local", "submitted"
+    job.save()
+
+    async def main():
+        collector = BatchCollector(tmp_path, flush_seconds=0.01)
+        collector.resume()
+        with batch_mode(collector):
+            result = await LLMClient(provider="mock").generate("pending", add_to_context=False)
+        return collector, result
+
+    collector, result = asyncio.run(main())
+    assert str(result) == "[mock-llm-mock] response for: pending"
+    assert collector.submitted_requests == 0
+    assert BatchJob.load(job.state_path).status == "completed"
+
+
+def test_batch_formats():
+    assert to_batch_line("anthropic", "id1", {"model": "m"}) == {"custom_id": "id1", "params": {"model": "m"}}
+    assert request_id("groq", {"a": 1, "b": 2}) == request_id("groq", {"b": 2, "a": 1})
+
+    ok = {"custom_id": "a", "response": {"status_code": 200, "body": {"choices": []}}, "error": None}
+    assert parse_result_line(ok) == ("a", {"choices": []}, None)
+    failed = {"custom_id": "b", "response": {"status_code": 429, "body": {"error": "rate"}}, "error": None}
+    assert parse_result_line(failed)[1] is None and "rate" in parse_result_line(failed)[2]
+    succeeded = {"custom_id": "c", "result": {"type": "succeeded", "message": {"content": []}}}
+    assert parse_result_line(succeeded) == ("c", {"content": []}, None)
+    errored = {"custom_id": "d", "result": {"type": "errored", "error": {"type": "overloaded"}}}
+    assert "overloaded" in parse_result_line(errored)[2]
+
+
+def test_failed_requests_are_not_persisted(tmp_path, monkeypatch):
+    async def failing(provider, body):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr("app.services.llm_client.execute_request", failing)
+    collector = BatchCollector(tmp_path, flush_seconds=0.01)
+    result = asyncio.run(_generate_all(collector, ["q"]))[0]
+    assert result.startswith("[batch-error") and result.usage_source == "none"
+    assert collector.results == {}
+
+
+def test_batch_run_executes_and_resumes(tmp_path, monkeypatch):
+    configs = {
+        ("agents", "batch-writer"): {"id": "batch-writer", "name": "Writer", "llm_config": {"provider": "mock"}, "tools": []},
+        ("workflows", "batch-wf"): {"id": "batch-wf", "type": "sequence",
+                                    "nodes": [{"id": "write", "agent_ref": "batch-writer", "task": "default"}]},
+    }
+    saved = {}
+    monkeypatch.setattr(storage, "load", lambda kind, id: configs.get((kind, id)))
+    monkeypatch.setattr(storage, "save", lambda kind, id, obj: saved.__setitem__((kind, id), obj))
+    monkeypatch.setattr(orchestrator_module, "load", lambda kind, id: configs.get((kind, id)))
+    monkeypatch.setattr(batch_inference, "BATCH_DIR", tmp_path)
+    monkeypatch.setattr(batch_inference, "BATCH_FLUSH_SECONDS", 0.01)
+
+    state = batch_inference.create_batch_run("batch-wf", ["report A", "report B"])
+    status = asyncio.run(batch_inference.run_batch(state["id"]))
+    assert status["status"] == "completed" and status["completed"] == 2
+    assert ("runs", f"{state['id']}-0") in saved
+    results = (tmp_path / state["id"] / "results.jsonl").read_text().splitlines()
+    assert len(results) == 2
+
+    # Simulate a crash after the first input finished: only the second is replayed
+    run_file = tmp_path / state["id"] / "run.json"
+    persisted = json.loads(run_file.read_text())
+    persisted["status"] = "running"
+    del persisted["completed"]["1"]
+    run_file.write_text(json.dumps(persisted))
+    saved.clear()
+
+    status = asyncio.run(batch_inference.run_batch(state["id"]))
+    assert status["completed"] == 2
+    assert list(saved) == [("runs", f"{state['id']}-1")]
+    assert status["jobs"] == {"completed": 1}  # answered from results.jsonl, no new job
+
+
+def test_concurrent_runs_keep_their_own_metrics(monkeypatch):
+    configs = {
+        ("agents", "metrics-writer"): {"id": "metrics-writer", "name": "Writer", "llm_config": {"provider": "mock"}, "tools": []},
+    }
+    monkeypatch.setattr(orchestrator_module, "load", lambda kind, id: configs.get((kind, id)))
+
+    def workflow(steps):
+        return {"id": f"wf-{steps}", "type": "sequence",
+                "nodes": [{"id": f"n{i}", "agent_ref": "metrics-writer", "task": f"step {i}"} for i in range(steps)]}
+
+    async def main():
+        orchestrator = orchestrator_module.LangGraphOrchestrator()
+        return await asyncio.gather(orchestrator.run_workflow(workflow(1), "run-1"),
+                                    orchestrator.run_workflow(workflow(3), "run-3"))
+
+    short, long = asyncio.run(main())
+    assert short["metrics"]["workflow_step_count"] == 1
+    assert long["metrics"]["workflow_step_count"] == 3
+
+
+def test_batch_requests_never_coalesce_with_interactive_ones(tmp_path):
+    client = LLMClient(provider="mock")
+    interactive = client._request_key("same prompt")
+    with batch_mode(BatchCollector(tmp_path / "a")):
+        batch_a = client._request_key("same prompt")
+    with batch_mode(BatchCollector(tmp_path / "b")):
+        batch_b = client._request_key("same prompt")
+    assert len({interactive, batch_a, batch_b}) == 3
@@ -0,0 +1,83 @@
+"""
+Tests for run/session scoped conversation contexts.
+"""
+import asyncio
+
+from app.services import context_store as store_module
+from app.services.context_store import ContextStore
+from app.services.conversation_context import ConversationContext
+from app.services.orchestrator import LangGraphOrchestrator
+
+
+def test_scopes_are_isolated():
+    store = ContextStore()
+    store.get("run-1", "agent").add("user", "secret of run 1")
+
+    assert store.get("run-2", "agent").messages == []
+    assert store.get("run-1", "other-agent").messages == []
+    assert store.get("run-1", "agent").messages[0]["content"] == "secret of run 1"
+    assert store.get_stats()["scopes"] == 2
+
+
+def test_release_drops_scope():
+    store = ContextStore()
+    context = store.get("session", "agent")
+    context.add("user", "hello")
+
+    assert store.release("session") is True
+    assert context.messages == [] and context.size_bytes == 0
+    assert store.release("session") is False
+    assert store.get("session", "agent") is not context
+    assert store.get_stats()["released"] == 1
+
+
+def test_size_accounting():
+    context = ConversationContext(token_budget=10_000)
+    context.add("user", "héllo")
+    context.add("assistant", "world")
+    assert context.size_bytes == 11
+    assert context.get_stats()["size_bytes"] == 11
+
+    store = ContextStore()
+    store.get("s", "a").add("user", "x" * 100)
+    assert store.size_bytes() == 100
+
+
+def test_lru_eviction_by_count_and_bytes():
+    store = ContextStore(max_scopes=2)
+    store.get("a", "agent")
+    store.get("b", "agent")
+    store.get("a", "agent")  # touch: b is now least recently used
+    store.get("c", "agent")
+    assert set(store._scopes) == {"a", "c"}
+    assert store.evictions == 1
+
+    store = ContextStore(max_bytes=150)
+    store.get("old", "agent").add("user", "x" * 100)
+    store.get("new", "agent").add("user", "y" * 100)
+    store.get("new", "agent")
+    assert list(store._scopes) == ["new"]
+
+
+def test_idle_scopes_expire():
+    store = ContextStore(ttl_seconds=60)
+    store.get("idle", "agent")
+    store._scopes["idle"].last_used -= 120
+    store.get("active", "agent")
+    assert list(store._scopes) == ["active"]
+
+
+def test_run_workflow_releases_run_scope(monkeypatch):
+    store = ContextStore()
+    monkeypatch.setattr(store_module, "_context_store", store)
+    orchestrator = LangGraphOrchestrator()
+    workflow = {"id": "wf", "type": "sequence", "nodes": []}
+
+    asyncio.run(orchestrator.run_workflow(workflow, run_id="run-x", format_output=False))
+    store.get("run-x", "agent")
+    asyncio.run(orchestrator.run_workflow(workflow, run_id="run-x", format_output=False))
+    assert "run-x" not in store._scopes
+
+    store.get("session-1", "agent").add("user", "keep me")
+    asyncio.run(orchestrator.run_workflow(workflow, run_id="run-y", format_output=False, session_id="session-1"))
+    assert store.get("session-1", "agent").messages[0]["content"] == "keep me"
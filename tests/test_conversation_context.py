@@ -0,0 +1,161 @@
+"""
+Tests for the token-budgeted conversation context with rolling summaries.
+"""
+import asyncio
+
+import httpx
+
+from app.services import conversation_context, llm_client
+from app.services.conversation_context import ConversationContext, extractive_summary, summarize
+from app.services.llm_client import LLMClient
+from app.services.tokenizer import count_message_tokens, count_tokens, truncate_to_tokens
+
+TURN = "The deployment uses Kubernetes with three replicas and the database runs on Postgres version fifteen."
+
+
+def test_small_history_is_kept_verbatim():
+    context = ConversationContext(token_budget=1000)
+    context.add("user", "hi")
+    context.add("assistant", "hello")
+    assert context.window() == [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    assert context.summary == ""
+
+
+def test_sync_overflow_folds_inline():
+    context = ConversationContext(token_budget=120, keep_recent=2)
+    for i in range(8):
+        context.add("user" if i % 2 == 0 else "assistant", f"Turn {i}. {TURN}")
+    assert context.summary
+    assert context.summarized_messages > 0
+    assert len(context.messages) <= 4
+    assert context.window()[0]["role"] == "system"
+    assert context.window()[-1]["content"].startswith("Turn 7.")
+
+
+def test_background_compaction_keeps_window_in_budget():
+    context = ConversationContext(token_budget=150, keep_recent=2)
+
+    async def main():
+        for i in range(10):
+            context.add("user", f"Turn {i}. {TURN}")
+        # The fold runs in the background; the window is trimmed meanwhile
+        assert count_message_tokens(context.window()) <= 150
+        await context.wait_for_compaction()
+
+    asyncio.run(main())
+    assert context.summary
+    assert len(context.messages) < 10
+
+
+def test_clear_discards_pending_fold():
+    context = ConversationContext(token_budget=50, keep_recent=1)
+
+    async def main():
+        for i in range(5):
+            context.add("user", f"Turn {i}. {TURN}")
+        context.clear()
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert context.messages == [] and context.summary == ""
+
+
+def test_extractive_summary_respects_budget_and_order():
+    messages = [
+        {"role": "user", "content": "We chose Postgres for storage. The weather is nice."},
+        {"role": "assistant", "content": "Postgres storage needs backups. Backups run nightly."},
+    ]
+    summary = extractive_summary("", messages, max_tokens=25)
+    assert count_tokens(summary) <= 25
+    assert "Postgres" in summary
+    original = ["user: We chose Postgres for storage.", "user: The weather is nice.",
+                "assistant: Postgres storage needs backups.", "assistant: Backups run nightly."]
+    positions = [original.index(line) for line in summary.split("\n")]
+    assert positions == sorted(positions)
+
+
+def test_model_summaries_are_cached(monkeypatch):
+    monkeypatch.setattr(conversation_context, "_summary_cache", conversation_context.OrderedDict())
+    calls = []
+
+    async def fake_model_summary(previous, messages, provider, model, max_tokens):
+        calls.append((provider, model))
+        return "folded"
+
+    monkeypatch.setattr(conversation_context, "model_summary", fake_model_summary)
+    messages = [{"role": "user", "content": TURN}]
+    assert asyncio.run(summarize("", messages, "groq:llama-3.1-8b-instant")) == "folded"
+    assert asyncio.run(summarize("", messages, "groq:llama-3.1-8b-instant")) == "folded"
+    assert calls == [("groq", "llama-3.1-8b-instant")]
+
+
+def test_client_sends_summary_to_providers():
+    client = LLMClient(provider="mock")
+    client.context = ConversationContext(token_budget=200, keep_recent=2)
+
+    async def chat():
+        for i in range(6):
+            await client.generate(f"Question {i}: {TURN}")
+        await client.context.wait_for_compaction()
+
+    asyncio.run(chat())
+    assert client.context.summary
+    assert client.get_context()[0]["role"] == "system"
+    payload = client._anthropic_payload("claude", "next question")
+    assert payload["system"].startswith(conversation_context.SUMMARY_PREFIX)
+    assert all(m["role"] in ("user", "assistant") for m in payload["messages"])
+    assert client._groq_messages("next", history=False) == [client.context.summary_message(), {"role": "user", "content": "next"}]
+
+
+def test_truncate_to_tokens():
+    assert truncate_to_tokens(TURN, 1000) == TURN
+    short = truncate_to_tokens(TURN, 5)
+    assert TURN.startswith(short) and 0 < count_tokens(short) <= 5
+    assert truncate_to_tokens(TURN, 0) == ""
+
+
+def test_large_prompt_is_trimmed_to_the_request_budget(monkeypatch):
+    monkeypatch.setitem(llm_client.LLM_REQUEST_TOKEN_BUDGETS, "groq", 400)
+    monkeypatch.setitem(llm_client.LLM_REQUEST_TOKEN_BUDGETS, "anthropic", 400)
+    client = LLMClient(provider="mock", max_tokens=100, system_prompt="You are terse.")
+    client.add_to_context("user", "Earlier question")
+    prompt = "Tool result: " + TURN * 50
+
+    messages = client._groq_messages(prompt)
+    assert messages[-1]["content"].endswith(llm_client.TRUNCATION_MARKER)
+    assert count_message_tokens(messages) + 100 <= 400
+    payload = client._anthropic_payload("claude", prompt)
+    assert count_message_tokens(payload["messages"]) + count_tokens("You are terse.") + 100 <= 400
+    # Prompts that fit are sent unchanged
+    assert client._groq_messages("short")[-1]["content"] == "short"
+
+
+
+def test_long_anthropic_prompt_is_sent_intact():
+    client = LLMClient(provider="anthropic", max_tokens=1024, system_prompt="You are terse.")
+    client.add_to_context("user", "Earlier question")
+    prompt = "Upstream agent output: " + TURN * 400
+    assert count_tokens(prompt) > llm_client.LLM_REQUEST_TOKEN_BUDGETS["groq"]
+
+    payload = client._anthropic_payload("claude-sonnet-4.5", prompt)
+    assert payload["messages"][-1]["content"] == prompt
+    # The same prompt is trimmed for Groq's per-request limit
+    assert client._groq_messages(prompt)[-1]["content"].endswith(llm_client.TRUNCATION_MARKER)
+
+
+def test_payload_too_large_retries_trimmed_then_reports_an_error(monkeypatch):
+    monkeypatch.setattr(llm_client, "GROQ_KEY", "test-key")
+    monkeypatch.setitem(llm_client.LLM_REQUEST_TOKEN_BUDGETS, "groq", 2000)
+    client = LLMClient(provider="groq")
+    sent = []
+
+    async def too_large(provider, url, payload, headers):
+        sent.append(count_message_tokens(payload["messages"]) + payload["max_tokens"])
+        request = httpx.Request("POST", url)
+        raise httpx.HTTPStatusError("413", request=request, response=httpx.Response(413, request=request))
+
+    monkeypatch.setattr(client, "_post", too_large)
+    result, ok = asyncio.run(client._call_provider(TURN * 200, "groq", "llama-3.1-8b-instant"))
+    assert ok is False
+    assert str(result).startswith("[groq-error: request too large")
+    assert sent[0] <= 2000 and sent[1] <= 1000
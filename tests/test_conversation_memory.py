@@ -0,0 +1,36 @@
+"""
+Tests for the indexed KAG ConversationMemory.
+"""
+from app.services.kag_service import ConversationMemory
+
+
+def test_solution_memories_keep_insertion_order_across_workflows():
+    memory = ConversationMemory()
+    for name, workflow in (("a1", "a"), ("b1", "b"), ("a2", "a"), ("c1", "c")):
+        memory.add_memory("sol", workflow, {"summary": name})
+    memory.add_memory("other", "a", {"summary": "x"})
+
+    assert [m["summary"] for m in memory.get_memories("sol")] == ["a1", "b1", "a2", "c1"]
+    assert [m["summary"] for m in memory.get_memories("sol", "a")] == ["a1", "a2"]
+    assert memory.get_latest("sol", "a")["summary"] == "a2"
+    assert memory.get_latest("sol", "missing") is None
+    assert memory.get_solution_context("sol").splitlines()[0] == "[Unknown]: a1"
+
+
+def test_workflow_history_is_bounded():
+    memory = ConversationMemory(max_history=3)
+    for i in range(5):
+        memory.add_memory("sol", "wf", {"summary": str(i)})
+
+    assert [m["summary"] for m in memory.get_memories("sol", "wf")] == ["2", "3", "4"]
+    assert memory.get_stats()["memories"] == 3
+
+
+def test_clear_solution_leaves_other_solutions():
+    memory = ConversationMemory()
+    memory.add_memory("sol1", "wf", {"summary": "one"})
+    memory.add_memory("sol10", "wf", {"summary": "ten"})
+
+    memory.clear_solution("sol1")
+    assert memory.get_memories("sol1") == []
+    assert [m["summary"] for m in memory.get_memories("sol10")] == ["ten"]
@@ -0,0 +1,76 @@
+"""
+Tests for the memoized KAG handoff reasoning.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from conftest import gemini_prompt, gemini_reply
+
+
+@pytest.fixture
+def handoff_calls():
+    return []
+
+
+@pytest.fixture
+def service(kag_service, handoff_calls):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompt = gemini_prompt(request)
+        if "orchestrating communication" in prompt:
+            handoff_calls.append(prompt)
+            return httpx.Response(200, json=gemini_reply(json.dumps({
+                "handoff_data": f"handoff {len(handoff_calls)}", "relevance": "r", "context": "c"
+            })))
+        output = prompt.split("Workflow Output:")[-1].strip().splitlines()[0]
+        return httpx.Response(200, json=gemini_reply(json.dumps({
+            "summary": output, "facts": [output], "reasoning": "r"
+        })))
+
+    return kag_service(handler)
+
+
+def _handoff(service, target="Write the report"):
+    return asyncio.run(service.prepare_handoff("wf1", "wf2", target, "sol"))
+
+
+def test_repeated_handoff_is_served_from_cache(service, handoff_calls):
+    asyncio.run(service.invoke_kag("Revenue grew", "Finance", "sol", "wf1"))
+
+    first = _handoff(service)
+    second = _handoff(service)
+    assert len(handoff_calls) == 1
+    assert first["handoff_cached"] is False and second["handoff_cached"] is True
+    assert second["handoff_data"] == first["handoff_data"]
+
+    _handoff(service, target="Plan the budget")
+    assert len(handoff_calls) == 2
+
+    stats = service.handoff_cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["hit_ratio"] == pytest.approx(1 / 3)
+
+
+def test_new_source_memory_invalidates_cached_handoff(service, handoff_calls):
+    asyncio.run(service.invoke_kag("Revenue grew", "Finance", "sol", "wf1"))
+    _handoff(service)
+
+    # Re-running with the same output keeps the entry
+    asyncio.run(service.invoke_kag("Revenue grew", "Finance", "sol", "wf1"))
+    assert _handoff(service)["handoff_cached"] is True
+
+    asyncio.run(service.invoke_kag("Revenue fell", "Finance", "sol", "wf1"))
+    assert service.handoff_cache.get_stats()["invalidations"] == 1
+    handoff = _handoff(service)
+    assert handoff["handoff_cached"] is False
+    assert handoff["facts"] == ["Revenue fell"]
+    assert len(handoff_calls) == 2
+
+
+def test_clearing_solution_memory_drops_its_handoffs(service):
+    asyncio.run(service.invoke_kag("Revenue grew", "Finance", "sol", "wf1"))
+    _handoff(service)
+    service.clear_solution_memory("sol")
+    assert service.handoff_cache.get_stats()["entries"] == 0
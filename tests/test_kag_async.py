@@ -0,0 +1,78 @@
+"""
+Tests for the async Gemini client and the async KAG LangGraph nodes.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.services.gemini_client import GeminiClient
+from conftest import gemini_prompt, gemini_reply
+
+GEMINI_DELAY = 0.2
+
+
+async def _handler(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(GEMINI_DELAY)
+    prompt = gemini_prompt(request)
+    if "extract key information" in prompt:
+        return httpx.Response(200, json=gemini_reply(json.dumps({
+            "summary": "Revenue grew.", "facts": ["Revenue grew 12%"], "reasoning": "Strong quarter."
+        })))
+    if "how to hand off" in prompt.lower() or "orchestrating communication" in prompt:
+        return httpx.Response(200, json=gemini_reply('{"handoff_data": "Revenue grew 12%", "relevance": "r", "context": "c"}'))
+    return httpx.Response(200, json=gemini_reply("Quarterly revenue grew 12%."))
+
+
+@pytest.fixture
+def service(kag_service):
+    return kag_service(_handler)
+
+
+def test_kag_pipeline_runs_async(service):
+    result = asyncio.run(service.invoke_kag("Q3 revenue grew 12%", "Finance", "sol", "wf1"))
+    assert result["facts"] == ["Revenue grew 12%"]
+    assert result["summary"] == "Revenue grew."
+    assert result["memory_stored"] is True
+
+    handoff = asyncio.run(service.prepare_handoff("wf1", "wf2", "Write the report", "sol"))
+    assert handoff["handoff_data"] == "Revenue grew 12%" and handoff["facts"] == ["Revenue grew 12%"]
+    summary = asyncio.run(service.get_solution_summary("sol", wait=True))
+    assert summary["total_workflows"] == 1 and summary["overall_context"]
+
+
+def test_kag_does_not_block_the_event_loop(service):
+    async def main():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(service.invoke_kag(f"output {i}", f"W{i}", "sol", f"wf{i}") for i in range(3)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ticking
+        return ticks, elapsed
+
+    ticks, elapsed = asyncio.run(main())
+    # Three invocations overlap instead of queueing behind each other
+    assert elapsed < 3 * GEMINI_DELAY
+    assert ticks >= 10
+
+
+def test_gemini_errors_are_reported(mock_gemini):
+    mock_gemini(lambda request: httpx.Response(503, json={"error": "unavailable"}))
+    client = GeminiClient(api_key="test-key")
+
+    result = asyncio.run(client.generate("hello"))
+    assert result["text"] == "" and "503" in result["error"]
+    facts = asyncio.run(client.extract_facts("output"))
+    assert facts.summary == "Error extracting facts" and facts.facts == []
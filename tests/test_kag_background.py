@@ -0,0 +1,126 @@
+"""
+Tests for background KAG ingestion and deferred/fast workflow handoffs.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.services.kag_service import KAGService
+from conftest import gemini_prompt, gemini_reply
+
+GEMINI_DELAY = 0.2
+WORKFLOW_DELAY = 0.2
+
+
+@pytest.fixture
+def gemini_calls():
+    return []
+
+
+@pytest.fixture
+def service(kag_service, gemini_calls):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompt = gemini_prompt(request)
+        gemini_calls.append(prompt)
+        await asyncio.sleep(GEMINI_DELAY)
+        if "extract key information" in prompt:
+            return httpx.Response(200, json=gemini_reply(json.dumps({
+                "summary": "Step done.", "facts": ["Fact from step"], "reasoning": "r"
+            })))
+        if "orchestrating communication" in prompt:
+            return httpx.Response(200, json=gemini_reply('{"handoff_data": "reasoned", "relevance": "r", "context": "c"}'))
+        return httpx.Response(200, json=gemini_reply("Overall summary."))
+
+    return kag_service(handler)
+
+
+async def _run_solution(service: KAGService, workflows, fast: bool):
+    """The execute_solution loop: handoff, run, ingest in the background"""
+    handoffs = []
+    tasks = []
+    for i, workflow_id in enumerate(workflows):
+        if i > 0:
+            handoffs.append(await service.prepare_handoff(workflows[i - 1], workflow_id, "next step", "sol", fast=fast))
+        await asyncio.sleep(WORKFLOW_DELAY)
+        tasks.append(service.ingest_in_background(f"output of {workflow_id}", workflow_id, "sol", workflow_id))
+    results = [await task for task in tasks]
+    return handoffs, results
+
+
+def test_fast_handoff_keeps_kag_off_the_critical_path(service, gemini_calls):
+    start = time.perf_counter()
+    handoffs, results = asyncio.run(_run_solution(service, ["wf1", "wf2", "wf3"], fast=True))
+    elapsed = time.perf_counter() - start
+
+    # Three workflows plus the last extraction, instead of workflow + extraction + handoff each
+    assert elapsed < 3 * WORKFLOW_DELAY + 2 * GEMINI_DELAY
+    assert [h["handoff_mode"] for h in handoffs] == ["raw", "raw"]
+    assert handoffs[0]["handoff_data"] == "output of wf1"
+    assert all(r["memory_stored"] for r in results)
+    assert len(service.memory.get_memories("sol")) == 3
+    assert not any("orchestrating communication" in prompt for prompt in gemini_calls)
+
+
+def test_handoff_awaits_only_the_source_memory(service):
+    async def main():
+        service.ingest_in_background("output of wf1", "wf1", "sol", "wf1")
+        assert service.is_pending("sol", "wf1")
+        handoff = await service.prepare_handoff("wf1", "wf2", "next step", "sol")
+        return handoff
+
+    handoff = asyncio.run(main())
+    assert handoff["handoff_mode"] == "reasoned"
+    assert handoff["handoff_data"] == "reasoned"
+    assert handoff["facts"] == ["Fact from step"]
+    assert not service.is_pending("sol", "wf1")
+
+
+def test_fast_handoff_uses_facts_once_stored(service, gemini_calls):
+    asyncio.run(service.invoke_kag("output of wf1", "wf1", "sol", "wf1"))
+    calls = len(gemini_calls)
+
+    handoff = asyncio.run(service.prepare_handoff("wf1", "wf2", "next step", "sol", fast=True))
+    assert handoff["handoff_mode"] == "facts"
+    assert handoff["facts"] == ["Fact from step"]
+    assert "Step done." in handoff["handoff_data"]
+    assert len(gemini_calls) == calls
+
+
+def test_background_ingestions_keep_solution_order(service):
+    async def main():
+        for i in range(3):
+            service.ingest_in_background(f"output {i}", f"W{i}", "sol", f"wf{i}")
+        await service.wait_for_solution("sol")
+
+    asyncio.run(main())
+    names = [m["workflow_name"] for m in service.memory.get_memories("sol")]
+    assert names == ["W0", "W1", "W2"]
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_handoff_flags_a_failed_source_ingestion(service, monkeypatch, fast):
+    async def broken_extraction(*args, **kwargs):
+        raise RuntimeError("extraction exploded")
+
+    async def main():
+        # An earlier run of wf1 left a memory behind
+        await service.invoke_kag("old output of wf1", "wf1", "sol", "wf1")
+        monkeypatch.setattr(service, "invoke_kag", broken_extraction)
+        await service.ingest_in_background("new output of wf1", "wf1", "sol", "wf1")
+        failed = await service.prepare_handoff("wf1", "wf2", "next step", "sol", fast=fast)
+
+        monkeypatch.delattr(service, "invoke_kag")
+        await service.ingest_in_background("newer output of wf1", "wf1", "sol", "wf1")
+        recovered = await service.prepare_handoff("wf1", "wf2", "next step", "sol", fast=fast)
+        return failed, recovered
+
+    failed, recovered = asyncio.run(main())
+    assert failed["handoff_mode"] == "raw" and failed["memory_stale"] is True
+    assert failed["handoff_data"] == "new output of wf1"
+    assert "extraction exploded" in failed["ingestion_error"]
+    assert "memory_stale" not in recovered
+    assert recovered["handoff_mode"] == ("facts" if fast else "reasoned")
+    assert recovered["facts"] == ["Fact from step"]
@@ -0,0 +1,75 @@
+"""
+Tests for top-k relevance-ranked KAG context retrieval.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services import kag_service as kag_module
+from conftest import gemini_prompt, gemini_reply
+
+
+@pytest.fixture
+def extraction_prompts():
+    return []
+
+
+@pytest.fixture
+def service(kag_service, extraction_prompts):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompt = gemini_prompt(request)
+        if "extract key information" in prompt:
+            extraction_prompts.append(prompt)
+        output = prompt.split("Workflow Output:")[-1].strip().splitlines()[0] if "Workflow Output:" in prompt else "ok"
+        text = json.dumps({"summary": output, "facts": [], "reasoning": ""})
+        return httpx.Response(200, json=gemini_reply(text))
+
+    return kag_service(handler)
+
+
+def _seed(service, outputs):
+    for i, output in enumerate(outputs):
+        service.memory.add_memory("sol", f"wf{i}", {"workflow_name": f"W{i}", "summary": output, "facts": []})
+
+
+def test_only_relevant_memories_reach_the_prompt(service, extraction_prompts):
+    _seed(service, [
+        "Revenue grew in Europe thanks to pricing",
+        "Office plants were watered",
+        "Pricing changes lifted revenue margins",
+        "The cafeteria menu changed",
+    ])
+    result = asyncio.run(service.invoke_kag("Forecast revenue after the pricing update", "Forecast", "sol", "wf9"))
+
+    prompt = extraction_prompts[-1]
+    assert "Revenue grew in Europe" in prompt and "Pricing changes lifted" in prompt
+    assert "plants" not in prompt and "cafeteria" not in prompt
+    stats = result["context_stats"]
+    assert stats["candidates"] == 4 and stats["included"] == 2 and stats["pruned"] == 2
+    assert stats["pruned_tokens"] > 0
+
+
+def test_top_k_and_token_budget_bound_the_context(service, monkeypatch):
+    _seed(service, ["Quarterly revenue report about revenue"] * 9)
+
+    monkeypatch.setattr(kag_module, "KAG_CONTEXT_TOP_K", 3)
+    selected, stats = service._rank_context("sol", "revenue report")
+    assert stats["candidates"] == 9 and len(selected) == 3 and stats["pruned"] == 6
+    # Newest memories win ties
+    assert [s[:4] for s in selected] == ["[W8]", "[W7]", "[W6]"]
+
+    monkeypatch.setattr(kag_module, "KAG_CONTEXT_TOP_K", 9)
+    monkeypatch.setattr(kag_module, "KAG_CONTEXT_TOKEN_BUDGET", 30)
+    selected, stats = service._rank_context("sol", "revenue report")
+    assert 0 < len(selected) < 9
+    assert stats["context_tokens"] <= 30
+
+
+def test_no_history_means_no_context(service):
+    result = asyncio.run(service.invoke_kag("First output", "First", "sol", "wf1"))
+    assert result["context_stats"] == {
+        "candidates": 0, "included": 0, "pruned": 0, "context_tokens": 0, "pruned_tokens": 0
+    }
+    assert result["context_available"] is False
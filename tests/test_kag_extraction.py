@@ -0,0 +1,105 @@
+"""
+Tests for single-pass structured KAG extraction with repair parsing.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.gemini_client import EXTRACTION_SCHEMA, GeminiClient, repair_json
+from conftest import gemini_prompt, gemini_reply
+
+
+def _gemini(replies):
+    """Serve canned Gemini texts in order and record the extraction/summary request payloads"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        if "Summarize the following workflow conversation" in gemini_prompt(request):
+            # Background rolling-summary merge, off the extraction path
+            return httpx.Response(200, json=gemini_reply("Merged."))
+        requests.append(payload)
+        text = replies[min(len(requests), len(replies)) - 1]
+        return httpx.Response(200, json=gemini_reply(text))
+
+    return handler, requests
+
+
+@pytest.fixture
+def make_service(kag_service):
+    def make(replies, single_pass=True):
+        handler, requests = _gemini(replies)
+        return kag_service(handler, single_pass=single_pass), requests
+
+    return make
+
+
+STRUCTURED = json.dumps({"summary": "Sales rose.", "facts": ["Sales +8%", "Churn flat"], "reasoning": "Pricing worked."})
+
+
+def test_single_pass_uses_one_schema_constrained_call(make_service):
+    service, requests = make_service([STRUCTURED])
+    result = asyncio.run(service.invoke_kag("sales report", "Sales", "sol", "wf"))
+
+    assert len(requests) == 1
+    config = requests[0]["generationConfig"]
+    assert config["responseMimeType"] == "application/json" and config["responseSchema"] == EXTRACTION_SCHEMA
+    assert result["summary"] == "Sales rose." and result["facts"] == ["Sales +8%", "Churn flat"]
+    assert result["extraction_mode"] == "schema"
+    assert service.memory.get_memories("sol", "wf")[0]["summary"] == "Sales rose."
+
+
+def test_malformed_json_is_repaired(make_service):
+    sloppy = "Here you go:\n```json\n{'summary': 'Sales rose.', 'facts': ['Sales +8%',], 'reasoning': 'ok',}\n```"
+    service, requests = make_service([sloppy])
+    result = asyncio.run(service.invoke_kag("sales report", "Sales", "sol", "wf"))
+    assert len(requests) == 1
+    assert result["extraction_mode"] == "repaired" and result["facts"] == ["Sales +8%"]
+
+
+def test_unstructured_answer_falls_back_to_summary_call(make_service):
+    service, requests = make_service(["Facts:\n- Sales +8%\nReasoning: pricing", "Sales rose 8% on pricing."])
+    result = asyncio.run(service.invoke_kag("sales report", "Sales", "sol", "wf"))
+    assert len(requests) == 2
+    assert result["extraction_mode"] == "text"
+    assert result["summary"] == "Sales rose 8% on pricing."
+
+
+def test_two_pass_mode_keeps_separate_summary(make_service):
+    service, requests = make_service([STRUCTURED, "A separate summary."], single_pass=False)
+    result = asyncio.run(service.invoke_kag("sales report", "Sales", "sol", "wf"))
+    assert len(requests) == 2 and result["summary"] == "A separate summary."
+
+
+def test_repair_json():
+    assert repair_json('prefix {"a": [1, 2,],} suffix') == {"a": [1, 2]}
+    assert repair_json("{“summary”: “x”}") == {"summary": "x"}
+    assert repair_json("no json here") is None
+    assert repair_json("{not: valid") is None
+
+
+def test_rejected_schema_falls_back_to_the_plain_prompt(mock_gemini):
+    configs = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        config = json.loads(request.content)["generationConfig"]
+        configs.append(config)
+        if "responseSchema" in config:
+            return httpx.Response(400, json={"error": {"code": 400, "message": (
+                'Invalid JSON payload received. Unknown name "responseSchema" at \'generation_config\': Cannot find field.')}})
+        text = "```json\n{'summary': 'Sales rose.', 'facts': ['Sales +8%',], 'reasoning': 'ok',}\n```"
+        return httpx.Response(200, json=gemini_reply(text))
+
+    mock_gemini(handler)
+    client = GeminiClient(api_key="test-key")
+
+    async def main():
+        return await client.extract_facts("sales report"), await client.extract_facts("sales report")
+
+    first, second = asyncio.run(main())
+    assert first.parse_mode == "repaired" and first.facts == ["Sales +8%"]
+    assert second.parse_mode == "repaired"
+    # One rejected attempt, then the client stops sending the schema fields
+    assert ["responseSchema" in config for config in configs] == [True, False, False]
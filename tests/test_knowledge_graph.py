@@ -0,0 +1,83 @@
+"""
+Tests for the KAG knowledge graph (SQLite backend) and subgraph retrieval.
+"""
+import asyncio
+import json
+
+import httpx
+
+from app.services.knowledge_graph import KnowledgeGraphManager, SQLiteGraphStore, extract_entities
+from conftest import gemini_prompt, gemini_reply
+
+
+def _manager() -> KnowledgeGraphManager:
+    manager = KnowledgeGraphManager(SQLiteGraphStore(":memory:"))
+    manager.add_facts("sol", "wf1", "Market", [
+        "Acme Corp grew revenue 15% in Europe",
+        "Competitors include Globex and Initech",
+    ])
+    manager.add_facts("sol", "wf2", "Hiring", [
+        "The engineering team hired 12 developers",
+        "Office rent increased in Berlin",
+    ])
+    manager.add_facts("other", "wf1", "Market", ["Acme Corp revenue fell"])
+    return manager
+
+
+def test_entities_keep_named_phrases_and_terms():
+    entities = extract_entities("Acme Corp grew revenues in Europe")
+    assert entities["acme corp"] == "named"
+    assert entities["europe"] == "named"
+    assert entities["revenue"] == "term"
+    assert "in" not in entities
+
+
+def test_subgraph_contains_only_relevant_facts():
+    manager = _manager()
+    subgraph = manager.get_subgraph("sol", "Compare Acme Corp revenue against competitors")
+
+    facts = [f["fact"] for f in subgraph["facts"]]
+    assert facts[0] == "Acme Corp grew revenue 15% in Europe"
+    assert "Competitors include Globex and Initech" in facts
+    assert not any("developers" in fact or "Berlin" in fact for fact in facts)
+    assert "acme corp" in subgraph["seeds"]
+    # Neighbours of the seeds come in through co-occurrence edges
+    assert "europe" in subgraph["entities"]
+    assert any(edge["source"] == "acme corp" or edge["target"] == "acme corp" for edge in subgraph["edges"])
+
+
+def test_unrelated_query_and_cleared_solution_return_nothing():
+    manager = _manager()
+    assert manager.get_subgraph("sol", "quantum chemistry")["facts"] == []
+
+    manager.clear_solution("sol")
+    assert manager.get_related_facts("sol") == []
+    assert manager.get_related_facts("other") == ["Acme Corp revenue fell"]
+
+
+def test_handoff_pulls_related_facts_from_earlier_workflows(kag_service):
+    prompts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompt = gemini_prompt(request)
+        prompts.append(prompt)
+        if "orchestrating communication" in prompt:
+            text = '{"handoff_data": "h", "relevance": "r", "context": "c"}'
+        else:
+            output = prompt.split("Workflow Output:")[-1].strip().splitlines()[0]
+            text = json.dumps({"summary": output, "facts": [output], "reasoning": ""})
+        return httpx.Response(200, json=gemini_reply(text))
+
+    service = kag_service(handler)
+
+    async def main():
+        await service.invoke_kag("Acme Corp pricing is premium", "Pricing", "sol", "wf1")
+        await service.invoke_kag("Office rent increased in Berlin", "Facilities", "sol", "wf2")
+        await service.invoke_kag("Hired 12 developers", "Hiring", "sol", "wf3")
+        return await service.prepare_handoff("wf3", "wf4", "Write the Acme Corp pricing report", "sol")
+
+    handoff = asyncio.run(main())
+    assert handoff["facts"] == ["Hired 12 developers"]
+    assert handoff["graph_context"]["facts"] == ["Acme Corp pricing is premium"]
+    assert "Acme Corp pricing is premium" in prompts[-1]
+    assert "Berlin" not in prompts[-1]
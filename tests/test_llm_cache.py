@@ -0,0 +1,79 @@
+"""
+Tests for the exact-match LLM response cache.
+"""
+import asyncio
+import time
+
+from app.services import llm_cache
+from app.services.llm_cache import LLMResponseCache, make_cache_key
+from app.services.llm_client import LLMClient
+from app.services.metrics_service import MetricsTracker
+
+
+def test_key_normalizes_whitespace_and_role_case():
+    a = make_cache_key("groq", "m", 0, [{"role": "User", "content": "hello   world\n"}])
+    b = make_cache_key("groq", "m", 0, [{"role": "user", "content": "hello world"}])
+    c = make_cache_key("groq", "m", 0.7, [{"role": "user", "content": "hello world"}])
+    assert a == b
+    assert a != c
+
+
+def test_lru_eviction_and_byte_budget():
+    cache = LLMResponseCache(max_entries=2, max_bytes=1000)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")  # a becomes most recently used
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == ("1", 0)
+
+    small = LLMResponseCache(max_entries=10, max_bytes=10)
+    small.set("x", "12345")
+    small.set("y", "67890")
+    small.set("z", "abcde")
+    assert small.get("x") is None
+    assert small.get_stats()["bytes"] <= 10
+
+
+def test_ttl_expiry():
+    cache = LLMResponseCache(ttl_seconds=0.01)
+    cache.set("k", "v")
+    time.sleep(0.02)
+    assert cache.get("k") is None
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    db = str(tmp_path / "llm_cache.db")
+    LLMResponseCache(db_path=db).set("k", "persisted", tokens=42)
+    fresh = LLMResponseCache(db_path=db)
+    assert fresh.get("k") == ("persisted", 42)
+    assert fresh.get_stats()["saved_tokens"] == 42
+
+
+def test_generate_uses_cache_only_at_temperature_zero(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_llm_cache", LLMResponseCache())
+
+    deterministic = LLMClient(provider="mock", temperature=0)
+    first = asyncio.run(deterministic.generate("List three colors", add_to_context=False))
+    assert deterministic.last_cache_status == "miss"
+    second = asyncio.run(deterministic.generate("List three  colors", add_to_context=False))
+    assert deterministic.last_cache_status == "hit"
+    assert first == second
+
+    sampled = LLMClient(provider="mock")
+    asyncio.run(sampled.generate("List three colors", add_to_context=False))
+    assert sampled.last_cache_status is None
+    asyncio.run(sampled.generate("List three colors", add_to_context=False, cache=True))
+    assert sampled.last_cache_status == "miss"
+
+
+def test_metrics_report_hit_ratio_and_saved_tokens():
+    tracker = MetricsTracker()
+    tracker.start()
+    tracker.add_llm_cache_lookup(hit=True, saved_tokens=120)
+    tracker.add_llm_cache_lookup(hit=False)
+    tracker.end()
+    metrics = tracker.calculate_metrics()
+    assert metrics.llm_cache_hits == 1
+    assert metrics.llm_cache_hit_ratio == 50.0
+    assert metrics.llm_cache_saved_tokens == 120
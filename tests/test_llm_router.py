@@ -0,0 +1,95 @@
+"""
+Tests for hedged requests and provider failover.
+"""
+import asyncio
+
+from app.services import llm_client, llm_router
+from app.services.llm_client import LLMClient
+from app.services.llm_router import LLMRouter, parse_targets
+
+PRIMARY = ("groq", "fast")
+SECONDARY = ("anthropic", "backup")
+
+
+def test_parse_targets():
+    assert parse_targets(" anthropic , groq:llama-3.3-70b ,") == [("anthropic", ""), ("groq", "llama-3.3-70b")]
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    router = LLMRouter(min_samples=3, min_hedge_delay=0.01)
+    for _ in range(3):
+        router.health(PRIMARY).record_success(0.02)
+    cancelled = []
+
+    async def call(target):
+        if target == PRIMARY:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(target)
+                raise
+            return "slow", True
+        await asyncio.sleep(0.01)
+        return "fast", True
+
+    async def main():
+        result = await router.complete([PRIMARY, SECONDARY], call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == ("fast", True, SECONDARY)
+    assert cancelled == [PRIMARY]
+    assert router.hedges == 1 and router.hedge_wins == 1
+
+
+def test_no_hedge_without_latency_history():
+    router = LLMRouter(min_samples=3, min_hedge_delay=0.01)
+    calls = []
+
+    async def call(target):
+        calls.append(target)
+        await asyncio.sleep(0.03)
+        return target[0], True
+
+    assert asyncio.run(router.complete([PRIMARY, SECONDARY], call))[2] == PRIMARY
+    assert calls == [PRIMARY]
+
+
+def test_failover_on_error_and_unhealthy_target_moves_back():
+    router = LLMRouter(failure_threshold=2, cooldown_seconds=60)
+
+    async def call(target):
+        if target == PRIMARY:
+            raise RuntimeError("503")
+        return "answer", True
+
+    for _ in range(2):
+        assert asyncio.run(router.complete([PRIMARY, SECONDARY], call)) == ("answer", True, SECONDARY)
+    assert router.failovers == 2
+    assert not router.health(PRIMARY).healthy()
+    assert router.order([PRIMARY, SECONDARY]) == [SECONDARY, PRIMARY]
+
+
+def test_all_targets_failing_returns_last_error():
+    router = LLMRouter()
+
+    async def call(target):
+        return f"[{target[0]}-down]", False
+
+    assert asyncio.run(router.complete([PRIMARY, SECONDARY], call)) == ("[anthropic-down]", False, SECONDARY)
+
+
+def test_client_fails_over_to_configured_provider(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_FALLBACK_PROVIDERS", "anthropic:claude-backup,openai")
+    monkeypatch.setattr(llm_client, "ANTHROPIC_KEY", "test-key")
+    monkeypatch.setattr(llm_router, "_llm_router", LLMRouter())
+    client = LLMClient(provider="groq", model="primary")
+    assert client._targets() == [("groq", "primary"), ("anthropic", "claude-backup")]
+
+    async def call_provider(prompt, provider, model):
+        if provider == "groq":
+            return "AI service returned error 500. Using simplified response.", False
+        return f"{model} says hi", True
+
+    monkeypatch.setattr(client, "_call_provider", call_provider)
+    assert asyncio.run(client.generate("hello", add_to_context=False)) == "claude-backup says hi"
@@ -0,0 +1,48 @@
+"""
+Tests for token streaming in LLMClient and the orchestrator.
+"""
+import asyncio
+
+from app.services.llm_client import LLMClient, _groq_delta, _anthropic_delta
+from app.services.orchestrator import LangGraphOrchestrator
+
+
+async def _collect(client: LLMClient, prompt: str):
+    return [delta async for delta in client.stream(prompt)]
+
+
+def test_mock_stream_matches_generate():
+    """Mock streaming yields deltas that join to the buffered response."""
+    streaming = LLMClient(provider="mock")
+    buffered = LLMClient(provider="mock")
+
+    deltas = asyncio.run(_collect(streaming, "Explain LangGraph streaming"))
+    full = asyncio.run(buffered.generate("Explain LangGraph streaming"))
+
+    assert len(deltas) > 1
+    assert "".join(deltas) == full
+    assert streaming.get_context() == buffered.get_context()
+
+
+def test_sse_delta_parsers():
+    """Groq and Anthropic stream events are reduced to their text deltas."""
+    assert _groq_delta({"choices": [{"delta": {"content": "Hel"}}]}) == "Hel"
+    assert _groq_delta({"choices": [{"delta": {}}]}) == ""
+    assert _anthropic_delta({"type": "content_block_delta", "delta": {"type": "text_delta", "text": "lo"}}) == "lo"
+    assert _anthropic_delta({"type": "message_start", "message": {}}) == ""
+
+
+def test_run_agent_forwards_token_events():
+    """run_agent forwards every delta as a token event for its node."""
+    orch = LangGraphOrchestrator()
+    events = []
+
+    async def on_event(event):
+        events.append(event)
+
+    agent = {"id": "stream-agent", "name": "Streamer", "llm_config": {"provider": "mock"}, "tools": []}
+    result = asyncio.run(orch.run_agent(agent, "Summarize the news", {"messages": []}, node_id="n1", on_event=on_event))
+
+    tokens = [e for e in events if e["type"] == "token"]
+    assert tokens and all(e["node_id"] == "n1" for e in tokens)
+    assert "".join(e["delta"] for e in tokens) == result["llm_response"]
@@ -0,0 +1,56 @@
+"""
+Tests for the persistent (SQLite) KAG memory store.
+"""
+import json
+
+from app.services.kag_service import ConversationMemory
+from app.services.memory_store import SQLiteMemoryStore, create_memory_store, decode_memory, encode_memory
+
+
+def _memory(tmp_path, **kwargs) -> ConversationMemory:
+    return ConversationMemory(store=SQLiteMemoryStore(str(tmp_path / "kag.db")), **kwargs)
+
+
+def test_memories_survive_a_restart(tmp_path):
+    memory = _memory(tmp_path)
+    memory.add_memory("sol", "wf1", {"summary": "first", "facts": ["a"]})
+    memory.add_memory("sol", "wf2", {"summary": "second", "facts": ["b"]})
+
+    restarted = _memory(tmp_path)
+    assert restarted.get_stats()["solutions"] == 0  # nothing loaded until first access
+    assert [m["summary"] for m in restarted.get_memories("sol")] == ["first", "second"]
+    assert restarted.get_latest("sol", "wf2")["facts"] == ["b"]
+
+
+def test_workers_see_each_others_writes_in_order(tmp_path):
+    worker_a, worker_b = _memory(tmp_path), _memory(tmp_path)
+    worker_a.add_memory("sol", "wf1", {"summary": "a1"})
+    assert worker_b.get_latest("sol", "wf1")["summary"] == "a1"
+
+    worker_b.add_memory("sol", "wf2", {"summary": "b1"})
+    worker_a.add_memory("sol", "wf1", {"summary": "a2"})
+    assert [m["summary"] for m in worker_a.get_memories("sol")] == ["a1", "b1", "a2"]
+    assert [m["summary"] for m in worker_b.get_memories("sol")] == ["a1", "b1", "a2"]
+
+
+def test_history_bound_and_clear_apply_to_the_store(tmp_path):
+    memory = _memory(tmp_path, max_history=2)
+    for i in range(4):
+        memory.add_memory("sol", "wf", {"summary": str(i)})
+    memory.add_memory("other", "wf", {"summary": "kept"})
+    assert memory.store.get_stats()["rows"] == 3
+
+    memory.clear_solution("sol")
+    assert _memory(tmp_path).get_memories("sol") == []
+    assert [m["summary"] for m in _memory(tmp_path).get_memories("other")] == ["kept"]
+
+
+def test_encoding_is_compact_and_round_trips():
+    entry = {"summary": "Revenue grew " * 40, "facts": ["Revenue grew 12%"] * 10, "reasoning": ""}
+    data = encode_memory(entry)
+    assert decode_memory(data) == entry
+    assert len(data) < len(json.dumps(entry, indent=2))
+
+
+def test_empty_path_keeps_memory_in_process():
+    assert create_memory_store("") is None
@@ -0,0 +1,106 @@
+"""
+Tests for the offline mock LLM/tool server.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import mock_server
+from app.mock_server import LatencyProfile, MockServerConfig
+from app.services import llm_client
+from app.services.llm_client import LLMClient
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(mock_server, "config", MockServerConfig(
+        llm_latency="fixed:0", search_latency="fixed:0", tokens_per_second=0, completion_tokens=20,
+        error_rate=0, rate_limit_rate=0, requests_per_minute=0, tokens_per_minute=0
+    ))
+    monkeypatch.setattr(mock_server, "_limits", mock_server._Limits())
+    return TestClient(mock_server.app)
+
+
+def test_latency_profiles():
+    assert LatencyProfile("fixed:120").sample() == 0.12
+    assert all(0.01 <= LatencyProfile("uniform:10:20").sample() <= 0.02 for _ in range(20))
+    assert LatencyProfile("lognormal:100:0.5").sample() > 0
+    assert LatencyProfile("fixed:10,tail:1:5").sample() == 0.05
+    with pytest.raises(ValueError):
+        LatencyProfile("gamma:1")
+
+
+def test_openai_compatible_completion(server):
+    r = server.post("/openai/v1/chat/completions", json={
+        "model": "m", "messages": [{"role": "user", "content": "Explain caching"}], "max_tokens": 50
+    })
+    assert r.status_code == 200
+    body = r.json()
+    assert body["choices"][0]["message"]["content"].startswith("[mock-server] Explain caching")
+    assert body["usage"]["completion_tokens"] >= 20
+
+
+def test_openai_stream_reports_usage(server):
+    r = server.post("/openai/v1/chat/completions", json={
+        "model": "m", "messages": [{"role": "user", "content": "hi"}], "stream": True,
+        "stream_options": {"include_usage": True}
+    })
+    events = [line[5:].strip() for line in r.text.splitlines() if line.startswith("data:")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks).startswith("[mock-server] hi")
+    assert chunks[-1]["usage"]["total_tokens"] > 0
+
+
+def test_anthropic_messages(server):
+    r = server.post("/v1/messages", json={
+        "model": "claude", "system": "be brief", "max_tokens": 30,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": "Hello there"}]}]
+    })
+    body = r.json()
+    assert body["content"][0]["text"].startswith("[mock-server] Hello there")
+    assert body["usage"]["input_tokens"] > 0
+
+
+def test_rate_limit_and_error_injection(server):
+    server.post("/mock/config", json={"requests_per_minute": 1})
+    payload = {"model": "m", "messages": [{"role": "user", "content": "x"}]}
+    first = server.post("/openai/v1/chat/completions", json=payload)
+    assert first.headers["x-ratelimit-remaining-requests"] == "0"
+    second = server.post("/openai/v1/chat/completions", json=payload)
+    assert second.status_code == 429
+    assert float(second.headers["retry-after"]) > 0
+
+    server.post("/mock/config", json={"requests_per_minute": 0, "error_rate": 1.0})
+    assert server.post("/openai/v1/chat/completions", json=payload).status_code == 500
+    assert server.get("/mock/stats").json()["errors_injected"] >= 1
+    assert server.post("/mock/config", json={"llm_latency": "bogus:1"}).status_code == 400
+
+
+def test_search_endpoints(server):
+    results = server.get("/search", params={"q": "python asyncio", "max_results": 3}).json()["results"]
+    assert len(results) == 3 and {"title", "href", "body"} <= set(results[0])
+    instant = server.get("/ddg", params={"q": "python"}).json()
+    assert instant["AbstractText"] and instant["RelatedTopics"]
+
+
+def test_llm_client_against_mock_server(server, monkeypatch):
+    transport = httpx.ASGITransport(app=mock_server.app)
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs))
+    monkeypatch.setattr(llm_client, "GROQ_KEY", "mock")
+    monkeypatch.setattr(llm_client, "GROQ_CHAT_URL", "http://mock/openai/v1/chat/completions")
+
+    client = LLMClient(provider="groq", model="mock-model")
+    result = asyncio.run(client.generate("Summarize the plan", add_to_context=False))
+    assert result.startswith("[mock-server] Summarize the plan")
+    assert result.usage_source == "provider"
+
+    async def consume():
+        return "".join([d async for d in client.stream("Stream it", add_to_context=False)])
+
+    assert asyncio.run(consume()).startswith("[mock-server] Stream it")
+    assert client.last_result.usage_source == "provider"
@@ -0,0 +1,93 @@
+"""
+Tests for per-agent llm_config and model tier policies.
+"""
+import asyncio
+
+from app.services.model_tiers import resolve_llm_config, tier_for
+from app.services.orchestrator import LangGraphOrchestrator
+
+AGENT_CONFIG = {"provider": "groq", "model": "llama-3.1-8b-instant", "temperature": 0.5, "max_tokens": 1024}
+SAMPLING_CONFIG = {"temperature": 0.5, "max_tokens": 1024}
+
+
+def test_agent_llm_config_is_honored():
+    assert resolve_llm_config(AGENT_CONFIG) == AGENT_CONFIG
+    assert resolve_llm_config({}) == {}
+    assert resolve_llm_config({"temperature": "0", "max_tokens": "64"}) == {"temperature": 0.0, "max_tokens": 64}
+
+
+def test_step_kind_selects_tier(monkeypatch):
+    monkeypatch.delenv("LLM_PROVIDER", raising=False)
+    assert tier_for("routing") == "small"
+    assert tier_for("Reasoning") == "large"
+    assert tier_for("large") == "large"
+    assert tier_for("unknown") is None
+
+    routing = resolve_llm_config(SAMPLING_CONFIG, step_kind="routing")
+    assert routing["model"] == "llama-3.1-8b-instant" and routing["tier"] == "small"
+    reasoning = resolve_llm_config(SAMPLING_CONFIG, step_kind="reasoning")
+    assert reasoning["provider"] == "groq" and reasoning["model"] == "llama-3.3-70b-versatile"
+    # Sampling settings still come from the agent
+    assert reasoning["temperature"] == 0.5 and reasoning["max_tokens"] == 1024
+    # An explicit model is never replaced by a tier
+    assert resolve_llm_config(AGENT_CONFIG, step_kind="reasoning") == AGENT_CONFIG
+
+
+def test_tiers_follow_the_configured_provider(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "anthropic")
+    routing = resolve_llm_config({}, step_kind="routing")
+    assert (routing["provider"], routing["model"]) == ("anthropic", "claude-haiku-4.5")
+
+    # An agent that chose its provider stays on it, with that provider's tier model
+    monkeypatch.setenv("LLM_PROVIDER", "groq")
+    agent = resolve_llm_config({"provider": "anthropic"}, step_kind="reasoning")
+    assert (agent["provider"], agent["model"], agent["tier"]) == ("anthropic", "claude-sonnet-4.5", "large")
+    # Providers without tier models keep their own default model
+    assert resolve_llm_config({"provider": "mock"}, step_kind="routing") == {"provider": "mock"}
+
+
+def test_agent_level_tier_and_env_overrides(monkeypatch):
+    monkeypatch.setenv("LLM_SMALL_PROVIDER", "anthropic")
+    monkeypatch.setenv("LLM_SMALL_MODEL", "claude-haiku")
+    monkeypatch.setenv("LLM_TIER_POLICY", '{"triage": "small"}')
+    assert resolve_llm_config({"tier": "small"})["model"] == "claude-haiku"
+    assert resolve_llm_config({}, step_kind="triage")["provider"] == "anthropic"
+    # The override model belongs to anthropic, so a groq agent keeps groq's small model
+    settings = resolve_llm_config({"provider": "groq"}, step_kind="triage")
+    assert (settings["provider"], settings["model"]) == ("groq", "llama-3.1-8b-instant")
+    # The node's step kind wins over the agent's own tier
+    assert resolve_llm_config({"tier": "small"}, step_kind="planning")["tier"] == "large"
+
+
+def test_orchestrator_configures_agent_clients():
+    orchestrator = LangGraphOrchestrator()
+    client = orchestrator.get_agent_llm("writer", {"provider": "mock", "model": "m1", "temperature": 0.1, "max_tokens": 50},
+                                        scope_id="tiers-run")
+    assert (client.provider, client.model, client.temperature, client.max_tokens) == ("mock", "m1", 0.1, 50)
+    client.add_to_context("user", "remember me")
+
+    # A later step gets a new client with its own settings but the same scoped context
+    later = orchestrator.get_agent_llm("writer", {"model": "m2"}, scope_id="tiers-run")
+    assert later is not client
+    assert later.model == "m2" and later.temperature == 0.7
+    assert later.get_context()[0]["content"] == "remember me"
+
+
+def test_run_agent_uses_step_tier(monkeypatch):
+    monkeypatch.setenv("LLM_LARGE_PROVIDER", "mock")
+    monkeypatch.setenv("LLM_LARGE_MODEL", "big-model")
+    orchestrator = LangGraphOrchestrator()
+    agent = {"id": "thinker", "name": "Thinker", "llm_config": {"temperature": 0.2}, "tools": []}
+    pinned = {"id": "pinned", "name": "Pinned", "llm_config": {"provider": "mock", "model": "tiny"}, "tools": []}
+    models = []
+    get_agent_llm = orchestrator.get_agent_llm
+
+    def recording_get_agent_llm(agent_id, settings=None, scope_id=None, system_prompt=None):
+        client = get_agent_llm(agent_id, settings, scope_id, system_prompt)
+        models.append(client.model)
+        return client
+
+    monkeypatch.setattr(orchestrator, "get_agent_llm", recording_get_agent_llm)
+    asyncio.run(orchestrator.run_agent(agent, "Plan the migration", {"messages": []}, step_kind="planning"))
+    asyncio.run(orchestrator.run_agent(pinned, "Plan the migration", {"messages": []}, step_kind="planning"))
+    assert models == ["big-model", "tiny"]
@@ -0,0 +1,120 @@
+"""
+Tests for prompt-prefix caching: stable-first requests, cache_control marking
+and the mock server's simulated prompt cache.
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import mock_server
+from app.mock_server import MockServerConfig
+from app.services import llm_client
+from app.services.llm_client import LLMClient
+from app.services.metrics_service import create_metrics_tracker
+
+SYSTEM_PROMPT = "You are a meticulous portfolio analyst. " * 20
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(mock_server, "config", MockServerConfig(
+        llm_latency="fixed:0", search_latency="fixed:0", tokens_per_second=0, completion_tokens=20,
+        error_rate=0, rate_limit_rate=0, requests_per_minute=0, tokens_per_minute=0, prompt_cache_min_tokens=50
+    ))
+    monkeypatch.setattr(mock_server, "_limits", mock_server._Limits())
+    monkeypatch.setattr(mock_server, "_prompt_cache", mock_server._PromptCache())
+    return TestClient(mock_server.app)
+
+
+@pytest.fixture
+def mock_transport(server, monkeypatch):
+    transport = httpx.ASGITransport(app=mock_server.app)
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: real_client(transport=transport, **kwargs))
+
+
+def test_requests_are_ordered_stable_first():
+    client = LLMClient(provider="groq", system_prompt=SYSTEM_PROMPT)
+    client.add_to_context("user", "earlier question")
+    client.add_to_context("assistant", "earlier answer")
+
+    messages = client._groq_messages("new question")
+    assert messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert [m["content"] for m in messages[1:]] == ["earlier question", "earlier answer", "new question"]
+    assert client._groq_messages("new question", history=False)[0]["content"] == SYSTEM_PROMPT
+
+
+def test_anthropic_system_prefix_is_marked(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_PROMPT_CACHE_MIN_TOKENS", 50)
+    payload = LLMClient(provider="anthropic", system_prompt=SYSTEM_PROMPT)._anthropic_payload("claude", "hi")
+    assert payload["system"] == [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+    assert payload["messages"] == [{"role": "user", "content": "hi"}]
+
+    short = LLMClient(provider="anthropic", system_prompt="Be brief.")._anthropic_payload("claude", "hi")
+    assert short["system"] == [{"type": "text", "text": "Be brief."}]
+    monkeypatch.setattr(llm_client, "LLM_PROMPT_CACHE", False)
+    assert "cache_control" not in LLMClient(provider="anthropic", system_prompt=SYSTEM_PROMPT)._anthropic_payload("c", "hi")["system"][0]
+
+
+def test_system_prompt_is_part_of_cache_identity():
+    first = LLMClient(provider="mock", temperature=0, system_prompt="A")
+    second = LLMClient(provider="mock", temperature=0, system_prompt="B")
+    assert first._cache_key("same", None) != second._cache_key("same", None)
+
+
+def test_mock_server_simulates_openai_prefix_cache(server):
+    payload = {"model": "m", "messages": [{"role": "system", "content": SYSTEM_PROMPT},
+                                          {"role": "user", "content": "first"}]}
+    first = server.post("/openai/v1/chat/completions", json=payload).json()["usage"]
+    assert first["prompt_tokens_details"]["cached_tokens"] == 0
+
+    payload["messages"][1]["content"] = "second"
+    second = server.post("/openai/v1/chat/completions", json=payload).json()["usage"]
+    assert 0 < second["prompt_tokens_details"]["cached_tokens"] < second["prompt_tokens"]
+    assert server.get("/mock/stats").json()["prompt_cache_hits"] == 1
+
+
+def test_mock_server_simulates_anthropic_cache_control(server):
+    system = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+    payload = {"model": "claude", "system": system, "max_tokens": 20, "messages": [{"role": "user", "content": "first"}]}
+    first = server.post("/v1/messages", json=payload).json()["usage"]
+    assert first["cache_creation_input_tokens"] > 0 and first["cache_read_input_tokens"] == 0
+
+    payload["messages"][0]["content"] = "second"
+    second = server.post("/v1/messages", json=payload).json()["usage"]
+    assert second["cache_read_input_tokens"] == first["cache_creation_input_tokens"]
+    assert second["cache_creation_input_tokens"] == 0
+
+    # Without a breakpoint nothing is cached
+    payload["system"] = SYSTEM_PROMPT
+    plain = server.post("/v1/messages", json=payload).json()["usage"]
+    assert plain["cache_read_input_tokens"] == plain["cache_creation_input_tokens"] == 0
+
+
+def test_cached_tokens_reach_results_and_metrics(mock_transport, monkeypatch):
+    monkeypatch.setattr(llm_client, "ANTHROPIC_KEY", "mock")
+    monkeypatch.setattr(llm_client, "ANTHROPIC_MESSAGES_URL", "http://mock/v1/messages")
+    monkeypatch.setattr(llm_client, "LLM_PROMPT_CACHE_MIN_TOKENS", 50)
+
+    async def two_steps():
+        results = []
+        for task in ("Review holding A", "Review holding B"):
+            client = LLMClient(provider="anthropic", model="claude-mock", system_prompt=SYSTEM_PROMPT)
+            results.append(await client.generate(task, add_to_context=False))
+        return results
+
+    first, second = asyncio.run(two_steps())
+    assert first.cache_write_tokens > 0 and first.cached_tokens == 0
+    assert second.cached_tokens == first.cache_write_tokens and second.cache_write_tokens == 0
+    assert second.prompt_tokens > second.cached_tokens
+
+    tracker = create_metrics_tracker()
+    for result in (first, second):
+        tracker.add_token_usage(result.prompt_tokens, result.completion_tokens,
+                                cached_tokens=result.cached_tokens, cache_write_tokens=result.cache_write_tokens)
+    metrics = tracker.calculate_metrics()
+    assert metrics.token_cached_count == second.cached_tokens
+    assert metrics.token_cache_write_count == first.cache_write_tokens
+    assert 0 < metrics.prompt_cache_hit_ratio < 100
@@ -0,0 +1,163 @@
+"""
+Tests for the incremental inverted index behind AgenticRAGService retrieval.
+"""
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from app.services.agentic_rag_service import AgenticRAGService
+from app.services import rag_index as rag_index_module
+from app.services.rag_index import BM25Index, InvertedIndex, VectorIndex, create_index
+
+WORDS = ["revenue", "pricing", "market", "growth", "churn", "hiring", "budget", "europe",
+         "customer", "product", "launch", "margin", "forecast", "competitor", "survey"]
+
+
+def _corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))) for _ in range(n)]
+
+
+def _brute_force(rag, chunks, query, top_k=3):
+    """Full TF-IDF recomputation with the same corpus-only idf"""
+    vectors, idf = rag._compute_tfidf(chunks)
+    terms = Counter(rag._tokenize(query))
+    total = sum(terms.values())
+    query_vector = {t: c / total * idf.get(t, math.log(len(chunks)) + 1) for t, c in terms.items()}
+    scores = [(i, rag._cosine_similarity(query_vector, v)) for i, v in enumerate(vectors)]
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return [s for s in scores if s[1] > 0][:top_k]
+
+
+@pytest.mark.parametrize("query", ["revenue growth in europe", "churn survey", "pricing pricing margin launch"])
+def test_index_matches_brute_force_tfidf(query):
+    rag = AgenticRAGService()
+    chunks = _corpus(200)
+    index = InvertedIndex(rag._tokenize)
+    for start in range(0, len(chunks), 25):
+        index.add(chunks[start:start + 25], {"workflow_id": "wf", "workflow_name": "W"})
+
+    expected = _brute_force(rag, chunks, query, top_k=5)
+    actual = index.search(query, top_k=5)
+    assert [i for i, _ in actual] == [i for i, _ in expected]
+    assert [s for _, s in actual] == pytest.approx([s for _, s in expected])
+
+
+def test_query_touches_only_its_own_postings():
+    rag = AgenticRAGService()
+    index = InvertedIndex(rag._tokenize)
+    index.add(["alpha beta", "gamma delta", "alpha gamma"], {"workflow_id": "wf", "workflow_name": "W"})
+
+    assert sorted(i for i, _ in index.search("alpha", top_k=5)) == [0, 2]
+    assert index.search("unknown words", top_k=5) == []
+    assert index.df["alpha"] == 2 and len(index.postings["gamma"]) == 2
+
+
+def test_agent_memory_uses_the_index_updated_on_store():
+    rag = AgenticRAGService()
+    rag.store_workflow_output("sol", "wf1", "Market", "European market revenue grew with new pricing.")
+    rag.store_workflow_output("sol", "wf2", "Hiring", "The engineering team hired twelve developers.")
+
+    memory = rag.initialize_agent_memory("sol", "wf3", "agent", "Plan pricing for the european market")
+    assert memory["retrieved_context"]["total_chunks_searched"] == 2
+    assert [fact["source"] for fact in memory["relevant_facts"]] == ["Market"]
+
+    rag.clear_solution_memory("sol")
+    assert "solution_sol" not in rag.indexes
+
+
+def test_vector_index_ranks_like_the_inverted_index():
+    pytest.importorskip("scipy")
+    rag = AgenticRAGService()
+    chunks = _corpus(300, seed=1) + ["revenue growth"] * 4 + [""]
+    queries = ["revenue growth in europe", "churn survey", "unknown pricing words", "", "the and"]
+    inverted, vectorized = InvertedIndex(rag._tokenize), VectorIndex(rag._tokenize)
+    for start in range(0, len(chunks), 40):
+        for index in (inverted, vectorized):
+            index.add(chunks[start:start + 40], {"workflow_id": "wf", "workflow_name": "W"})
+        for query in queries:
+            expected = inverted.search(query, top_k=3)
+            actual = vectorized.search(query, top_k=3)
+            assert [i for i, _ in actual] == [i for i, _ in expected]
+            assert [s for _, s in actual] == pytest.approx([s for _, s in expected])
+
+    # Batch scoring returns the same hits as one query at a time
+    assert vectorized.search_many(queries, top_k=5, min_score=0.1) == [
+        vectorized.search(query, top_k=5, min_score=0.1) for query in queries
+    ]
+
+
+def test_create_index_falls_back_without_numpy(monkeypatch):
+    rag = AgenticRAGService()
+    monkeypatch.setattr(rag_index_module, "NUMPY_AVAILABLE", False)
+    assert isinstance(create_index(rag._tokenize), InvertedIndex)
+    monkeypatch.setattr(rag_index_module, "NUMPY_AVAILABLE", True)
+    monkeypatch.setattr(rag_index_module, "RAG_VECTORIZED", False)
+    assert isinstance(create_index(rag._tokenize), InvertedIndex)
+
+
+def _brute_force_bm25(index, query, top_k, k1=1.2, b=0.75, delta=0.0):
+    """Score every chunk"""
+    terms = Counter(t for t in index._tokenize(query) if t in index.postings)
+    average_length = index.total_length / len(index)
+    scores = Counter()
+    for term, query_count in terms.items():
+        weight = query_count * index.idf(term)
+        for chunk_id, count in zip(*index.postings[term]):
+            norm = k1 * (1 - b + b * index.lengths[chunk_id] / average_length)
+            scores[chunk_id] += weight * (count * (k1 + 1) / (count + norm) + delta)
+    return sorted(scores.items(), key=lambda s: (-s[1], s[0]))[:top_k]
+
+
+@pytest.mark.parametrize("params", [{}, {"k1": 2.0, "b": 0.3}, {"delta": 1.0}])
+def test_bm25_early_termination_matches_exhaustive_scoring(params):
+    rag = AgenticRAGService()
+    chunks = _corpus(600, seed=2) + ["revenue growth"] * 5 + ["churn"]
+    index = BM25Index(rag._tokenize)
+    for start in range(0, len(chunks), 50):
+        index.add(chunks[start:start + 50], {"workflow_id": "wf", "workflow_name": "W"})
+
+    for query in ["revenue growth in europe", "churn survey churn", "pricing", "nothing here"]:
+        expected = _brute_force_bm25(index, query, 5, **{"k1": 1.2, "b": 0.75, **params})
+        actual = index.search(query, top_k=5, **params)
+        assert [i for i, _ in actual] == [i for i, _ in expected]
+        assert [s for _, s in actual] == pytest.approx([s for _, s in expected])
+
+
+def test_bm25_skips_chunks_that_cannot_reach_the_top_k():
+    rag = AgenticRAGService()
+    # A rare, decisive term and a common one that matches every chunk
+    index = BM25Index(rag._tokenize)
+    chunks = [f"market report {i}" for i in range(2000)]
+    chunks.insert(50, "market quantum breakthrough")
+    index.add(chunks, {"workflow_id": "wf", "workflow_name": "W"})
+
+    hits = index.search("quantum market", top_k=1)
+    assert hits[0][0] == 50
+    # Once it is found, "market" alone cannot beat it and its postings are skipped
+    assert index.last_scored == 51
+
+
+def test_solution_config_selects_bm25_ranking():
+    rag = AgenticRAGService()
+    rag.store_workflow_output("sol", "wf1", "Market", "European market revenue grew with new pricing. " * 5)
+    rag.store_workflow_output("sol", "wf2", "Hiring", "The engineering team hired twelve developers.")
+
+    default = rag.initialize_agent_memory("sol", "wf3", "agent", "pricing")
+    assert default["retrieved_context"]["retrieval_method"] == "tfidf_cosine"
+
+    config = {"ranking": "bm25", "bm25_k1": 1.5, "bm25_b": 0.5}
+    memory = rag.initialize_agent_memory("sol", "wf3", "agent", "pricing", communication_config=config)
+    assert memory["retrieved_context"]["retrieval_method"] == "bm25"
+    assert [fact["source"] for fact in memory["relevant_facts"]] == ["Market"]
+
+    # The BM25 index follows later outputs too
+    rag.store_workflow_output("sol", "wf3", "Pricing", "Pricing tiers for developers")
+    memory = rag.initialize_agent_memory("sol", "wf4", "agent", "developers", communication_config=config)
+    assert memory["retrieved_context"]["total_chunks_searched"] == 3
+    assert {fact["source"] for fact in memory["relevant_facts"]} == {"Hiring", "Pricing"}
+
+    rag.clear_solution_memory("sol")
+    assert "solution_sol" not in rag.bm25_indexes
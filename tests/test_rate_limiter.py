@@ -0,0 +1,155 @@
+"""
+Tests for the provider rate-limit governor.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from app.services import llm_client, rate_limiter
+from app.services.tokenizer import count_message_tokens, count_tokens
+from app.services.rate_limiter import (
+    RateLimitGovernor, TokenBucket, backoff_delay, get_governor, parse_duration
+)
+
+
+def test_parse_duration_formats():
+    assert parse_duration("12") == 12.0
+    assert parse_duration("7.66s") == 7.66
+    assert abs(parse_duration("2m59.56s") - 179.56) < 1e-9
+    assert parse_duration("120ms") == 0.12
+    assert parse_duration(None) is None
+    assert parse_duration("soon") is None
+
+    reset = (datetime.now(timezone.utc) + timedelta(seconds=30)).isoformat().replace("+00:00", "Z")
+    assert 25 < parse_duration(reset) <= 30
+
+
+def test_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+    assert bucket.wait_time(10) == 0
+    bucket.consume(10)
+    assert 1.9 < bucket.wait_time(10) <= 2.0
+
+
+def test_headers_block_until_reset():
+    governor = RateLimitGovernor(requests_per_minute=30, tokens_per_minute=6000)
+    governor.update_from_headers({
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "2s",
+        "x-ratelimit-remaining-tokens": "5000",
+    })
+    assert governor.wait_time(100) > 1.5
+    assert governor.tokens.tokens < 5001
+
+
+def test_retry_after_pauses_governor():
+    governor = RateLimitGovernor(requests_per_minute=30, tokens_per_minute=6000)
+    governor.throttled({"retry-after": "3"})
+    assert governor.throttled_responses == 1
+    assert 2.5 < governor.wait_time(1) <= 3
+
+
+def test_acquire_delays_once_budget_is_spent():
+    governor = RateLimitGovernor(requests_per_minute=600, tokens_per_minute=600)
+
+    async def main():
+        await governor.acquire(600)
+        start = time.monotonic()
+        await governor.acquire(5)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.4
+    assert governor.get_stats()["total_requests"] == 2
+
+
+def test_record_usage_refunds_overestimate():
+    governor = RateLimitGovernor(requests_per_minute=30, tokens_per_minute=1000)
+    governor.tokens.consume(800)
+    governor.record_usage(actual_tokens=300, estimated_tokens=800)
+    assert governor.tokens.tokens >= 700
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "LLM_BACKOFF_CAP", 2.0)
+    assert all(0 <= backoff_delay(attempt) <= 2.0 for attempt in range(10))
+
+
+def test_governors_are_per_provider_and_model(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_governors", {})
+    monkeypatch.setenv("GROQ_TPM_LIMIT", "1234")
+    groq = get_governor("groq", "llama")
+    assert groq is get_governor("groq", "llama")
+    assert groq is not get_governor("groq", "other")
+    assert groq.tokens.capacity == 1234
+    assert get_governor("anthropic", "claude").requests.capacity == 50
+
+
+def _mock_http(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(llm_client, "_http_client", lambda: client)
+
+
+def test_retries_do_not_stack_reservations(monkeypatch):
+    governor = RateLimitGovernor(requests_per_minute=600, tokens_per_minute=6000)
+    monkeypatch.setattr(llm_client, "get_governor", lambda provider, model: governor)
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0)
+    statuses = [429, 429, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        if status != 200:
+            return httpx.Response(status)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}],
+                                         "usage": {"prompt_tokens": 20, "completion_tokens": 10}})
+
+    _mock_http(monkeypatch, handler)
+    payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 1000}
+    asyncio.run(llm_client._post_request("groq", "https://llm.test/chat", payload, {}))
+    assert governor.throttled_responses == 2
+    # Only the successful attempt's real usage is spent
+    assert 5960 <= governor.tokens.tokens <= 6000 - 30 + 5
+
+
+def test_streamed_usage_is_recorded(monkeypatch):
+    governor = RateLimitGovernor(requests_per_minute=600, tokens_per_minute=6000)
+    body = "\n".join([
+        'data: {"choices": [{"delta": {"content": "Hel"}}]}',
+        'data: {"choices": [{"delta": {"content": "lo"}}], "x_groq": {"usage": {"prompt_tokens": 15, "completion_tokens": 10}}}',
+        "data: [DONE]",
+    ])
+    _mock_http(monkeypatch, lambda request: httpx.Response(200, text=body))
+    payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 1000}
+
+    async def main():
+        usage = {}
+        deltas = [d async for d in llm_client._sse_deltas("https://llm.test/chat", payload, {}, llm_client._groq_delta, governor, usage)]
+        return deltas, usage
+
+    deltas, usage = asyncio.run(main())
+    assert "".join(deltas) == "Hello" and usage["completion_tokens"] == 10
+    assert 5970 <= governor.tokens.tokens <= 6000 - 25 + 5
+
+    # A rejected stream gives its whole reservation back
+    _mock_http(monkeypatch, lambda request: httpx.Response(400))
+
+    async def rejected():
+        try:
+            async for _ in llm_client._sse_deltas("https://llm.test/chat", payload, {}, llm_client._groq_delta, governor):
+                pass
+        except httpx.HTTPStatusError:
+            return True
+
+    assert asyncio.run(rejected())
+    assert governor.tokens.tokens >= 5970
+
+
+def test_reservation_counts_the_anthropic_system_prompt():
+    system_prompt = "You review pull requests for correctness and style. " * 150
+    client = llm_client.LLMClient(provider="anthropic", max_tokens=100, system_prompt=system_prompt)
+    payload = client._anthropic_payload("claude-sonnet-4.5", "Review this diff")
+
+    estimated = llm_client._estimate_request_tokens(payload)
+    assert count_tokens(system_prompt) >= 1024
+    assert estimated == count_tokens(system_prompt) + count_message_tokens(payload["messages"]) + 100
@@ -0,0 +1,117 @@
+"""
+Tests for the incrementally maintained KAG solution summary.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services import kag_service as kag_module
+from conftest import gemini_prompt, gemini_reply
+
+
+@pytest.fixture
+def summary_prompts():
+    return []
+
+
+@pytest.fixture
+def service(kag_service, summary_prompts):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompt = gemini_prompt(request)
+        if "Summarize the following workflow conversation" in prompt:
+            summary_prompts.append(prompt)
+            await asyncio.sleep(0.05)
+            text = f"Rolling summary {len(summary_prompts)}"
+        else:
+            output = prompt.split("Workflow Output:")[-1].strip().splitlines()[0]
+            text = json.dumps({"summary": output, "facts": [output], "reasoning": ""})
+        return httpx.Response(200, json=gemini_reply(text))
+
+    return kag_service(handler)
+
+
+def test_new_memories_are_merged_into_the_cached_summary(service, summary_prompts):
+    async def main():
+        await service.invoke_kag("Market grew", "Market", "sol", "wf1")
+        first = await service.get_solution_summary("sol", wait=True)
+        await service.invoke_kag("Costs fell", "Costs", "sol", "wf2")
+        second = await service.get_solution_summary("sol", wait=True)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first["overall_context"] == "Rolling summary 1"
+    assert second["overall_context"] == "Rolling summary 2"
+    assert second["summary_stale"] is False and second["pending_memories"] == 0
+    assert second["total_workflows"] == 2
+
+    # The second merge sends the previous summary and only the new workflow
+    assert "Rolling summary 1" in summary_prompts[1]
+    assert "Costs: Costs fell" in summary_prompts[1]
+    assert "Market: Market grew" not in summary_prompts[1]
+
+
+def test_reading_the_summary_does_not_call_gemini(service, summary_prompts):
+    async def main():
+        await service.invoke_kag("Market grew", "Market", "sol", "wf1")
+        stale = await service.get_solution_summary("sol")
+        await service.get_solution_summary("sol", wait=True)
+        reads = [await service.get_solution_summary("sol") for _ in range(5)]
+        return stale, reads
+
+    stale, reads = asyncio.run(main())
+    assert stale["summary_stale"] is True and stale["pending_memories"] == 1
+    assert stale["overall_context"] == ""
+    assert all(r["overall_context"] == "Rolling summary 1" and not r["summary_stale"] for r in reads)
+    assert len(summary_prompts) == 1
+
+
+def test_memories_added_during_a_merge_are_coalesced(service, summary_prompts):
+    async def main():
+        await asyncio.gather(*(service.invoke_kag(f"Output {i}", f"W{i}", "sol", f"wf{i}") for i in range(4)))
+        return await service.get_solution_summary("sol", wait=True)
+
+    summary = asyncio.run(main())
+    assert summary["summary_stale"] is False
+    assert len(summary_prompts) < 4
+
+
+def test_clearing_memory_drops_the_summary(service):
+    async def main():
+        await service.invoke_kag("Market grew", "Market", "sol", "wf1")
+        await service.get_solution_summary("sol", wait=True)
+        service.clear_solution_memory("sol")
+        return await service.get_solution_summary("sol")
+
+    summary = asyncio.run(main())
+    assert summary["overall_context"] == "" and summary["total_workflows"] == 0
+
+
+def test_failed_merge_is_not_retried_on_every_read(service, summary_prompts, monkeypatch):
+    calls = []
+
+    async def failing_summary(messages, workflow_context):
+        calls.append(workflow_context)
+        return ""
+
+    async def main():
+        await service.invoke_kag("Market grew", "Market", "sol", "wf1")
+        good = await service.get_solution_summary("sol", wait=True)
+        monkeypatch.setattr(service.gemini_client, "summarize_conversation", failing_summary)
+        await service.invoke_kag("Costs fell", "Costs", "sol", "wf2")
+        reads = [await service.get_solution_summary("sol", wait=True) for _ in range(5)]
+
+        # Once the backoff has passed, the next read merges again
+        monkeypatch.delattr(service.gemini_client, "summarize_conversation")
+        monkeypatch.setattr(kag_module, "KAG_SUMMARY_RETRY_SECONDS", 0)
+        retried = await service.get_solution_summary("sol", wait=True)
+        return good, reads, retried
+
+    good, reads, retried = asyncio.run(main())
+    # The stale summary is served with the error while the merge backs off
+    assert len(calls) == 1
+    assert all(r["overall_context"] == good["overall_context"] for r in reads)
+    assert all(r["summary_stale"] and r["summary_error"] == "Summary merge failed" for r in reads)
+    assert retried["overall_context"] == "Rolling summary 2"
+    assert retried["summary_stale"] is False and retried["summary_error"] is None
@@ -0,0 +1,54 @@
+"""
+Tests for the semantic near-duplicate prompt cache.
+"""
+import asyncio
+
+from app.services import llm_cache, semantic_cache
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_client import LLMClient
+from app.services.semantic_cache import SemanticLLMCache, make_scope_key
+
+
+def test_paraphrase_hits_above_threshold():
+    cache = SemanticLLMCache(threshold=0.6)
+    scope = make_scope_key("support-agent", "groq", "m", [])
+    cache.set(scope, "How do I reset my account password today?", "Use the reset link.", tokens=30)
+
+    hit = cache.get(scope, "how can I reset my account password?")
+    assert hit is not None
+    assert hit[0] == "Use the reset link."
+    assert hit[2] >= 0.6
+
+    assert cache.get(scope, "What are your office opening hours in Berlin?") is None
+
+
+def test_scope_isolates_templates_and_history():
+    cache = SemanticLLMCache(threshold=0.5)
+    prompt = "Summarize the quarterly revenue report please"
+    cache.set(make_scope_key("agent-a", "groq", "m", []), prompt, "A")
+
+    assert cache.get(make_scope_key("agent-b", "groq", "m", []), prompt) is None
+    history = [{"role": "user", "content": "earlier turn"}]
+    assert cache.get(make_scope_key("agent-a", "groq", "m", history), prompt) is None
+
+
+def test_prompt_length_guard_rails():
+    cache = SemanticLLMCache(min_prompt_chars=10, max_prompt_chars=50)
+    scope = make_scope_key("t", "groq", "m", [])
+    cache.set(scope, "short", "x")
+    cache.set(scope, "y" * 60, "x")
+    assert cache.get_stats()["entries"] == 0
+    assert cache.get(scope, "short") is None
+    assert cache.get_stats()["skipped"] == 1
+
+
+def test_generate_serves_semantic_hit(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_llm_cache", LLMResponseCache(enabled=False))
+    monkeypatch.setattr(semantic_cache, "_semantic_cache", SemanticLLMCache(threshold=0.6))
+
+    client = LLMClient(provider="mock")
+    first = asyncio.run(client.generate("Explain the refund policy for annual plans", add_to_context=False, semantic_scope="faq"))
+    assert client.last_cache_status == "miss"
+    second = asyncio.run(client.generate("Explain refund policy for the annual plans", add_to_context=False, semantic_scope="faq"))
+    assert client.last_cache_status == "semantic_hit"
+    assert second == first
@@ -0,0 +1,108 @@
+"""
+Tests for single-flight coalescing of identical concurrent calls.
+"""
+import asyncio
+
+import pytest
+
+from app.services import single_flight
+from app.services.single_flight import SingleFlight, get_single_flight
+from app.services.llm_client import LLMClient
+from app.services.tool_orchestrator import ToolOrchestrator
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.get_stats()["coalesced"] == 4
+    assert flight.in_flight() == 0
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("provider down")
+
+    async def main():
+        return await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.errors == 1
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 42
+
+
+def test_shared_work_cancelled_when_all_waiters_leave():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(1)
+        finished.append(True)
+
+    async def main():
+        waiter = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert not finished
+    assert flight.cancelled == 1
+
+
+def test_identical_llm_prompts_coalesce(monkeypatch):
+    monkeypatch.setattr(single_flight, "_groups", {})
+
+    async def main():
+        clients = [LLMClient(provider="mock") for _ in range(3)]
+        responses = await asyncio.gather(*[c.generate("Same question", add_to_context=False) for c in clients])
+        assert [c.last_coalesced for c in clients].count(True) == 2
+        return responses
+
+    responses = asyncio.run(main())
+    assert len(set(responses)) == 1
+    assert get_single_flight("llm").coalesced == 2
+    # Only the leader reports the provider call's tokens
+    assert sorted(r.usage_source for r in responses) == ["coalesced", "coalesced", "estimate"]
+    assert sum(r.total_tokens for r in responses) == max(r.total_tokens for r in responses) > 0
+
+
+def test_only_idempotent_tools_coalesce():
+    orchestrator = ToolOrchestrator()
+    assert orchestrator._is_idempotent({"type": "websearch"})
+    assert orchestrator._is_idempotent({"type": "api", "config": {"url": "https://x", "method": "GET"}})
+    assert orchestrator._is_idempotent({"type": "api", "config": {"api": {"method": "get"}}})
+    assert not orchestrator._is_idempotent({"type": "api", "config": {"method": "POST"}})
+    assert not orchestrator._is_idempotent({"type": "code"})
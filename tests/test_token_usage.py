@@ -0,0 +1,93 @@
+"""
+Tests for provider-reported token usage and the local tokenizer fallback.
+"""
+import asyncio
+
+from app.services import llm_cache, llm_client
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_client import LLMClient, LLMResult, _merge_stream_usage, _parse_usage
+from app.services.metrics_service import MetricsTracker
+from app.services.tokenizer import count_message_tokens, count_tokens
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+def test_local_tokenizer():
+    assert count_tokens("") == 0
+    assert 2 <= count_tokens("Hello, world!") <= 6
+    assert count_tokens("internationalization") > count_tokens("cat")
+    messages = [{"role": "user", "content": "Hello, world!"}]
+    assert count_message_tokens(messages) == count_tokens("Hello, world!") + 4
+
+
+def test_parse_usage_formats():
+    groq = {"usage": {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150,
+                      "prompt_tokens_details": {"cached_tokens": 100}}}
+    assert _parse_usage(groq) == (120, 30, 100)
+    anthropic = {"usage": {"input_tokens": 20, "output_tokens": 40, "cache_read_input_tokens": 500,
+                           "cache_creation_input_tokens": 0}}
+    assert _parse_usage(anthropic) == (520, 40, 500)
+    assert _parse_usage({}) is None
+
+
+def test_stream_usage_merges_anthropic_events():
+    usage = {}
+    _merge_stream_usage(usage, {"type": "message_start", "message": {"usage": {"input_tokens": 25, "output_tokens": 1}}})
+    _merge_stream_usage(usage, {"type": "content_block_delta", "delta": {"text": "hi"}})
+    _merge_stream_usage(usage, {"type": "message_delta", "usage": {"output_tokens": 15}})
+    assert usage == {"prompt_tokens": 25, "completion_tokens": 15, "cached_tokens": 0}
+
+
+def test_generate_returns_provider_usage(monkeypatch):
+    monkeypatch.setattr(llm_client, "GROQ_KEY", "test-key")
+    client = LLMClient(provider="groq", model="m")
+
+    async def fake_post(provider, url, payload, headers):
+        return FakeResponse({"choices": [{"message": {"content": "Paris"}}],
+                             "usage": {"prompt_tokens": 42, "completion_tokens": 3}})
+
+    monkeypatch.setattr(client, "_post", fake_post)
+    result = asyncio.run(client.generate("Capital of France?", add_to_context=False))
+    assert isinstance(result, LLMResult) and result == "Paris"
+    assert result.usage == {"prompt_tokens": 42, "completion_tokens": 3, "cached_tokens": 0, "cache_write_tokens": 0,
+                            "total_tokens": 45, "source": "provider"}
+    assert client.last_result is result
+
+
+def test_mock_provider_counts_locally_and_cache_hits_cost_nothing(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_llm_cache", LLMResponseCache())
+    client = LLMClient(provider="mock", temperature=0)
+    first = asyncio.run(client.generate("Count my tokens please", add_to_context=False))
+    assert first.usage_source == "estimate"
+    assert first.prompt_tokens > 0 and first.completion_tokens > 0
+
+    second = asyncio.run(client.generate("Count my tokens please", add_to_context=False))
+    assert second.usage_source == "cache"
+    assert second.total_tokens == 0
+
+
+def test_stream_records_usage():
+    client = LLMClient(provider="mock")
+
+    async def consume():
+        return [delta async for delta in client.stream("stream this", add_to_context=False)]
+
+    text = "".join(asyncio.run(consume()))
+    assert client.last_result == text
+    assert client.last_result.completion_tokens == count_tokens(text)
+
+
+def test_metrics_track_cached_and_estimated_tokens():
+    tracker = MetricsTracker()
+    tracker.add_token_usage(100, 20, cached_tokens=80)
+    tracker.add_token_usage(10, 5, estimated=True)
+    metrics = tracker.calculate_metrics()
+    assert metrics.token_usage_count == 135
+    assert metrics.token_cached_count == 80
+    assert metrics.token_estimated_count == 15